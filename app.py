@@ -1,9 +1,14 @@
 from flask import Flask
+from blueprints.serverless_testing.ingest import WorkspaceRequest, UPLOAD_MAX_BYTES
 from blueprints.serverless_testing.views import serverless_testing_bp
 from flask_cors import CORS
 
 app = Flask(__name__)
 
+# Uploads are written straight to disk, payloads above the limit are rejected with 413 before they are read
+app.request_class = WorkspaceRequest
+app.config['MAX_CONTENT_LENGTH'] = UPLOAD_MAX_BYTES
+
 app.url_map.strict_slashes = False
 app.register_blueprint(serverless_testing_bp)
 CORS(app)
@@ -0,0 +1,97 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blueprints.serverless_testing import canned, cds  # noqa: E402
+from blueprints.serverless_testing.helpers import JAVA_PATH, JAVAC_PATH, JUNIT_PATH, GRADLE_PATH, \
+    run_cmd  # noqa: E402
+
+
+def tool_commands(work_path: str) -> Dict[str, Callable[[List[str]], List[str]]]:
+    """Builds one representative command per tool. Each command gets the JVM options
+    to benchmark, an empty list measures the startup without an archive.
+
+    :param work_path: Directory with the compiled canned programs.
+    :type work_path: str
+
+    :return: Functions returning the command for the given JVM options.
+    :rtype: Dict[str, Callable[[List[str]], List[str]]]
+    """
+    hello = os.path.join(work_path, canned.HELLO_FILENAME)
+    out_path = os.path.join(work_path, 'out')
+    javac_out = os.path.join(work_path, 'javac_out')
+
+    return {
+        'javac': lambda flags: [JAVAC_PATH] + ['-J' + f for f in flags] + ['-d', javac_out, hello],
+        'java': lambda flags: [JAVA_PATH] + flags + ['-cp', out_path, canned.HELLO_MAIN],
+        'junit': lambda flags: [JAVA_PATH] + flags + ['-jar', JUNIT_PATH, '--disable-banner',
+                                                      '--disable-ansi-colors', '-cp', out_path,
+                                                      '--scan-class-path'],
+        'gradle': lambda flags: [GRADLE_PATH, '--version'],
+    }
+
+
+def measure(cmd: List[str], runs: int, env: Dict[str, str] = None) -> List[float]:
+    """Runs "cmd" "runs" times and returns the wall times in milliseconds.
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run_cmd(cmd, env=env)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per tool JVM startup with and without AppCDS archives.')
+    parser.add_argument('--runs', type=int, default=10, help='Runs per tool and mode.')
+    parser.add_argument('--tools', nargs='*', default=list(cds.CDS_TOOLS), help='Tools to benchmark.')
+    args = parser.parse_args()
+
+    archives = cds.ensure_archives(args.tools)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as work_path:
+        for filename, source in ((canned.HELLO_FILENAME, canned.HELLO_SOURCE),
+                                 (canned.TEST_FILENAME, canned.TEST_SOURCE)):
+            with open(os.path.join(work_path, filename), 'w') as f:
+                f.write(source)
+        run_cmd([JAVAC_PATH, '-d', os.path.join(work_path, 'out'), '-cp', JUNIT_PATH,
+                 os.path.join(work_path, canned.HELLO_FILENAME), os.path.join(work_path, canned.TEST_FILENAME)])
+
+        commands = tool_commands(work_path)
+        for tool in args.tools:
+            if not archives.get(tool):
+                results[tool] = {'error': 'archive not available'}
+                continue
+
+            flags = cds.jvm_flags(tool)
+            if tool == 'gradle':
+                # The gradle start script takes JVM options from GRADLE_OPTS
+                before = measure(commands[tool]([]), args.runs)
+                after = measure(commands[tool]([]), args.runs,
+                                env=dict(os.environ, GRADLE_OPTS=' '.join(flags)))
+            else:
+                before = measure(commands[tool]([]), args.runs)
+                after = measure(commands[tool](flags), args.runs)
+
+            results[tool] = {
+                'runs': args.runs,
+                'without_cds_ms': round(statistics.median(before), 1),
+                'with_cds_ms': round(statistics.median(after), 1),
+                'speedup': round(statistics.median(before) / statistics.median(after), 2),
+            }
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
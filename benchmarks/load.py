@@ -0,0 +1,257 @@
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ROOT_DIR, 'tests', 'serverless_testing')
+
+# Route, uploaded files and form fields of every scenario, the fixtures of the view tests
+SCENARIOS = {
+    'run/java': ('/run/java',
+                 ['multiple_java_files/MyMainClass.java', 'multiple_java_files/Calculator.java'],
+                 {'main_file': 'MyMainClass.java'}),
+    'test/java': ('/test/java',
+                  ['multiple_java_files/Calculator.java', 'multiple_java_files/CalculatorTest.java'],
+                  {}),
+    'run/gradle': ('/run/gradle', ['gradle_project/gradle_project.zip'], {}),
+    'test/gradle': ('/test/gradle', ['gradle_project/gradle_project.zip'], {}),
+}
+
+BOOT_TIMEOUT = 300
+
+
+def boot_server(port: int, workers: int, threads: int) -> subprocess.Popen:
+    """Starts the app with gunicorn like the Dockerfile does and waits until every worker
+    is warmed up, so the first levels do not measure cold JVMs.
+
+    :param port: The local port to bind.
+    :type port: int
+    :param workers: Gunicorn worker processes.
+    :type workers: int
+    :param threads: Threads per worker.
+    :type threads: int
+
+    :return: The gunicorn master process.
+    :rtype: subprocess.Popen
+    """
+    cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-b', '127.0.0.1:{0}'.format(port),
+           '--workers', str(workers), '--threads', str(threads), '--timeout', '0', 'app:app']
+    server = subprocess.Popen(cmd, cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + BOOT_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError('gunicorn exited with {0}'.format(server.returncode))
+        try:
+            if requests.get('http://127.0.0.1:{0}/ready'.format(port), timeout=1).status_code == 200:
+                return server
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+
+    server.kill()
+    raise RuntimeError('gunicorn was not ready within {0} seconds'.format(BOOT_TIMEOUT))
+
+
+def send(session: requests.Session, base_url: str, scenario: str) -> Tuple[float, int, Dict[str, float]]:
+    """Sends one request of "scenario".
+
+    :return: The latency in milliseconds, the status code (0 on connection errors) and
+        the stages of the "Server-Timing" header.
+    :rtype: Tuple[float, int, Dict[str, float]]
+    """
+    route, paths, form = SCENARIOS[scenario]
+    files = [('file', (os.path.basename(p), open(os.path.join(FIXTURES_DIR, p), 'rb'))) for p in paths]
+
+    start = time.perf_counter()
+    try:
+        resp = session.post(base_url + route, files=files, data=form)
+        status, timing = resp.status_code, parse_server_timing(resp.headers.get('Server-Timing', ''))
+    except requests.RequestException:
+        status, timing = 0, {}
+    finally:
+        for _, (_, f) in files:
+            f.close()
+    return (time.perf_counter() - start) * 1000, status, timing
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """Reads the durations of a "Server-Timing" header, e.g. "compile;dur=812.4, total;dur=911.0".
+    """
+    stages = {}
+    for entry in filter(None, (e.strip() for e in header.split(','))):
+        name, _, params = entry.partition(';')
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'dur':
+                stages[name] = float(value)
+    return stages
+
+
+def run_level(base_url: str, scenario: str, concurrency: int, total: int) -> Dict[str, Any]:
+    """Sends "total" requests of "scenario" with "concurrency" requests in flight.
+
+    :return: Throughput, latency percentiles, error rate and median stage durations.
+    :rtype: Dict[str, Any]
+    """
+    local = threading.local()
+    samples = []
+
+    def worker(_):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return send(local.session, base_url, scenario)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        samples.extend(executor.map(worker, range(total)))
+    duration = time.perf_counter() - start
+
+    return summarize(samples, concurrency, duration)
+
+
+def summarize(samples: List[Tuple[float, int, Dict[str, float]]], concurrency: int,
+              duration: float) -> Dict[str, Any]:
+    """Reduces the samples of one concurrency level to the reported numbers.
+    """
+    latencies = sorted(latency for latency, _, _ in samples)
+    errors = sum(1 for _, status, _ in samples if status != 200)
+
+    stages = {}
+    for _, _, timing in samples:
+        for name, ms in timing.items():
+            stages.setdefault(name, []).append(ms)
+
+    return {
+        'concurrency': concurrency,
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0,
+        'throughput_rps': round(len(samples) / duration, 2) if duration > 0 else 0,
+        'latency_ms': {
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'mean': round(statistics.mean(latencies), 1) if latencies else None,
+            'max': round(latencies[-1], 1) if latencies else None,
+        },
+        'stages_p50_ms': {name: round(statistics.median(values), 1) for name, values in stages.items()},
+    }
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest rank percentile of sorted "values".
+    """
+    if not values:
+        return None
+    rank = max(math.ceil(p / 100 * len(values)), 1)
+    return round(values[rank - 1], 1)
+
+
+def compare(results: Dict[str, List[Dict[str, Any]]], baseline: Dict[str, List[Dict[str, Any]]]):
+    """Adds the change against an earlier report to every level both reports measured,
+    as ratios new / old, so below 1 is faster for latencies and slower for throughput.
+    """
+    for scenario, levels in results.items():
+        old_levels = {level['concurrency']: level for level in baseline.get(scenario, [])}
+        for level in levels:
+            old = old_levels.get(level['concurrency'])
+            if old is None:
+                continue
+            change = {}
+            for key in ('p50', 'p95', 'p99'):
+                if level['latency_ms'][key] and old['latency_ms'][key]:
+                    change[key] = round(level['latency_ms'][key] / old['latency_ms'][key], 3)
+            if old['throughput_rps']:
+                change['throughput_rps'] = round(level['throughput_rps'] / old['throughput_rps'], 3)
+            change['error_rate'] = round(level['error_rate'] - old['error_rate'], 4)
+            level['change'] = change
+
+
+def git_commit() -> Optional[str]:
+    """The commit the benchmark ran on, to tell reports apart.
+    """
+    try:
+        out = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.decode().strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput and latency of the endpoints at rising concurrency.')
+    parser.add_argument('--url', help='Benchmark a running server instead of booting one, e.g. http://host:8080.')
+    parser.add_argument('--port', type=int, default=8090, help='Port of the booted server.')
+    parser.add_argument('--workers', type=int, default=2, help='Gunicorn workers of the booted server.')
+    parser.add_argument('--threads', type=int, default=32, help='Threads per worker of the booted server.')
+    parser.add_argument('--scenarios', nargs='*', default=list(SCENARIOS), choices=list(SCENARIOS),
+                        help='Endpoints to benchmark.')
+    parser.add_argument('--concurrency', nargs='*', type=int, default=[1, 2, 4, 8, 16],
+                        help='Requests in flight, one level after the other.')
+    parser.add_argument('--requests', type=int, default=40, help='Requests per scenario and level.')
+    parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests per scenario.')
+    parser.add_argument('--output', help='Write the json report to this file instead of stdout.')
+    parser.add_argument('--baseline', help='An earlier json report to compare against.')
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        server = boot_server(args.port, args.workers, args.threads)
+        base_url = 'http://127.0.0.1:{0}'.format(args.port)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'url': base_url if server is None else None,
+            'workers': args.workers if server is not None else None,
+            'threads': args.threads if server is not None else None,
+            'cpu_count': os.cpu_count(),
+            'python': platform.python_version(),
+            'requests_per_level': args.requests,
+        },
+        'results': {},
+    }
+
+    try:
+        session = requests.Session()
+        for scenario in args.scenarios:
+            # JVM daemons, compile cache and gradle daemons warm up before measuring
+            for _ in range(args.warmup):
+                send(session, base_url, scenario)
+            report['results'][scenario] = [run_level(base_url, scenario, level, args.requests)
+                                           for level in args.concurrency]
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report['meta']['baseline_commit'] = baseline['meta'].get('commit')
+        compare(report['results'], baseline['results'])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Any
+
+from blueprints.serverless_testing.exec_types.compile import javac, javac_cached
+from blueprints.serverless_testing.exec_types.exec_types import ExecType
+from blueprints.serverless_testing.exec_types.execute import java_cmd
+from blueprints.serverless_testing.helpers import JUNIT_PATH, env_int, elapsed_ms
+from blueprints.serverless_testing.junit import grading_class_path
+from blueprints.serverless_testing.limits import job_limits, run_limited
+
+# GLOBALS
+BATCH_WORKERS = env_int('BATCH_WORKERS', os.cpu_count() or 1)
+BATCH_MAX_SUBMISSIONS = env_int('BATCH_MAX_SUBMISSIONS', 500)
+
+# Submissions tried as reference when the tests are compiled
+TEST_COMPILE_ATTEMPTS = 3
+
+JUNIT_SUMMARY_PATTERN = re.compile(r'\[\s*(\d+) tests (found|successful|failed|aborted|skipped)')
+
+
+class BatchError(Exception):
+    """Raised if a batch can not be graded at all, e.g. if the tests do not compile.
+    """
+
+
+def find_submissions(submissions_path: str) -> List[str]:
+    """Lists the submissions of an extracted archive, one top level dir per submission.
+
+    :param submissions_path: The dir the archive was extracted to.
+    :type submissions_path: str
+
+    :return: The submission names, sorted.
+    :rtype: List[str]
+    """
+    return sorted(d for d in os.listdir(submissions_path)
+                  if os.path.isdir(os.path.join(submissions_path, d)) and not d.startswith(('_', '.')))
+
+
+def java_files(path: str) -> List[str]:
+    """Finds all java files below "path".
+
+    :param path: The dir to search.
+    :type path: str
+
+    :return: The paths of the java files, sorted.
+    :rtype: List[str]
+    """
+    return sorted(os.path.join(root, name)
+                  for root, _, names in os.walk(path) for name in names if name.endswith('.java'))
+
+
+def compile_tests(test_paths: List[str], tests_out: str, submission_paths: List[str]):
+    """Compiles the test classes once for the whole batch. The classes under test are
+    read from the sources of a submission but not compiled, each submission brings
+    its own. Further submissions are tried if the sources of one do not compile.
+
+    :param test_paths: The test java files.
+    :type test_paths: List[str]
+    :param tests_out: The destination of the test classes.
+    :type tests_out: str
+    :param submission_paths: The submission dirs.
+    :type submission_paths: List[str]
+
+    :raises BatchError: If the tests compile against none of the tried submissions.
+    """
+    first_error = None
+    for submission_path in submission_paths[:TEST_COMPILE_ATTEMPTS]:
+        stdout, stderr = javac(file_paths=test_paths,
+                               out_path=tests_out,
+                               class_path=tests_out + ':' + JUNIT_PATH,
+                               source_path=submission_path)
+        if stdout is None and stderr is None:
+            return
+        if first_error is None:
+            first_error = stdout or stderr
+
+    raise BatchError(first_error or 'No submissions found!')
+
+
+def grade_submission(name: str, submission_path: str, tests_out: str) -> Dict[str, Any]:
+    """Compiles one submission and runs the precompiled tests against it.
+
+    :param name: The name of the submission.
+    :type name: str
+    :param submission_path: The dir with the sources of the submission.
+    :type submission_path: str
+    :param tests_out: The dir with the compiled test classes.
+    :type tests_out: str
+
+    :return: The result of the submission.
+    :rtype: Dict[str, Any]
+    """
+    start = time.monotonic()
+    result = {'submission': name}
+
+    file_paths = java_files(submission_path)
+    if not file_paths:
+        result.update(status='compile_error', error='No java files found!', duration_ms=elapsed_ms(start))
+        return result
+
+    out_path = os.path.join(submission_path, 'out')
+    stdout, stderr = javac_cached(file_paths=file_paths,
+                                  out_path=out_path,
+                                  class_path=out_path + ':' + JUNIT_PATH)
+    if stdout is not None or stderr is not None:
+        result.update(status='compile_error', error=stdout or stderr, duration_ms=elapsed_ms(start))
+        return result
+
+    class_path = grading_class_path(tests_out, out_path)
+    stdout, stderr, usage = run_limited(java_cmd(ExecType.test, class_path, None, [], scan_path=tests_out),
+                                        cwd=submission_path, limits=job_limits('junit'))
+
+    tests = parse_junit_summary(stdout or '')
+    if usage['limit'] is not None or (stderr is not None and not tests):
+        status = 'error'
+    elif tests.get('failed', 0) or tests.get('aborted', 0) or not tests.get('found', 0):
+        status = 'failed'
+    else:
+        status = 'passed'
+
+    result.update(status=status, tests=tests, output=stdout, error=stderr, usage=usage,
+                  duration_ms=elapsed_ms(start))
+    return result
+
+
+def grade_batch(test_paths: List[str], submissions_path: str, tests_out: str,
+                workers: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Grades all submissions below "submissions_path" with the same tests. The results
+    are yielded as soon as each submission is done, so in completion order.
+
+    :param test_paths: The test java files.
+    :type test_paths: List[str]
+    :param submissions_path: The dir with one sub dir per submission.
+    :type submissions_path: str
+    :param tests_out: The destination of the test classes.
+    :type tests_out: str
+    :param workers: Submissions graded at once, defaults to "BATCH_WORKERS".
+    :type workers: Optional[int]
+
+    :raises BatchError: If there are too many submissions or the tests do not compile.
+
+    :return: The result of every submission.
+    :rtype: Iterator[Dict[str, Any]]
+    """
+    names = find_submissions(submissions_path)
+    if len(names) > BATCH_MAX_SUBMISSIONS:
+        raise BatchError('At most {0} submissions allowed!'.format(BATCH_MAX_SUBMISSIONS))
+
+    paths = [os.path.join(submissions_path, name) for name in names]
+    compile_tests(test_paths, tests_out, paths)
+
+    # javac and JUnit run as child processes or in the daemon pools, threads only wait for them
+    with ThreadPoolExecutor(max_workers=max(workers or BATCH_WORKERS, 1)) as executor:
+        futures = [executor.submit(grade_submission, name, path, tests_out) for name, path in zip(names, paths)]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def parse_junit_summary(output: str) -> Dict[str, int]:
+    """Reads the test counts from the summary of the JUnit console launcher.
+
+    :param output: The stdout of the launcher.
+    :type output: str
+
+    :return: The counts by kind, e.g. {"found": 5, "successful": 4, "failed": 1}.
+    :rtype: Dict[str, int]
+    """
+    return {kind: int(count) for count, kind in JUNIT_SUMMARY_PATTERN.findall(output)}
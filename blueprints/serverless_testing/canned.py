@@ -0,0 +1,37 @@
+# Small canned Java programs used to train and benchmark the JVM tooling
+
+HELLO_FILENAME = 'CannedHello.java'
+HELLO_MAIN = 'CannedHello'
+HELLO_SOURCE = """import java.util.ArrayList;
+import java.util.List;
+
+public class CannedHello {
+    public static void main(String[] args) {
+        List<String> words = new ArrayList<>();
+        words.add("Hello");
+        words.add(args.length > 0 ? args[0] : "World");
+        System.out.println(String.join(", ", words));
+    }
+}
+"""
+
+TEST_FILENAME = 'CannedHelloTest.java'
+TEST_SOURCE = """import org.junit.jupiter.api.Test;
+import static org.junit.jupiter.api.Assertions.assertEquals;
+
+public class CannedHelloTest {
+    @Test
+    void joinsWords() {
+        assertEquals("Hello, World", String.join(", ", "Hello", "World"));
+    }
+}
+"""
+
+GRADLE_SETTINGS_SOURCE = """rootProject.name = 'canned'
+"""
+GRADLE_BUILD_SOURCE = """plugins {
+    id 'application'
+}
+
+mainClassName = 'CannedHello'
+"""
@@ -0,0 +1,247 @@
+import fcntl
+import glob
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+from blueprints.serverless_testing import canned
+from blueprints.serverless_testing.helpers import JAVA_PATH, JAVAC_PATH, JUNIT_PATH, GRADLE_PATH, run_cmd, \
+    env_flag, jdk_fingerprint, path_fingerprint
+
+# GLOBALS
+CDS_ENABLED = env_flag('CDS', True)
+CDS_DIR = os.environ.get('CDS_DIR', '/app/cds')
+CDS_TOOLS = ('javac', 'java', 'junit', 'gradle')
+
+# Seconds a successful archive validation is trusted before the files are checked again
+CDS_RECHECK_INTERVAL = 60
+
+_validated = {}
+_regenerating = set()
+_lock = threading.Lock()
+
+
+def gradle_launcher_jar() -> Optional[str]:
+    """Finds the jar the gradle start script puts on the class-path.
+
+    :return: The path of the gradle launcher jar, if gradle is installed.
+    :rtype: Optional[str]
+    """
+    jars = glob.glob(os.path.join(os.path.dirname(os.path.dirname(GRADLE_PATH)), 'lib', 'gradle-launcher-*.jar'))
+    return jars[0] if jars else None
+
+
+def tool_class_path(tool: str) -> str:
+    """The application class-path a tool runs with. An archive can only be mapped if the
+    runtime class-path starts with the class-path used when dumping the archive, so tools
+    that only load JDK classes are dumped with an empty class-path.
+
+    :param tool: One of "CDS_TOOLS".
+    :type tool: str
+
+    :return: The class-path, empty for javac and plain java.
+    :rtype: str
+    """
+    if tool == 'junit':
+        return JUNIT_PATH
+    if tool == 'gradle':
+        return gradle_launcher_jar() or ''
+    return ''
+
+
+def archive_path(tool: str) -> str:
+    """The location of the shared archive of "tool".
+
+    :param tool: One of "CDS_TOOLS".
+    :type tool: str
+
+    :return: The path of the archive.
+    :rtype: str
+    """
+    return os.path.join(CDS_DIR, tool + '.jsa')
+
+
+def fingerprint(tool: str) -> str:
+    """Describes the JDK and the jar an archive of "tool" was built for. The archive has
+    to be regenerated as soon as the fingerprint changes.
+
+    :param tool: One of "CDS_TOOLS".
+    :type tool: str
+
+    :return: The fingerprint.
+    :rtype: str
+    """
+    class_path = tool_class_path(tool)
+    parts = [tool, jdk_fingerprint()]
+    if class_path:
+        parts.append(class_path + ':' + path_fingerprint(class_path))
+    return '|'.join(parts)
+
+
+def archive_valid(tool: str) -> bool:
+    """Checks if the archive of "tool" exists and matches the installed JDK and jar.
+
+    :param tool: One of "CDS_TOOLS".
+    :type tool: str
+
+    :return: True if the archive can be used.
+    :rtype: bool
+    """
+    try:
+        with open(archive_path(tool) + '.fingerprint') as f:
+            stored = f.read()
+    except OSError:
+        return False
+    return stored == fingerprint(tool) and os.path.exists(archive_path(tool))
+
+
+def jvm_flags(tool: str) -> List[str]:
+    """JVM options that map the shared archive of "tool". Returns no options while the
+    archive is missing or outdated and regenerates it in the background instead.
+
+    :param tool: One of "CDS_TOOLS".
+    :type tool: str
+
+    :return: The JVM options, pass them with "-J" to javac.
+    :rtype: List[str]
+    """
+    if not CDS_ENABLED:
+        return []
+
+    with _lock:
+        checked = _validated.get(tool)
+    if checked is None or time.monotonic() - checked > CDS_RECHECK_INTERVAL:
+        if not archive_valid(tool):
+            with _lock:
+                _validated.pop(tool, None)
+            _regenerate_in_background(tool)
+            return []
+        with _lock:
+            _validated[tool] = time.monotonic()
+
+    # -Xshare:auto silently runs without the archive if it can not be mapped
+    return ['-XX:SharedArchiveFile=' + archive_path(tool), '-Xshare:auto',
+            '-Xlog:cds=off', '-Xlog:class+path=off']
+
+
+def _regenerate_in_background(tool: str):
+    with _lock:
+        if tool in _regenerating:
+            return
+        _regenerating.add(tool)
+
+    def regenerate():
+        try:
+            build_archive(tool)
+        finally:
+            with _lock:
+                _regenerating.discard(tool)
+
+    threading.Thread(target=regenerate, daemon=True).start()
+
+
+def build_archive(tool: str) -> bool:
+    """Builds the archive of "tool" unless a valid one exists. A training run records the
+    classes the tool loads, then "java -Xshare:dump" writes them into the archive.
+    gunicorn workers building the same archive are serialized with a file lock.
+
+    :param tool: One of "CDS_TOOLS".
+    :type tool: str
+
+    :return: True if a valid archive exists afterwards.
+    :rtype: bool
+    """
+    try:
+        os.makedirs(CDS_DIR, exist_ok=True)
+        with open(os.path.join(CDS_DIR, '.' + tool + '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if archive_valid(tool):
+                return True
+
+            with tempfile.TemporaryDirectory(dir=CDS_DIR) as tmp:
+                class_list = os.path.join(tmp, tool + '.classlist')
+                if not _training_run(tool, class_list, tmp):
+                    return False
+
+                archive = os.path.join(tmp, tool + '.jsa')
+                dump_cmd = [JAVA_PATH, '-Xshare:dump', '-XX:SharedArchiveFile=' + archive,
+                            '-cp', tool_class_path(tool)]
+                # Without a class list the JDK's default class list is archived
+                if os.path.exists(class_list):
+                    dump_cmd.append('-XX:SharedClassListFile=' + class_list)
+                run_cmd(dump_cmd)
+                if not os.path.exists(archive):
+                    return False
+
+                os.replace(archive, archive_path(tool))
+                with open(archive_path(tool) + '.fingerprint', 'w') as f:
+                    f.write(fingerprint(tool))
+    except OSError:
+        return False
+
+    return True
+
+
+def _training_run(tool: str, class_list: str, tmp: str) -> bool:
+    """Runs "tool" on the canned programs and records the loaded classes into "class_list".
+
+    :param tool: One of "CDS_TOOLS".
+    :type tool: str
+    :param class_list: Where the JVM dumps the names of the loaded classes.
+    :type class_list: str
+    :param tmp: A scratch directory for sources and class files.
+    :type tmp: str
+
+    :return: False if the tool is not installed.
+    :rtype: bool
+    """
+    dump = '-XX:DumpLoadedClassList=' + class_list
+    out_path = os.path.join(tmp, 'out')
+
+    if tool == 'java':
+        return os.path.exists(JAVA_PATH)
+
+    if tool == 'javac':
+        hello = _write_canned(tmp, canned.HELLO_FILENAME, canned.HELLO_SOURCE)
+        run_cmd([JAVAC_PATH, '-J' + dump, '-d', out_path, hello])
+    elif tool == 'junit':
+        test = _write_canned(tmp, canned.TEST_FILENAME, canned.TEST_SOURCE)
+        run_cmd([JAVAC_PATH, '-d', out_path, '-cp', JUNIT_PATH, test])
+        run_cmd([JAVA_PATH, dump, '-jar', JUNIT_PATH, '--disable-ansi-colors', '--disable-banner',
+                 '-cp', out_path, '--scan-class-path'])
+    elif tool == 'gradle':
+        if gradle_launcher_jar() is None:
+            return False
+        env = dict(os.environ, GRADLE_OPTS=dump)
+        run_cmd([GRADLE_PATH, '--version'], env=env)
+
+    return os.path.exists(class_list)
+
+
+def _write_canned(dest: str, filename: str, source: str) -> str:
+    path = os.path.join(dest, filename)
+    with open(path, 'w') as f:
+        f.write(source)
+    return path
+
+
+def ensure_archives(tools=CDS_TOOLS) -> Dict[str, bool]:
+    """Builds all missing or outdated archives, e.g. at image build time.
+
+    :param tools: The tools to build archives for.
+
+    :return: Whether a valid archive exists for each tool.
+    :rtype: Dict[str, bool]
+    """
+    return {tool: build_archive(tool) for tool in tools}
+
+
+if __name__ == '__main__':
+    # python -m blueprints.serverless_testing.cds
+    results = ensure_archives()
+    for name, ok in results.items():
+        print('{0}: {1}'.format(name, archive_path(name) if ok else 'not available'))
+    sys.exit(0 if all(results.values()) else 1)
@@ -0,0 +1,121 @@
+import re
+import struct
+from typing import List, NamedTuple, Optional, Set
+
+# Sizes of the constant pool entries after their tag, Utf8 entries are read separately
+CONSTANT_SIZES = {3: 4, 4: 4, 5: 8, 6: 8, 7: 2, 8: 2, 9: 4, 10: 4, 11: 4, 12: 4, 15: 3, 16: 2, 17: 4, 18: 4,
+                  19: 2, 20: 2}
+CONSTANT_UTF8 = 1
+CONSTANT_CLASS = 7
+CONSTANT_LONG = 5
+CONSTANT_DOUBLE = 6
+
+CLASS_MAGIC = 0xCAFEBABE
+
+# Class names inside field and method descriptors, e.g. "(Ljava/lang/String;)LCalculator;"
+DESCRIPTOR_PATTERN = re.compile(r'L([\w/$]+);')
+
+
+class ClassFileError(Exception):
+    """Raised if a file is no valid class file.
+    """
+
+
+class ClassInfo(NamedTuple):
+    """What a class file declares and refers to, class names in internal form, e.g. "pkg/Outer$Inner".
+    """
+    name: str
+    source_file: Optional[str]
+    references: Set[str]
+
+
+def read_class_info(path: str) -> ClassInfo:
+    """Reads the name, the "SourceFile" attribute and all referenced classes of a class
+    file. References are taken from the class entries of the constant pool and from all
+    descriptors, so types only used in signatures are found as well.
+
+    :param path: The path of the class file.
+    :type path: str
+
+    :raises ClassFileError: If the file is no valid class file.
+
+    :return: The class info.
+    :rtype: ClassInfo
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    try:
+        return _parse(data)
+    except (struct.error, IndexError, KeyError, UnicodeDecodeError) as e:
+        raise ClassFileError('Invalid class file [{0}]: {1}'.format(path, e))
+
+
+def _parse(data: bytes) -> ClassInfo:
+    magic, _, _, count = struct.unpack_from('>IHHH', data, 0)
+    if magic != CLASS_MAGIC:
+        raise ClassFileError('Bad magic number')
+
+    utf8 = {}
+    classes = {}
+    pos = 10
+    index = 1
+    while index < count:
+        tag = data[pos]
+        if tag == CONSTANT_UTF8:
+            length = struct.unpack_from('>H', data, pos + 1)[0]
+            # Modified UTF-8, surrogates of supplementary characters are kept as they are
+            utf8[index] = data[pos + 3:pos + 3 + length].decode('utf-8', errors='surrogatepass')
+            pos += 3 + length
+        else:
+            if tag == CONSTANT_CLASS:
+                classes[index] = struct.unpack_from('>H', data, pos + 1)[0]
+            pos += 1 + CONSTANT_SIZES[tag]
+        # Long and double entries take two slots
+        index += 2 if tag in (CONSTANT_LONG, CONSTANT_DOUBLE) else 1
+
+    this_class, _ = struct.unpack_from('>HH', data, pos + 2)
+    pos += 6
+    interfaces = struct.unpack_from('>H', data, pos)[0]
+    pos += 2 + 2 * interfaces
+
+    # Skip fields and methods, access flags, name and descriptor are followed by the attributes
+    for _ in range(2):
+        members = struct.unpack_from('>H', data, pos)[0]
+        pos += 2
+        for _ in range(members):
+            pos = _skip_attributes(data, pos + 6)
+
+    source_file = None
+    attributes = struct.unpack_from('>H', data, pos)[0]
+    pos += 2
+    for _ in range(attributes):
+        name_index, length = struct.unpack_from('>HI', data, pos)
+        if utf8.get(name_index) == 'SourceFile':
+            source_file = utf8[struct.unpack_from('>H', data, pos + 6)[0]]
+        pos += 6 + length
+
+    name = utf8[classes[this_class]]
+    references = set()
+    for name_index in classes.values():
+        references.update(_class_names(utf8[name_index]))
+    for value in utf8.values():
+        references.update(DESCRIPTOR_PATTERN.findall(value))
+    references.discard(name)
+
+    return ClassInfo(name=name, source_file=source_file, references=references)
+
+
+def _skip_attributes(data: bytes, pos: int) -> int:
+    count = struct.unpack_from('>H', data, pos)[0]
+    pos += 2
+    for _ in range(count):
+        pos += 6 + struct.unpack_from('>I', data, pos + 2)[0]
+    return pos
+
+
+def _class_names(entry: str) -> List[str]:
+    # Class entries of arrays are descriptors, e.g. "[LCalculator;" or "[I"
+    if entry.startswith('['):
+        return DESCRIPTOR_PATTERN.findall(entry)
+    return [entry]
@@ -0,0 +1,225 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from blueprints.serverless_testing.helpers import env_flag, env_int, jdk_fingerprint, path_fingerprint
+
+# GLOBALS
+COMPILE_CACHE_ENABLED = env_flag('COMPILE_CACHE', True)
+COMPILE_CACHE_DIR = os.environ.get('COMPILE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'compile-cache'))
+COMPILE_CACHE_MAX_BYTES = env_int('COMPILE_CACHE_MAX_MB', 256) * 1024 * 1024
+# Seconds between evictions of a worker, sooner if a tenth of the budget was stored since
+COMPILE_CACHE_EVICT_SECONDS = env_int('COMPILE_CACHE_EVICT_SECONDS', 60)
+
+# Stands in for the job specific source dir inside cached compiler diagnostics
+SOURCE_DIR_TOKEN = '@@SOURCE_DIR@@'
+
+_evict_lock = threading.Lock()
+_evict_state = {'last': None, 'stored_bytes': 0}
+
+
+def cache_key(file_paths: List[str], class_path: str, out_path: str) -> str:
+    """Hashes everything that decides the result of a compilation: the source files and
+    their names, the class-path entries (without the job's own "out_path") and the JDK.
+
+    :param file_paths: The java file paths to be compiled.
+    :type file_paths: List[str]
+    :param class_path: The class-path given to javac.
+    :type class_path: str
+    :param out_path: The job specific destination of the .class files.
+    :type out_path: str
+
+    :return: The hex digest identifying the compilation.
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    digest.update(jdk_fingerprint().encode())
+
+    for entry in class_path.split(':'):
+        if entry == '' or os.path.abspath(entry) == os.path.abspath(out_path):
+            continue
+        digest.update(b'\0cp\0' + entry.encode() + b'\0' + path_fingerprint(entry).encode())
+
+    for fp in sorted(file_paths, key=os.path.basename):
+        digest.update(b'\0src\0' + os.path.basename(fp).encode() + b'\0')
+        with open(fp, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+
+    return digest.hexdigest()
+
+
+def lookup(key: str, out_path: str, source_dir: str) -> Optional[Tuple[Optional[str], Optional[str]]]:
+    """Restores a cached compilation into "out_path".
+
+    :param key: The cache key of the compilation.
+    :type key: str
+    :param out_path: The destination path the .class files should be put.
+    :type out_path: str
+    :param source_dir: The directory of the job's source files, put back into diagnostics.
+    :type source_dir: str
+
+    :return: The cached stdout and stderr of javac or None on a cache miss.
+    :rtype: Optional[Tuple[Optional[str], Optional[str]]]
+    """
+    if not COMPILE_CACHE_ENABLED:
+        return None
+
+    entry = os.path.join(COMPILE_CACHE_DIR, 'entries', key)
+    try:
+        with open(os.path.join(entry, 'result.json')) as f:
+            result = json.load(f)
+        _copy_tree(os.path.join(entry, 'classes'), out_path)
+        # Mark as recently used for the LRU eviction
+        os.utime(entry)
+    except (OSError, ValueError):
+        # Missing or evicted while reading, compile again
+        shutil.rmtree(out_path, ignore_errors=True)
+        return None
+
+    return _restore(result.get('stdout'), source_dir), _restore(result.get('stderr'), source_dir)
+
+
+def store(key: str,
+          out_path: str,
+          source_dir: str,
+          stdout: Optional[str],
+          stderr: Optional[str]):
+    """Stores a compilation result and its .class files. Entries are published with
+    an atomic rename, so concurrent gunicorn workers never see half written entries.
+
+    :param key: The cache key of the compilation.
+    :type key: str
+    :param out_path: The path javac put the .class files.
+    :type out_path: str
+    :param source_dir: The directory of the job's source files.
+    :type source_dir: str
+    :param stdout: The stdout of javac.
+    :type stdout: Optional[str]
+    :param stderr: The stderr of javac.
+    :type stderr: Optional[str]
+    """
+    if not COMPILE_CACHE_ENABLED:
+        return
+
+    entries = os.path.join(COMPILE_CACHE_DIR, 'entries')
+    if os.path.exists(os.path.join(entries, key)):
+        return
+
+    try:
+        os.makedirs(entries, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.' + key, dir=COMPILE_CACHE_DIR)
+        classes = os.path.join(staging, 'classes')
+        if os.path.isdir(out_path):
+            shutil.copytree(out_path, classes)
+        else:
+            os.makedirs(classes)
+
+        size = _tree_size(classes)
+        with open(os.path.join(staging, 'result.json'), 'w') as f:
+            json.dump({'stdout': _neutralize(stdout, source_dir),
+                       'stderr': _neutralize(stderr, source_dir),
+                       'size': size}, f)
+
+        try:
+            os.rename(staging, os.path.join(entries, key))
+        except OSError:
+            # Another worker stored the same compilation first
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+    except OSError:
+        return
+
+    if _evict_due(size):
+        evict(COMPILE_CACHE_MAX_BYTES)
+
+
+def evict(max_bytes: int):
+    """Removes the least recently used entries until the cache fits into "max_bytes".
+
+    :param max_bytes: The size budget of the cache.
+    :type max_bytes: int
+    """
+    entries_dir = os.path.join(COMPILE_CACHE_DIR, 'entries')
+    with open(os.path.join(COMPILE_CACHE_DIR, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        entries = []
+        total = 0
+        for key in os.listdir(entries_dir):
+            entry = os.path.join(entries_dir, key)
+            try:
+                with open(os.path.join(entry, 'result.json')) as f:
+                    size = json.load(f).get('size', 0)
+                entries.append((os.path.getmtime(entry), size, key))
+            except (OSError, ValueError):
+                continue
+            total += size
+
+        for _, size, key in sorted(entries):
+            if total <= max_bytes:
+                break
+            _remove_entry(key)
+            total -= size
+
+
+def _evict_due(stored_bytes: int) -> bool:
+    """Decides if a store has to evict, eviction walks every entry of the cache.
+    """
+    now = time.monotonic()
+    with _evict_lock:
+        _evict_state['stored_bytes'] += stored_bytes
+        if _evict_state['last'] is not None and \
+                now - _evict_state['last'] < COMPILE_CACHE_EVICT_SECONDS and \
+                _evict_state['stored_bytes'] < COMPILE_CACHE_MAX_BYTES // 10:
+            return False
+        _evict_state.update(last=now, stored_bytes=0)
+        return True
+
+
+def _remove_entry(key: str):
+    """Moves an entry out of "entries" before deleting it, so lookups never restore
+    a partially deleted entry.
+    """
+    doomed = os.path.join(COMPILE_CACHE_DIR, '.evicted-{0}-{1}'.format(key, time.monotonic_ns()))
+    try:
+        os.rename(os.path.join(COMPILE_CACHE_DIR, 'entries', key), doomed)
+    except OSError:
+        return
+    shutil.rmtree(doomed, ignore_errors=True)
+
+
+def _copy_tree(src: str, dest: str):
+    """Copies all files of "src" into "dest", which may already exist. Copies instead of
+    hard links, so later writes into "dest" can never alter the cache.
+    """
+    for root, _, files in os.walk(src):
+        target_root = os.path.join(dest, os.path.relpath(root, src))
+        os.makedirs(target_root, exist_ok=True)
+        for name in files:
+            shutil.copy2(os.path.join(root, name), os.path.join(target_root, name))
+
+
+def _tree_size(path: str) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            size += os.path.getsize(os.path.join(root, name))
+    return size
+
+
+def _neutralize(output: Optional[str], source_dir: str) -> Optional[str]:
+    if output is None:
+        return None
+    return output.replace(source_dir, SOURCE_DIR_TOKEN)
+
+
+def _restore(output: Optional[str], source_dir: str) -> Optional[str]:
+    if output is None:
+        return None
+    return output.replace(SOURCE_DIR_TOKEN, source_dir)
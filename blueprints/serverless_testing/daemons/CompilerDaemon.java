@@ -0,0 +1,42 @@
+import java.io.ByteArrayOutputStream;
+import java.io.IOException;
+import java.io.PrintStream;
+import java.nio.charset.StandardCharsets;
+import java.util.Arrays;
+import javax.tools.JavaCompiler;
+import javax.tools.ToolProvider;
+
+/**
+ * Keeps javac loaded and JIT-compiled inside one JVM. Every "COMPILE" request
+ * carries the exact arguments the javac command line would get.
+ */
+public final class CompilerDaemon {
+    private static final byte[] EMPTY = new byte[0];
+
+    public static void main(String[] args) throws IOException {
+        // stdout belongs to the protocol, anything else printed goes to stderr
+        PrintStream protocolOut = System.out;
+        System.setOut(System.err);
+
+        DaemonProtocol protocol = new DaemonProtocol(System.in, protocolOut);
+        JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+
+        String[] request;
+        while ((request = protocol.read()) != null) {
+            switch (request[0]) {
+                case "PING":
+                    protocol.write(0, "PONG".getBytes(StandardCharsets.UTF_8), EMPTY);
+                    break;
+                case "COMPILE":
+                    ByteArrayOutputStream stdout = new ByteArrayOutputStream();
+                    ByteArrayOutputStream stderr = new ByteArrayOutputStream();
+                    int status = compiler.run(null, stdout, stderr,
+                                              Arrays.copyOfRange(request, 1, request.length));
+                    protocol.write(status, stdout.toByteArray(), stderr.toByteArray());
+                    break;
+                default:
+                    protocol.write(2, EMPTY, ("Unknown command " + request[0]).getBytes(StandardCharsets.UTF_8));
+            }
+        }
+    }
+}
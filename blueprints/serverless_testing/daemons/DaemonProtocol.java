@@ -0,0 +1,82 @@
+import java.io.BufferedReader;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.InputStreamReader;
+import java.io.OutputStream;
+import java.nio.charset.StandardCharsets;
+
+/**
+ * Line based request / length prefixed response protocol spoken between the
+ * Python pools and the long-lived JVM daemons.
+ *
+ * Request:  "COMMAND argc\n" followed by argc lines, one argument per line.
+ * Response: "status out_len err_len recycle\n" followed by out_len bytes of stdout
+ *           and err_len bytes of stderr. "recycle" is 1 if the daemon must not be reused.
+ *           Executors append "output_bytes truncated limit" to the header: the output the
+ *           job wrote, 1 if only its head and tail are sent, and the limit that stopped
+ *           it or "-".
+ */
+final class DaemonProtocol {
+    private final BufferedReader in;
+    private final OutputStream out;
+
+    DaemonProtocol(InputStream in, OutputStream out) {
+        this.in = new BufferedReader(new InputStreamReader(in, StandardCharsets.UTF_8));
+        this.out = out;
+    }
+
+    /**
+     * Reads the next request.
+     *
+     * @return The command followed by its arguments or null once stdin is closed.
+     */
+    String[] read() throws IOException {
+        String header = in.readLine();
+        if (header == null) {
+            return null;
+        }
+
+        String[] parts = header.split(" ");
+        int argc = parts.length > 1 ? Integer.parseInt(parts[1]) : 0;
+
+        String[] request = new String[argc + 1];
+        request[0] = parts[0];
+        for (int i = 1; i <= argc; i++) {
+            request[i] = in.readLine();
+            if (request[i] == null) {
+                return null;
+            }
+        }
+        return request;
+    }
+
+    /**
+     * Writes a response frame and flushes it to the pool.
+     */
+    void write(int status, byte[] stdout, byte[] stderr) throws IOException {
+        write(status, stdout, stderr, false);
+    }
+
+    /**
+     * Writes a response frame, "recycle" tells the pool to discard this daemon afterwards.
+     */
+    void write(int status, byte[] stdout, byte[] stderr, boolean recycle) throws IOException {
+        write(status, stdout, stderr, recycle, "");
+    }
+
+    /**
+     * Writes a response frame with the fields an executor appends to the header.
+     */
+    void write(int status, byte[] stdout, byte[] stderr, boolean recycle,
+               long outputBytes, boolean truncated, String limit) throws IOException {
+        write(status, stdout, stderr, recycle, " " + outputBytes + " " + (truncated ? 1 : 0) + " " + limit);
+    }
+
+    private void write(int status, byte[] stdout, byte[] stderr, boolean recycle, String extra) throws IOException {
+        String header = status + " " + stdout.length + " " + stderr.length + " " + (recycle ? 1 : 0) + extra + "\n";
+        out.write(header.getBytes(StandardCharsets.UTF_8));
+        out.write(stdout);
+        out.write(stderr);
+        out.flush();
+    }
+}
@@ -0,0 +1,357 @@
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.File;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.lang.reflect.Modifier;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.nio.charset.StandardCharsets;
+import java.security.Permission;
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.List;
+import java.util.Locale;
+import java.util.Properties;
+import java.util.TimeZone;
+import java.util.concurrent.locks.LockSupport;
+
+/**
+ * A pre-started JVM that runs one submission per "RUN" request inside a throwaway
+ * class loader, as if "java -cp class_path main_class args..." had been called.
+ *
+ * Request arguments: class_path, main_class, program args...
+ * The response asks the pool to recycle this JVM if the job leaked state
+ * (running threads, System.exit, changed system properties or defaults).
+ *
+ * Like the output of forked commands, only the first "executor.output.head" and the
+ * last "executor.output.tail" bytes of each stream are kept. A job writing more than
+ * "executor.output.max" bytes in total is stopped and the JVM exits after the response.
+ */
+public final class ExecutorDaemon {
+    private static final byte[] EMPTY = new byte[0];
+    private static final int OUTPUT_HEAD = Integer.getInteger("executor.output.head", 64 * 1024);
+    private static final int OUTPUT_TAIL = Integer.getInteger("executor.output.tail", 64 * 1024);
+    private static final long OUTPUT_MAX = Long.getLong("executor.output.max", 0);
+    /** The exit code a forked java killed at the output cap reports. */
+    private static final int STATUS_KILLED = -9;
+
+    /** Thrown instead of terminating the daemon when a job calls System.exit. */
+    static final class ExitTrappedException extends SecurityException {
+        final int status;
+
+        ExitTrappedException(int status) {
+            super("System.exit(" + status + ")");
+            this.status = status;
+        }
+    }
+
+    /** Allows everything, but turns System.exit of a running job into an exception. */
+    static final class ExitTrap extends SecurityManager {
+        volatile boolean trapping;
+        volatile Integer exitStatus;
+
+        @Override
+        public void checkPermission(Permission perm) {
+        }
+
+        @Override
+        public void checkPermission(Permission perm, Object context) {
+        }
+
+        @Override
+        public void checkExit(int status) {
+            if (trapping) {
+                exitStatus = status;
+                throw new ExitTrappedException(status);
+            }
+        }
+    }
+
+    /** Counts the output of both streams of a job, 0 bytes means unlimited. */
+    static final class OutputCap {
+        private final long maxBytes;
+        private long total;
+        volatile boolean exceeded;
+
+        OutputCap(long maxBytes) {
+            this.maxBytes = maxBytes;
+        }
+
+        /** Counts written bytes, the writing thread stops for good once the cap is exceeded. */
+        void count(int length) {
+            synchronized (this) {
+                total += length;
+                if (maxBytes > 0 && total > maxBytes) {
+                    exceeded = true;
+                }
+            }
+            if (exceeded) {
+                stop();
+            }
+        }
+
+        synchronized long total() {
+            return total;
+        }
+
+        /** Parks the calling thread until the JVM exits, the job must not write any more. */
+        static void stop() {
+            while (true) {
+                LockSupport.park();
+            }
+        }
+    }
+
+    /** The captured output of one stream of a job, only its head and tail are kept. */
+    static final class CappedOutput extends OutputStream {
+        private final OutputCap cap;
+        private final byte[] head;
+        private final byte[] tail;
+        private int headLength;
+        private long tailWritten;
+        private long total;
+
+        CappedOutput(OutputCap cap, int headBytes, int tailBytes) {
+            this.cap = cap;
+            this.head = new byte[Math.max(headBytes, 0)];
+            this.tail = new byte[Math.max(tailBytes, 0)];
+        }
+
+        @Override
+        public void write(int b) {
+            write(new byte[]{(byte) b}, 0, 1);
+        }
+
+        @Override
+        public void write(byte[] b, int off, int len) {
+            if (cap.exceeded) {
+                OutputCap.stop();
+            }
+            synchronized (this) {
+                total += len;
+                int toHead = Math.min(len, head.length - headLength);
+                System.arraycopy(b, off, head, headLength, toHead);
+                headLength += toHead;
+                if (tail.length > 0) {
+                    // Only the last bytes of the chunk can stay in the tail
+                    for (int i = off + Math.max(toHead, len - tail.length); i < off + len; i++) {
+                        tail[(int) (tailWritten++ % tail.length)] = b[i];
+                    }
+                }
+            }
+            // Counted outside the lock, the stopped thread must not block reading the buffer
+            cap.count(len);
+        }
+
+        synchronized boolean truncated() {
+            return total > headLength + Math.min(tailWritten, tail.length);
+        }
+
+        /** The kept output, a line between head and tail tells how much was dropped. */
+        synchronized byte[] toByteArray() {
+            ByteArrayOutputStream out = new ByteArrayOutputStream();
+            out.write(head, 0, headLength);
+            int kept = (int) Math.min(tailWritten, tail.length);
+            long omitted = total - headLength - kept;
+            if (omitted > 0) {
+                byte[] marker = ("\n... [" + omitted + " bytes of output omitted] ...\n")
+                        .getBytes(StandardCharsets.UTF_8);
+                out.write(marker, 0, marker.length);
+            }
+            for (long i = tailWritten - kept; i < tailWritten; i++) {
+                out.write(tail[(int) (i % tail.length)]);
+            }
+            return out.toByteArray();
+        }
+    }
+
+    public static void main(String[] args) throws IOException {
+        PrintStream protocolOut = System.out;
+        InputStream protocolIn = System.in;
+        PrintStream daemonErr = System.err;
+        DaemonProtocol protocol = new DaemonProtocol(protocolIn, protocolOut);
+
+        ExitTrap trap = new ExitTrap();
+        System.setSecurityManager(trap);
+
+        String[] request;
+        while ((request = protocol.read()) != null) {
+            switch (request[0]) {
+                case "PING":
+                    protocol.write(0, "PONG".getBytes(), EMPTY);
+                    break;
+                case "RUN":
+                    OutputCap cap = new OutputCap(OUTPUT_MAX);
+                    CappedOutput stdout = new CappedOutput(cap, OUTPUT_HEAD, OUTPUT_TAIL);
+                    CappedOutput stderr = new CappedOutput(cap, OUTPUT_HEAD, OUTPUT_TAIL);
+                    ThreadGroup group = new ThreadGroup("job");
+                    Properties properties = (Properties) System.getProperties().clone();
+                    Locale locale = Locale.getDefault();
+                    TimeZone timeZone = TimeZone.getDefault();
+
+                    // Autoflushing streams pass every print on at once, flushing them could
+                    // wait for a job thread stopped at the cap
+                    System.setIn(new ByteArrayInputStream(EMPTY));
+                    System.setOut(new PrintStream(stdout, true));
+                    System.setErr(new PrintStream(stderr, true));
+                    int status;
+                    try {
+                        status = run(trap, cap, group, request[1], request[2],
+                                     Arrays.copyOfRange(request, 3, request.length));
+                    } finally {
+                        System.setIn(protocolIn);
+                        System.setOut(daemonErr);
+                        System.setErr(daemonErr);
+                    }
+
+                    boolean leaked = cap.exceeded
+                            || trap.exitStatus != null
+                            || group.activeCount() > 0
+                            || !properties.equals(System.getProperties())
+                            || !locale.equals(Locale.getDefault())
+                            || !timeZone.equals(TimeZone.getDefault());
+                    protocol.write(cap.exceeded ? STATUS_KILLED : status, stdout.toByteArray(), stderr.toByteArray(),
+                                   leaked, cap.total(), stdout.truncated() || stderr.truncated(),
+                                   cap.exceeded ? "output" : "-");
+                    if (leaked) {
+                        Runtime.getRuntime().halt(0);
+                    }
+                    break;
+                default:
+                    protocol.write(2, EMPTY, ("Unknown command " + request[0]).getBytes());
+            }
+        }
+
+        // Leftover non-daemon threads of jobs must not keep the JVM alive
+        Runtime.getRuntime().halt(0);
+    }
+
+    /**
+     * Loads "mainClass" from "classPath" and runs its main method in a thread group of
+     * its own, waiting for all non-daemon threads of the job like the java launcher.
+     *
+     * @return The exit status the java command would have returned.
+     */
+    private static int run(ExitTrap trap, OutputCap cap, ThreadGroup group,
+                           String classPath, String mainClass, String[] args) {
+        URLClassLoader loader;
+        try {
+            List<URL> urls = new ArrayList<>();
+            for (String entry : classPath.split(File.pathSeparator)) {
+                if (!entry.isEmpty()) {
+                    urls.add(new File(entry).toURI().toURL());
+                }
+            }
+            loader = new URLClassLoader(urls.toArray(new URL[0]), ClassLoader.getPlatformClassLoader());
+        } catch (IOException e) {
+            System.err.println("Error: " + e);
+            return 1;
+        }
+
+        Method main;
+        try {
+            Class<?> cls = Class.forName(mainClass, false, loader);
+            main = cls.getMethod("main", String[].class);
+            if (!Modifier.isStatic(main.getModifiers())) {
+                throw new NoSuchMethodException();
+            }
+        } catch (ClassNotFoundException | LinkageError e) {
+            System.err.println("Error: Could not find or load main class " + mainClass);
+            System.err.println("Caused by: " + e);
+            return 1;
+        } catch (NoSuchMethodException e) {
+            System.err.println("Error: Main method not found in class " + mainClass
+                    + ", please define the main method as:");
+            System.err.println("   public static void main(String[] args)");
+            return 1;
+        }
+
+        int[] status = {0};
+        Thread thread = new Thread(group, () -> {
+            try {
+                main.invoke(null, (Object) args);
+            } catch (InvocationTargetException e) {
+                Throwable cause = e.getCause();
+                if (cause instanceof ExitTrappedException) {
+                    return;
+                }
+                System.err.print("Exception in thread \"main\" ");
+                trimStackTrace(cause, mainClass);
+                cause.printStackTrace();
+                status[0] = 1;
+            } catch (IllegalAccessException e) {
+                System.err.println("Error: " + e);
+                status[0] = 1;
+            }
+        }, "main");
+        thread.setContextClassLoader(loader);
+
+        trap.exitStatus = null;
+        trap.trapping = true;
+        try {
+            thread.start();
+            joinNonDaemonThreads(trap, cap, group, thread);
+        } finally {
+            trap.trapping = false;
+            try {
+                loader.close();
+            } catch (IOException ignored) {
+                // Only releases jar file handles
+            }
+        }
+
+        if (trap.exitStatus != null) {
+            return trap.exitStatus;
+        }
+        return status[0];
+    }
+
+    private static void joinNonDaemonThreads(ExitTrap trap, OutputCap cap, ThreadGroup group, Thread main) {
+        joinQuietly(trap, cap, main);
+        while (trap.exitStatus == null && !cap.exceeded) {
+            Thread[] threads = new Thread[group.activeCount() + 1];
+            int count = group.enumerate(threads);
+            Thread pending = null;
+            for (int i = 0; i < count; i++) {
+                if (!threads[i].isDaemon() && threads[i].isAlive()) {
+                    pending = threads[i];
+                    break;
+                }
+            }
+            if (pending == null) {
+                return;
+            }
+            joinQuietly(trap, cap, pending);
+        }
+    }
+
+    /**
+     * Waits for "thread" unless the job calls System.exit, which ends it like the JVM would,
+     * or exceeds the output cap.
+     */
+    private static void joinQuietly(ExitTrap trap, OutputCap cap, Thread thread) {
+        try {
+            while (thread.isAlive() && trap.exitStatus == null && !cap.exceeded) {
+                thread.join(50);
+            }
+        } catch (InterruptedException e) {
+            Thread.currentThread().interrupt();
+        }
+    }
+
+    /** Drops the daemon's own reflection frames below the job's main method. */
+    private static void trimStackTrace(Throwable error, String mainClass) {
+        StackTraceElement[] trace = error.getStackTrace();
+        for (int i = trace.length - 1; i >= 0; i--) {
+            if (trace[i].getClassName().equals(mainClass) && trace[i].getMethodName().equals("main")) {
+                error.setStackTrace(Arrays.copyOf(trace, i + 1));
+                return;
+            }
+        }
+    }
+}
@@ -0,0 +1,59 @@
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from blueprints.serverless_testing.daemons.jvm import DaemonPool, DaemonError, DaemonTimeout
+from blueprints.serverless_testing.helpers import env_flag, env_int, flatten_output, elapsed_ms
+from blueprints.serverless_testing.limits import LIMIT_WALL, job_limits, limit_message, record_usage
+from blueprints.serverless_testing.supervisor import exec_slot
+
+# GLOBALS
+COMPILER_DAEMON_ENABLED = env_flag('COMPILER_DAEMON', True)
+COMPILER_DAEMON_POOL_SIZE = env_int('COMPILER_DAEMON_POOL_SIZE', 2)
+COMPILER_DAEMON_MAX_COMPILATIONS = env_int('COMPILER_DAEMON_MAX_COMPILATIONS', 200)
+COMPILER_DAEMON_TIMEOUT = env_int('COMPILER_DAEMON_TIMEOUT', 60)
+COMPILER_DAEMON_JVM_OPTS = os.environ.get('COMPILER_DAEMON_JVM_OPTS', '-Xss4m -XX:+UseSerialGC').split()
+
+# A compilation on a daemon is stopped at its own timeout, like a spawned javac at the one of a job
+COMPILER_LIMITS = job_limits('javac')._replace(timeout=COMPILER_DAEMON_TIMEOUT)
+
+compiler_pool = DaemonPool(main_class='CompilerDaemon',
+                           size=COMPILER_DAEMON_POOL_SIZE,
+                           max_jobs=COMPILER_DAEMON_MAX_COMPILATIONS,
+                           jvm_args=COMPILER_DAEMON_JVM_OPTS)
+
+
+def compile_in_daemon(javac_args: List[str]) -> Optional[Tuple[Optional[str], Optional[str], Dict[str, Any]]]:
+    """Compiles with a warm compiler daemon instead of spawning a new javac JVM. Like a
+    spawned javac, the compilation takes a slot of the event loop, see "exec_slot".
+
+    :param javac_args: The javac arguments without the javac executable itself.
+    :type javac_args: List[str]
+
+    :return: The stdout, stderr and usage of the compilation like "run_limited" returns
+        them, or None if no daemon could handle the request and javac should be spawned.
+        A compilation that timed out is not spawned again.
+    :rtype: Optional[Tuple[Optional[str], Optional[str], Dict[str, Any]]]
+    """
+    if not COMPILER_DAEMON_ENABLED:
+        return None
+
+    # Like the executor pool, only the wall time of a compilation can be measured
+    start = time.monotonic()
+    usage = {'tool': 'compiler', 'exit_code': None, 'cpu_ms': None, 'max_rss_kb': None, 'limit': None}
+    try:
+        with exec_slot(), compiler_pool.acquire() as daemon:
+            if daemon is None:
+                return None
+            status, stdout, stderr = daemon.request('COMPILE', javac_args, timeout=COMPILER_DAEMON_TIMEOUT)
+    except DaemonTimeout:
+        # A spawned javac would only use up the budget a second time
+        usage = dict(usage, wall_ms=elapsed_ms(start), limit=LIMIT_WALL)
+        record_usage(usage, cmd=['javac'] + javac_args)
+        return None, limit_message(LIMIT_WALL, COMPILER_LIMITS), usage
+    except (DaemonError, ValueError):
+        return None
+
+    usage = dict(usage, wall_ms=elapsed_ms(start), exit_code=status)
+    record_usage(usage, cmd=['javac'] + javac_args)
+    return flatten_output(stdout), flatten_output(stderr), usage
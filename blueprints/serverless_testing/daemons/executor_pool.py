@@ -0,0 +1,97 @@
+import os
+import time
+from typing import List, Optional, Tuple
+
+from blueprints.serverless_testing.daemons.jvm import DaemonPool, DaemonError, DaemonTimeout
+from blueprints.serverless_testing.helpers import OUTPUT_HEAD_KB, OUTPUT_TAIL_KB, env_int, flatten_output, elapsed_ms
+from blueprints.serverless_testing.limits import JOB_TIMEOUT, LIMIT_WALL, job_limits, limit_message, record_usage
+from blueprints.serverless_testing.supervisor import exec_slot
+
+# GLOBALS
+JAVA_RUN_MODE_POOL = 'pool'
+JAVA_RUN_MODE_FORK = 'fork'
+JAVA_RUN_MODE = os.environ.get('JAVA_RUN_MODE', JAVA_RUN_MODE_FORK)
+EXECUTOR_POOL_SIZE = env_int('EXECUTOR_POOL_SIZE', 4)
+EXECUTOR_POOL_WARM = env_int('EXECUTOR_POOL_WARM', 2)
+EXECUTOR_MAX_JOBS = env_int('EXECUTOR_MAX_JOBS', 1)
+EXECUTOR_TIMEOUT = env_int('EXECUTOR_TIMEOUT', JOB_TIMEOUT)
+EXECUTOR_JVM_OPTS = os.environ.get('EXECUTOR_JVM_OPTS', '-XX:+UseSerialGC').split()
+
+# A pooled JVM runs within the limits of a forked java, they count for all of its "EXECUTOR_MAX_JOBS" jobs
+EXECUTOR_LIMITS = job_limits('java')._replace(timeout=EXECUTOR_TIMEOUT)
+
+executor_pool = DaemonPool(main_class='ExecutorDaemon',
+                           size=EXECUTOR_POOL_SIZE,
+                           max_jobs=EXECUTOR_MAX_JOBS,
+                           jvm_args=EXECUTOR_JVM_OPTS + [
+                               '-Dexecutor.output.head={0}'.format(OUTPUT_HEAD_KB * 1024),
+                               '-Dexecutor.output.tail={0}'.format(OUTPUT_TAIL_KB * 1024),
+                               '-Dexecutor.output.max={0}'.format(EXECUTOR_LIMITS.output_bytes)],
+                           warm=EXECUTOR_POOL_WARM,
+                           limits=EXECUTOR_LIMITS)
+
+
+def run_cwd(work_path: str) -> Optional[str]:
+    """The working dir a program of "work_path" is run in. A pooled JVM can not change
+    its working dir, so in pool mode programs get none and run in the pool like before
+    jobs had workspaces, otherwise they are forked in "work_path".
+
+    :param work_path: The workspace of the job.
+    :type work_path: str
+
+    :return: The working dir or None if the program runs in the pool.
+    :rtype: Optional[str]
+    """
+    return None if JAVA_RUN_MODE == JAVA_RUN_MODE_POOL else work_path
+
+
+def run_in_executor(class_path: str,
+                    main_file: str,
+                    args: List[str]) -> Optional[Tuple[Optional[str], Optional[str]]]:
+    """Runs the main class inside a pre-started JVM instead of forking a new java process.
+    Each job gets a fresh class loader, the JVM is recycled after "EXECUTOR_MAX_JOBS"
+    jobs or as soon as a job leaked state. Like a forked java, the JVM runs within the
+    job limits and only the head and tail of the output are kept, a job exceeding the
+    output cap is stopped together with its JVM. The job takes a slot of the event loop
+    like a forked java, see "exec_slot".
+
+    :param class_path: The path to look for the compiled class files.
+    :type class_path: str
+    :param main_file: Name of the class with the main method.
+    :type main_file: str
+    :param args: The arguments passed to the main method.
+    :type args: List[str]
+
+    :return: The stdout and stderr of the program like "run_cmd" returns them, or None
+        if no executor could take the job and the java command should be forked.
+    :rtype: Optional[Tuple[Optional[str], Optional[str]]]
+    """
+    if JAVA_RUN_MODE != JAVA_RUN_MODE_POOL:
+        return None
+
+    # CPU time and memory of a job can not be told apart from the ones of the shared JVM
+    start = time.monotonic()
+    usage = {'tool': 'executor', 'exit_code': None, 'cpu_ms': None, 'max_rss_kb': None, 'limit': None}
+    daemon = None
+    try:
+        with exec_slot(), executor_pool.acquire() as daemon:
+            if daemon is None:
+                return None
+            status, stdout, stderr = daemon.request('RUN', [class_path, main_file] + args, timeout=EXECUTOR_TIMEOUT)
+    except DaemonTimeout:
+        # Running the program again in a fresh process would only time out again
+        record_usage(dict(usage, wall_ms=elapsed_ms(start), limit=LIMIT_WALL), cmd=[main_file] + args)
+        return None, 'Execution timed out after {0} seconds'.format(EXECUTOR_TIMEOUT)
+    except (DaemonError, ValueError):
+        # Same for a JVM stopped by its CPU or memory limit, it died with the job
+        if daemon is None or daemon.limit is None:
+            return None
+        record_usage(dict(usage, wall_ms=elapsed_ms(start), limit=daemon.limit), cmd=[main_file] + args)
+        return None, limit_message(daemon.limit, EXECUTOR_LIMITS)
+
+    record_usage(dict(usage, wall_ms=elapsed_ms(start), exit_code=status, output_bytes=daemon.output_bytes,
+                      truncated=daemon.truncated, limit=daemon.limit), cmd=[main_file] + args)
+    stdout_text, stderr_text = flatten_output(stdout), flatten_output(stderr)
+    if daemon.limit is not None:
+        stderr_text = ((stderr_text or '') + '\n' + limit_message(daemon.limit, EXECUTOR_LIMITS)).strip()
+    return stdout_text, stderr_text
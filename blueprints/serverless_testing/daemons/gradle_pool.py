@@ -0,0 +1,160 @@
+import fcntl
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from blueprints.serverless_testing.helpers import GRADLE_PATH, env_flag, env_int, run_cmd
+from blueprints.serverless_testing.limits import CPU_GRACE, Limits, create_cgroup, job_limits, kill_cgroup, \
+    remove_cgroup
+from blueprints.serverless_testing.metrics import QUEUE_DEPTH
+
+# GLOBALS
+GRADLE_DAEMON_ENABLED = env_flag('GRADLE_DAEMON', True)
+GRADLE_USER_HOME = os.environ.get('GRADLE_POOL_USER_HOME', os.path.join(tempfile.gettempdir(), 'gradle-home'))
+GRADLE_DAEMON_POOL_SIZE = env_int('GRADLE_DAEMON_POOL_SIZE', 2)
+GRADLE_DAEMON_IDLE_TIMEOUT = env_int('GRADLE_DAEMON_IDLE_TIMEOUT', 600)
+GRADLE_DAEMON_MAX_HEAP = os.environ.get('GRADLE_DAEMON_MAX_HEAP', '512m')
+
+LIMITS_INIT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'limits.gradle')
+LIMITED_JAVA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'limited-java.sh')
+
+_setup_lock = threading.Lock()
+_setup_done = False
+
+
+def ensure_gradle_user_home():
+    """Writes the "gradle.properties" of the shared gradle user home. Properties of the
+    user home win over the ones of a project, so every build asks for the same daemon
+    settings and can reuse any idle daemon of the pool.
+    """
+    global _setup_done
+
+    with _setup_lock:
+        if _setup_done:
+            return
+
+        os.makedirs(os.path.join(GRADLE_USER_HOME, 'pool'), exist_ok=True)
+        properties = '\n'.join([
+            'org.gradle.daemon=true',
+            'org.gradle.daemon.idletimeout={0}'.format(GRADLE_DAEMON_IDLE_TIMEOUT * 1000),
+            'org.gradle.jvmargs=-Xmx{0} -XX:+UseSerialGC'.format(GRADLE_DAEMON_MAX_HEAP),
+            'org.gradle.console=plain',
+            'org.gradle.welcome=never',
+        ]) + '\n'
+
+        # Written atomically, the other gunicorn workers may read it at the same time
+        path = os.path.join(GRADLE_USER_HOME, 'gradle.properties')
+        tmp_path = '{0}.{1}'.format(path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            f.write(properties)
+        os.replace(tmp_path, path)
+
+        _setup_done = True
+
+
+def gradle_daemon_args() -> List[str]:
+    """The gradle options that route a build to the warm daemons of the pool.
+
+    :return: The gradle command line options.
+    :rtype: List[str]
+    """
+    if not GRADLE_DAEMON_ENABLED:
+        return ['--no-daemon']
+
+    ensure_gradle_user_home()
+    return ['--daemon', '--gradle-user-home', GRADLE_USER_HOME]
+
+
+def gradle_limits() -> Limits:
+    """The limits of a gradle command. With the pool the build runs on a warm daemon the
+    command only talks to, and a daemon it starts inherits the rlimits and the cgroup of
+    the command. So only the timeout and the output cap apply to the command, the daemons
+    are bounded by "GRADLE_DAEMON_MAX_HEAP" and "GRADLE_DAEMON_POOL_SIZE" and the JVMs
+    the build forks by "child_limits".
+
+    :return: The limits.
+    :rtype: Limits
+    """
+    limits = job_limits('gradle')
+    if not GRADLE_DAEMON_ENABLED:
+        return limits
+    return limits._replace(cpu_seconds=0, memory_bytes=0, processes=0)
+
+
+@contextmanager
+def child_limits() -> Iterator[List[str]]:
+    """The gradle options that run the JVMs a build on the pool forks, the program of
+    "gradle run" and the test JVMs of "gradle test", within the CPU, memory and process
+    limits of a forked java. The daemon forks them through "limited-java.sh", they share
+    a cgroup of the build that is killed and removed with everything left in it once the
+    build is over. Without the pool the JVMs inherit the limits of the gradle command.
+
+    :return: The gradle command line options.
+    :rtype: Iterator[List[str]]
+    """
+    if not GRADLE_DAEMON_ENABLED:
+        yield []
+        return
+
+    limits = job_limits('java')
+    cgroup = create_cgroup(limits)
+    try:
+        yield ['--init-script', LIMITS_INIT_SCRIPT,
+               '-Dquellcoda.limitedJava=' + LIMITED_JAVA,
+               '-Dquellcoda.cgroup=' + (cgroup or ''),
+               '-Dquellcoda.cpuSeconds={0}'.format(limits.cpu_seconds),
+               '-Dquellcoda.cpuGrace={0}'.format(CPU_GRACE),
+               '-Dquellcoda.memoryKb={0}'.format(limits.memory_bytes // 1024)]
+    finally:
+        if cgroup is not None:
+            kill_cgroup(cgroup)
+            remove_cgroup(cgroup)
+
+
+@contextmanager
+def gradle_slot() -> Iterator[int]:
+    """Waits for one of the "GRADLE_DAEMON_POOL_SIZE" build slots. Slots are file locks
+    in the shared gradle user home, so the bound holds across all gunicorn workers and
+    gradle never has to start more daemons than there are slots.
+
+    :return: The number of the acquired slot.
+    :rtype: Iterator[int]
+    """
+    if not GRADLE_DAEMON_ENABLED:
+        yield -1
+        return
+
+    ensure_gradle_user_home()
+    slots = [open(os.path.join(GRADLE_USER_HOME, 'pool', 'slot-{0}.lock'.format(i)), 'w')
+             for i in range(max(GRADLE_DAEMON_POOL_SIZE, 1))]
+    QUEUE_DEPTH.labels('gradle').inc()
+    queued = True
+    try:
+        while True:
+            for i, slot in enumerate(slots):
+                try:
+                    fcntl.flock(slot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                QUEUE_DEPTH.labels('gradle').dec()
+                queued = False
+                try:
+                    yield i
+                finally:
+                    fcntl.flock(slot, fcntl.LOCK_UN)
+                return
+            time.sleep(0.05)
+    finally:
+        if queued:
+            QUEUE_DEPTH.labels('gradle').dec()
+        for slot in slots:
+            slot.close()
+
+
+def stop_daemons():
+    """Stops all daemons of the pool, e.g. before the container shuts down.
+    """
+    run_cmd([GRADLE_PATH, '--stop', '--gradle-user-home', GRADLE_USER_HOME])
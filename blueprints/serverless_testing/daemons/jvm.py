@@ -0,0 +1,358 @@
+import fcntl
+import glob
+import os
+import select
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple, Iterator
+
+from blueprints.serverless_testing.cds import jvm_flags
+from blueprints.serverless_testing.helpers import JAVA_PATH, JAVAC_PATH, run_cmd
+from blueprints.serverless_testing.limits import Limits, apply_limits, create_cgroup, exceeded_limit, kill_cgroup, \
+    remove_cgroup
+
+# GLOBALS
+DAEMON_SOURCES_PATH = os.path.dirname(os.path.abspath(__file__))
+DAEMON_CLASSES_PATH = os.environ.get('DAEMON_CLASSES_PATH', os.path.join(DAEMON_SOURCES_PATH, 'classes'))
+
+_build_lock = threading.Lock()
+_build_ok = None
+
+
+class DaemonError(Exception):
+    """Raised if a daemon died, timed out or answered with a broken frame.
+    The daemon is unusable afterwards and has to be killed.
+    """
+
+
+class DaemonTimeout(DaemonError):
+    """Raised if a daemon did not answer within the timeout of the request.
+    """
+
+
+def build_daemon_classes() -> bool:
+    """Compiles the daemon sources next to this module into "DAEMON_CLASSES_PATH"
+    unless up-to-date class files are already present (e.g. built into the image).
+    Concurrent workers are serialized with a file lock.
+
+    :return: True if the daemon classes are ready to use.
+    :rtype: bool
+    """
+    global _build_ok
+
+    with _build_lock:
+        if _build_ok is not None:
+            return _build_ok
+
+        sources = sorted(glob.glob(os.path.join(DAEMON_SOURCES_PATH, '*.java')))
+        try:
+            os.makedirs(DAEMON_CLASSES_PATH, exist_ok=True)
+            with open(os.path.join(DAEMON_CLASSES_PATH, '.lock'), 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+
+                if not _classes_up_to_date(sources):
+                    stdout, stderr = run_cmd([JAVAC_PATH, '-d', DAEMON_CLASSES_PATH] + sources)
+                    if stderr is not None and not _classes_up_to_date(sources):
+                        _build_ok = False
+                        return _build_ok
+        except OSError:
+            _build_ok = False
+            return _build_ok
+
+        _build_ok = _classes_up_to_date(sources)
+        return _build_ok
+
+
+def _classes_up_to_date(sources: List[str]) -> bool:
+    """Checks if every daemon source has a class file newer than itself.
+
+    :param sources: The daemon source files.
+    :type sources: List[str]
+
+    :return: True if nothing needs to be recompiled.
+    :rtype: bool
+    """
+    for src in sources:
+        class_file = os.path.join(DAEMON_CLASSES_PATH,
+                                  os.path.splitext(os.path.basename(src))[0] + '.class')
+        if not os.path.exists(class_file) or os.path.getmtime(class_file) < os.path.getmtime(src):
+            return False
+    return True
+
+
+class JvmDaemon:
+    """A single long-lived JVM speaking the "DaemonProtocol" over its stdin and stdout.
+    A daemon handles one request at a time, the owning pool guarantees that. With
+    "limits" the JVM runs within the CPU, memory and process limits of a job, they
+    count for all requests the JVM handles.
+    """
+
+    def __init__(self, main_class: str, jvm_args: List[str], limits: Optional[Limits] = None):
+        self.main_class = main_class
+        self.jobs = 0
+        self.recycle = False
+        self.last_used = time.monotonic()
+        self.limits = limits
+        # Set by the last request of an executor, or once the JVM was stopped by a limit
+        self.output_bytes = None
+        self.truncated = False
+        self.limit = None
+        self.cgroup = create_cgroup(limits) if limits is not None else None
+        cmd = [JAVA_PATH] + jvm_flags('java') + jvm_args + ['-cp', DAEMON_CLASSES_PATH, main_class]
+        self.process = subprocess.Popen(cmd,
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL,
+                                        bufsize=0)
+        if limits is not None:
+            apply_limits(self.process.pid, limits, self.cgroup)
+        self._buffer = bytearray()
+
+    def alive(self) -> bool:
+        """Checks if the JVM process is still running.
+
+        :return: True if the process did not exit yet.
+        :rtype: bool
+        """
+        return self.process.poll() is None
+
+    def ping(self, timeout: float) -> bool:
+        """Health check, the daemon has to answer "PONG" within "timeout" seconds.
+
+        :param timeout: Seconds to wait for the answer.
+        :type timeout: float
+
+        :return: True if the daemon is healthy.
+        :rtype: bool
+        """
+        try:
+            status, out, _ = self.request('PING', [], timeout)
+        except DaemonError:
+            return False
+        return status == 0 and out == b'PONG'
+
+    def request(self, command: str, args: List[str], timeout: float) -> Tuple[int, bytes, bytes]:
+        """Sends one request and waits for its response frame.
+
+        :param command: The daemon command, e.g. "COMPILE".
+        :type command: str
+        :param args: The arguments of the command, must not contain line breaks.
+        :type args: List[str]
+        :param timeout: Seconds to wait for the complete response.
+        :type timeout: float
+
+        :return: The status code, stdout and stderr of the request.
+        :rtype: Tuple[int, bytes, bytes]
+        """
+        if any('\n' in arg or '\r' in arg for arg in args):
+            raise ValueError('Daemon arguments must not contain line breaks')
+
+        frame = '{0} {1}\n'.format(command, len(args)) + ''.join(arg + '\n' for arg in args)
+        deadline = time.monotonic() + timeout
+        try:
+            self.process.stdin.write(frame.encode())
+            self.process.stdin.flush()
+
+            header = self._read_line(deadline).decode().split(' ')
+            status, out_len, err_len = int(header[0]), int(header[1]), int(header[2])
+            out = self._read_exact(out_len, deadline)
+            err = self._read_exact(err_len, deadline)
+        except (OSError, ValueError, IndexError) as e:
+            raise DaemonError(str(e))
+
+        # The daemon asks to be discarded, e.g. because a job leaked state
+        if len(header) > 3 and header[3] == '1':
+            self.recycle = True
+        # Executors count the output of the job and name the limit that stopped it
+        if len(header) > 6:
+            self.output_bytes = int(header[4])
+            self.truncated = header[5] == '1'
+            self.limit = None if header[6] == '-' else header[6]
+
+        self.last_used = time.monotonic()
+        return status, out, err
+
+    def kill(self):
+        """Stops the JVM, closing stdin lets it exit on its own first. A JVM that exited
+        before tells by its exit code whether it was stopped by a limit, see "limit".
+        """
+        exited = self.process.poll() is not None
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+
+        if self.cgroup is not None:
+            kill_cgroup(self.cgroup)
+        if exited and self.limits is not None:
+            self.limit = self.limit or exceeded_limit(self.limits, self.process.returncode, None, self.cgroup)
+        if self.cgroup is not None:
+            remove_cgroup(self.cgroup)
+            self.cgroup = None
+
+    def _fill(self, deadline: float):
+        """Reads whatever the daemon has written so far into the buffer.
+
+        :param deadline: Monotonic time after which the daemon counts as hanging.
+        :type deadline: float
+        """
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DaemonTimeout('Daemon timed out')
+
+        fd = self.process.stdout.fileno()
+        readable, _, _ = select.select([fd], [], [], remaining)
+        if not readable:
+            raise DaemonTimeout('Daemon timed out')
+
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            raise DaemonError('Daemon exited')
+        self._buffer.extend(chunk)
+
+    def _read_line(self, deadline: float) -> bytes:
+        while b'\n' not in self._buffer:
+            self._fill(deadline)
+        line, _, rest = bytes(self._buffer).partition(b'\n')
+        self._buffer = bytearray(rest)
+        return line
+
+    def _read_exact(self, size: int, deadline: float) -> bytes:
+        while len(self._buffer) < size:
+            self._fill(deadline)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
+class DaemonPool:
+    """A bounded pool of warm "JvmDaemon"s of the same main class. Daemons are health
+    checked before reuse and recycled after "max_jobs" requests or any failure.
+    With "warm" > 0 the pool keeps that many daemons started ahead of time, so
+    recycled daemons are replaced in the background instead of in the next request.
+    With "limits" every daemon runs within them, see "JvmDaemon".
+    """
+
+    def __init__(self,
+                 main_class: str,
+                 size: int,
+                 max_jobs: int,
+                 jvm_args: List[str],
+                 health_interval: float = 30.0,
+                 warm: int = 0,
+                 limits: Optional[Limits] = None):
+        self.main_class = main_class
+        self.size = size
+        self.max_jobs = max_jobs
+        self.jvm_args = jvm_args
+        self.limits = limits
+        self.health_interval = health_interval
+        self.warm = warm
+        self._idle = []
+        self._busy = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self) -> Iterator[Optional[JvmDaemon]]:
+        """Checks out a healthy daemon for one request. Yields None if the pool is
+        exhausted or daemons are unavailable, callers then use their subprocess path.
+        Raising "DaemonError" inside the block discards the daemon.
+
+        :return: A daemon or None.
+        :rtype: Iterator[Optional[JvmDaemon]]
+        """
+        daemon = self._checkout()
+        if daemon is None:
+            yield None
+            return
+
+        failed = True
+        try:
+            yield daemon
+            failed = False
+        finally:
+            daemon.jobs += 1
+            self._checkin(daemon, discard=failed or daemon.recycle or daemon.jobs >= self.max_jobs)
+            if self.warm > 0:
+                self.prestart(self.warm)
+
+    def prestart(self, count: Optional[int] = None):
+        """Starts idle daemons in the background so the next requests find a warm JVM.
+
+        :param count: Number of daemons to have idle, defaults to the pool size.
+        :type count: Optional[int]
+        """
+        count = self.size if count is None else min(count, self.size)
+        threading.Thread(target=self._fill_idle, args=(count,), daemon=True).start()
+
+    def shutdown(self):
+        """Kills all idle daemons, busy ones are killed when checked in.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for daemon in idle:
+            daemon.kill()
+
+    def _fill_idle(self, count: int):
+        while True:
+            with self._lock:
+                if len(self._idle) >= count or len(self._idle) + self._busy >= self.size:
+                    return
+                self._busy += 1
+            daemon = self._spawn()
+            with self._lock:
+                self._busy -= 1
+                if daemon is None:
+                    return
+                self._idle.append(daemon)
+
+    def _checkout(self) -> Optional[JvmDaemon]:
+        with self._lock:
+            if self._busy >= self.size:
+                return None
+            self._busy += 1
+
+        while True:
+            with self._lock:
+                daemon = self._idle.pop() if self._idle else None
+            if daemon is None:
+                break
+            if self._healthy(daemon):
+                return daemon
+            daemon.kill()
+
+        daemon = self._spawn()
+        if daemon is None:
+            with self._lock:
+                self._busy -= 1
+        return daemon
+
+    def _checkin(self, daemon: JvmDaemon, discard: bool):
+        if discard or not daemon.alive():
+            daemon.kill()
+            with self._lock:
+                self._busy -= 1
+            return
+
+        with self._lock:
+            self._busy -= 1
+            self._idle.append(daemon)
+
+    def _healthy(self, daemon: JvmDaemon) -> bool:
+        if not daemon.alive():
+            return False
+        if time.monotonic() - daemon.last_used < self.health_interval:
+            return True
+        return daemon.ping(timeout=5)
+
+    def _spawn(self) -> Optional[JvmDaemon]:
+        if not build_daemon_classes():
+            return None
+        try:
+            return JvmDaemon(self.main_class, self.jvm_args, limits=self.limits)
+        except OSError:
+            return None
@@ -0,0 +1,19 @@
+#!/bin/sh
+# Starts a JVM forked by a gradle build on the daemon pool within the job limits, see limits.gradle.
+# QUELLCODA_JAVA is the java the build would have started. The JVM joins the cgroup of the build, which is
+# killed and removed after the build, without one its memory is bounded by an rlimit like a forked java.
+set -e
+
+if [ -n "$QUELLCODA_CGROUP" ] && { echo $$ > "$QUELLCODA_CGROUP/cgroup.procs"; } 2>/dev/null; then
+    :
+elif [ "${QUELLCODA_MEMORY_KB:-0}" -gt 0 ]; then
+    ulimit -d "$QUELLCODA_MEMORY_KB"
+fi
+
+# SIGXCPU at the soft limit, SIGKILL at the hard one
+if [ "${QUELLCODA_CPU_SECONDS:-0}" -gt 0 ]; then
+    ulimit -t $((QUELLCODA_CPU_SECONDS + ${QUELLCODA_CPU_GRACE:-0}))
+    ulimit -S -t "$QUELLCODA_CPU_SECONDS"
+fi
+
+exec "$QUELLCODA_JAVA" "$@"
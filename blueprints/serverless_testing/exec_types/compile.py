@@ -1,12 +1,21 @@
-from typing import Optional, List, Tuple
-from blueprints.serverless_testing.helpers import JAVAC_PATH, run_cmd
+import os
+import time
+from typing import Any, Dict, Optional, List, Tuple
+from blueprints.serverless_testing import compile_cache
+from blueprints.serverless_testing.cds import jvm_flags
+from blueprints.serverless_testing.daemons.compiler_pool import compile_in_daemon
+from blueprints.serverless_testing.helpers import JAVAC_PATH
+from blueprints.serverless_testing.limits import job_limits, run_limited
+from blueprints.serverless_testing.timings import add_timing
 
 
 def javac(file_paths: List[str],
           out_path: str,
-          class_path: str) -> Tuple[Optional[str], Optional[str]]:
+          class_path: str,
+          source_path: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
     """Runs javac cmd to compile "files" located at "work_path" and outputs result
     into destination "out_path". Adds "class_path" to javac command.
+    A warm compiler daemon is used if available, otherwise javac gets spawned.
 
     :param file_paths: The java file paths to be compiled.
     :type file_paths: List[str]
@@ -14,16 +23,71 @@ def javac(file_paths: List[str],
     :type out_path: str
     :param class_path: The class-path to get added to javac command.
     :type class_path: str
+    :param source_path: Sources the files may refer to, they are only read and not compiled.
+    :type source_path: Optional[str]
 
     :return: The stdout and stderr after javac command.
     :rtype: Tuple[Optional[str], Optional[str]]
     """
-    compile_cmd = [JAVAC_PATH, '-d', out_path, '-cp', class_path]
+    javac_stdout, javac_stderr, _ = _javac(file_paths, out_path, class_path, source_path)
+
+    return javac_stdout, javac_stderr
+
+
+def _javac(file_paths: List[str],
+           out_path: str,
+           class_path: str,
+           source_path: Optional[str] = None) -> Tuple[Optional[str], Optional[str], Dict[str, Any]]:
+    javac_args = ['-d', out_path, '-cp', class_path]
+    if source_path is not None:
+        javac_args += ['-sourcepath', source_path, '-implicit:none']
 
     # Append all java file paths that should be compiled
     for fp in file_paths:
-        compile_cmd.append(fp)
+        javac_args.append(fp)
+
+    # Prefer a warm compiler daemon, fall back to a fresh javac process
+    result = compile_in_daemon(javac_args)
+    if result is not None:
+        return result
+
+    # Map the javac class data sharing archive, if one was built
+    compile_cmd = [JAVAC_PATH] + ['-J' + flag for flag in jvm_flags('javac')] + javac_args
+
+    return run_limited(compile_cmd, limits=job_limits('javac'))
+
+
+def javac_cached(file_paths: List[str],
+                 out_path: str,
+                 class_path: str) -> Tuple[Optional[str], Optional[str]]:
+    """Like :meth:javac, but restores identical earlier compilations (same sources,
+    filenames, class-path and JDK) from the compile cache without running javac.
+
+    :param file_paths: The java file paths to be compiled.
+    :type file_paths: List[str]
+    :param out_path: The destination path the .class files should be put.
+    :type out_path: str
+    :param class_path: The class-path to get added to javac command.
+    :type class_path: str
+
+    :return: The stdout and stderr after javac command.
+    :rtype: Tuple[Optional[str], Optional[str]]
+    """
+    source_dir = os.path.commonpath([os.path.dirname(os.path.abspath(fp)) for fp in file_paths])
+    key = compile_cache.cache_key(file_paths, class_path, out_path)
+
+    start = time.monotonic()
+    cached = compile_cache.lookup(key, out_path, source_dir)
+    add_timing('compile_cache', time.monotonic() - start)
+    if cached is not None:
+        return cached
 
-    javac_stdout, javac_stderr = run_cmd(compile_cmd)
+    javac_stdout, javac_stderr, usage = _javac(file_paths=file_paths,
+                                               out_path=out_path,
+                                               class_path=class_path)
+    # Only successful compilations and compile errors (exit code 1) depend on the sources
+    # alone, a stopped or crashed javac would fail every identical submission
+    if usage['limit'] is None and usage['exit_code'] in (0, 1):
+        compile_cache.store(key, out_path, source_dir, javac_stdout, javac_stderr)
 
     return javac_stdout, javac_stderr
@@ -1,16 +1,29 @@
+import os
 from typing import Optional, Tuple, List
 
+from blueprints.serverless_testing.cds import jvm_flags
+from blueprints.serverless_testing.daemons.executor_pool import run_in_executor
 from blueprints.serverless_testing.exec_types.exec_types import ExecType
-from blueprints.serverless_testing.helpers import run_cmd, JAVA_PATH, JUNIT_PATH
+from blueprints.serverless_testing.helpers import JAVA_PATH, JUNIT_PATH
+from blueprints.serverless_testing.junit import JUNIT_PARALLELISM, PARALLEL_JUPITER, PARALLEL_OFF, PARALLEL_SHARDS, \
+    JUnitSelection, find_test_classes, jupiter_parallel_args, selector_args, shard_classes
+from blueprints.serverless_testing.limits import job_limits, run_limited, run_limited_all
 
 
 def java(exec_type: ExecType,
          class_path: str,
          main_file: Optional[str],
-         args: List[str]) -> Tuple[Optional[str], Optional[str]]:
+         args: List[str],
+         cwd: Optional[str] = None,
+         scan_path: Optional[str] = None,
+         selection: Optional[JUnitSelection] = None,
+         reports_path: Optional[str] = None,
+         parallel: str = PARALLEL_OFF) -> Tuple[Optional[str], Optional[str]]:
     """Runs or tests compiled java class files inside "path".
     The "execution_type" denotes running or testing the java files.
-    The "main_file" is needed to run the java files.
+    The "main_file" is needed to run the java files. Running uses a pre-started
+    JVM from the executor pool if "JAVA_RUN_MODE" is "pool" and no "cwd" is given,
+    otherwise java is forked.
 
     :param exec_type: Decides to run or test the files.
     :type exec_type: ExecType
@@ -20,30 +33,127 @@ def java(exec_type: ExecType,
     :type main_file: Optional[str]
     :param args: The arguments that should be passed to java cmd
     :type args: List[str]
+    :param cwd: The working directory of the forked java process, e.g. the job's workspace.
+    :type cwd: Optional[str]
+    :param scan_path: The class-path root to look for tests in, defaults to all of "class_path".
+    :type scan_path: Optional[str]
+    :param selection: The tests to run, defaults to all found tests.
+    :type selection: Optional[JUnitSelection]
+    :param reports_path: The dir the launcher writes its XML reports to, none are written by default.
+    :type reports_path: Optional[str]
+    :param parallel: How tests run in parallel, see "JUNIT_PARALLEL".
+    :type parallel: str
 
     :return: The stdout and stderr after java command is called.
     :rtype: Tuple[Optional[str], Optional[str]]:
     """
     assert exec_type == ExecType.run or exec_type == ExecType.test, '[exec_type] can only be run or test'
 
-    if exec_type == ExecType.run and main_file is not None:
-        cmd_list = [JAVA_PATH, '-cp', class_path, main_file]
-        if args:
-            for arg in args:
-                cmd_list.append(arg)
-            java_stdout, java_stderr = run_cmd(cmd_list)
-        else:
-            java_stdout, java_stderr = run_cmd(cmd_list)
-    else:
-        java_stdout, java_stderr = run_cmd([
-            JAVA_PATH,
-            '-jar',
-            JUNIT_PATH,
-            '--disable-ansi-colors',
-            '--disable-banner',
-            '-cp',
-            class_path,
-            '--scan-class-path'
-        ])
+    # The working dir of a running JVM is fixed, relative paths would resolve in the one of the pool
+    if exec_type == ExecType.run and main_file is not None and cwd is None:
+        result = run_in_executor(class_path, main_file, args)
+        if result is not None:
+            return result
+
+    if exec_type == ExecType.test and parallel == PARALLEL_SHARDS:
+        result = junit_shards(class_path, cwd, scan_path, selection, reports_path)
+        if result is not None:
+            return result
+
+    # Forked java and the JUnit launcher run within the job limits
+    tool = 'java' if exec_type == ExecType.run else 'junit'
+    cmd = java_cmd(exec_type, class_path, main_file, args,
+                   scan_path=scan_path, selection=selection, reports_path=reports_path, parallel=parallel)
+    java_stdout, java_stderr, _ = run_limited(cmd, cwd=cwd, limits=job_limits(tool))
 
     return java_stdout, java_stderr
+
+
+def junit_shards(class_path: str,
+                 cwd: Optional[str],
+                 scan_path: Optional[str],
+                 selection: Optional[JUnitSelection],
+                 reports_path: Optional[str]) -> Optional[Tuple[Optional[str], Optional[str]]]:
+    """Splits the test classes across up to "JUNIT_PARALLELISM" launcher JVMs, each
+    within its own job limits. The output of the shards is joined in shard order and
+    every shard writes its reports to a sub dir of "reports_path".
+
+    :param class_path: The path to look for the compiled class files.
+    :type class_path: str
+    :param cwd: The working directory of the launchers.
+    :type cwd: Optional[str]
+    :param scan_path: The class-path root to look for tests in, defaults to the dirs of "class_path".
+    :type scan_path: Optional[str]
+    :param selection: The tests to run, only tags are kept as classes and methods are not split.
+    :type selection: Optional[JUnitSelection]
+    :param reports_path: The dir of the XML reports, none are written by default.
+    :type reports_path: Optional[str]
+
+    :return: The joined stdout and stderr or None if there is nothing to split.
+    :rtype: Optional[Tuple[Optional[str], Optional[str]]]
+    """
+    if selection is not None and (selection.classes or selection.methods):
+        return None
+
+    class_dirs = [scan_path] if scan_path is not None else [p for p in class_path.split(':') if os.path.isdir(p)]
+    shards = shard_classes(find_test_classes(class_dirs), JUNIT_PARALLELISM)
+    if len(shards) < 2:
+        return None
+
+    tags = selection.tags if selection is not None else []
+    cmds = [java_cmd(ExecType.test, class_path, None, [],
+                     selection=JUnitSelection(classes=shard, methods=[], tags=tags),
+                     reports_path=os.path.join(reports_path, 'shard-{0}'.format(i)) if reports_path else None)
+            for i, shard in enumerate(shards)]
+
+    results = run_limited_all(cmds, cwd=cwd, limits=job_limits('junit'))
+
+    stdout = '\n\n'.join(out for out, _, _ in results if out is not None)
+    stderr = '\n\n'.join(err for _, err, _ in results if err is not None)
+    return stdout or None, stderr or None
+
+
+def java_cmd(exec_type: ExecType,
+             class_path: str,
+             main_file: Optional[str],
+             args: List[str],
+             scan_path: Optional[str] = None,
+             selection: Optional[JUnitSelection] = None,
+             reports_path: Optional[str] = None,
+             parallel: str = PARALLEL_OFF) -> List[str]:
+    """Builds the command that forks java to run "main_file" or the JUnit launcher
+    to test all classes on "class_path", only the ones in "scan_path" or the ones
+    in "selection".
+
+    :param exec_type: Decides to run or test the files.
+    :type exec_type: ExecType
+    :param class_path: The path to look for the compiled class files.
+    :type class_path: str
+    :param main_file: Name of the java file with the main method.
+    :type main_file: Optional[str]
+    :param args: The arguments that should be passed to java cmd
+    :type args: List[str]
+    :param scan_path: The class-path root to look for tests in, defaults to all of "class_path".
+    :type scan_path: Optional[str]
+    :param selection: The tests to run, defaults to all found tests.
+    :type selection: Optional[JUnitSelection]
+    :param reports_path: The dir the launcher writes its XML reports to, none are written by default.
+    :type reports_path: Optional[str]
+    :param parallel: Test classes run on parallel threads if "jupiter", other modes run them one by one.
+    :type parallel: str
+
+    :return: The command parts.
+    :rtype: List[str]
+    """
+    if exec_type == ExecType.run and main_file is not None:
+        return [JAVA_PATH] + jvm_flags('java') + ['-cp', class_path, main_file] + list(args)
+
+    return [JAVA_PATH] + jvm_flags('junit') + [
+        '-jar',
+        JUNIT_PATH,
+        '--disable-ansi-colors',
+        '--disable-banner',
+        '-cp',
+        class_path
+    ] + (['--reports-dir', reports_path] if reports_path is not None else []) + \
+        (jupiter_parallel_args() if parallel == PARALLEL_JUPITER else []) + selector_args(selection, scan_path)
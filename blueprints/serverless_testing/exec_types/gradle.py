@@ -0,0 +1,66 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+from blueprints.serverless_testing.cds import jvm_flags
+from blueprints.serverless_testing.daemons.gradle_pool import child_limits, gradle_daemon_args, gradle_limits, \
+    gradle_slot
+from blueprints.serverless_testing.exec_types.exec_types import ExecType
+from blueprints.serverless_testing.helpers import GRADLE_PATH
+from blueprints.serverless_testing.limits import run_limited
+from blueprints.serverless_testing.mirror import mirror_args
+
+
+def gradle(exec_type: ExecType, project_path: str, args_str: str) -> Tuple[Optional[str], Optional[str]]:
+    """Runs "gradle run" or "gradle test" for the project at "project_path".
+    The build runs on a warm daemon of the gradle pool once a pool slot is free, the
+    JVMs it forks within the job limits, see :func:gradle_pool.child_limits.
+
+    :param exec_type: Decides to run or test the project.
+    :type exec_type: ExecType
+    :param project_path: The root dir of the gradle project, used as working dir of gradle.
+    :type project_path: str
+    :param args_str: The program arguments, only used for running.
+    :type args_str: str
+
+    :return: The stdout and stderr after gradle command is called.
+    :rtype: Tuple[Optional[str], Optional[str]]
+    """
+    assert exec_type == ExecType.run or exec_type == ExecType.test, '[exec_type] can only be run or test'
+
+    cmd, env = gradle_cmd(exec_type, project_path, args_str)
+    with gradle_slot(), child_limits() as child_args:
+        gradle_stdout, gradle_stderr, _ = run_limited(cmd + child_args, cwd=project_path, env=env,
+                                                      limits=gradle_limits())
+
+    return gradle_stdout, gradle_stderr
+
+
+def gradle_cmd(exec_type: ExecType, project_path: str, args_str: str) -> Tuple[List[str], Dict[str, str]]:
+    """Builds the "gradle run" or "gradle test" command and its environment.
+    The command has to be started inside a "gradle_slot" with the options of
+    "child_limits" appended. Dependencies are resolved from the offline mirror,
+    see :func:mirror.mirror_args.
+
+    :param exec_type: Decides to run or test the project.
+    :type exec_type: ExecType
+    :param project_path: The root dir of the gradle project.
+    :type project_path: str
+    :param args_str: The program arguments, only used for running.
+    :type args_str: str
+
+    :return: The command parts and the environment of gradle.
+    :rtype: Tuple[List[str], Dict[str, str]]
+    """
+    run_or_test = 'run' if exec_type == ExecType.run else 'test'
+    cmd = [GRADLE_PATH, run_or_test, '--console=plain', '--project-dir', project_path] + gradle_daemon_args() + \
+        mirror_args()
+
+    # Program args only needed for running not for executing JUnit tests
+    if len(args_str) > 0 and exec_type == ExecType.run:
+        cmd.append('--args=' + str(args_str))
+
+    # Map the class data sharing archive of the gradle launcher, if one was built
+    env = dict(os.environ)
+    env['GRADLE_OPTS'] = ' '.join([env.get('GRADLE_OPTS', '')] + jvm_flags('gradle')).strip()
+
+    return cmd, env
@@ -0,0 +1,307 @@
+import os
+import re
+import shlex
+from typing import List, NamedTuple, Optional, Tuple
+
+from blueprints.serverless_testing.batch import parse_junit_summary
+from blueprints.serverless_testing.exec_types.compile import javac_cached
+from blueprints.serverless_testing.exec_types.exec_types import ExecType
+from blueprints.serverless_testing.exec_types.execute import java
+from blueprints.serverless_testing.helpers import JUNIT_PATH, env_flag
+
+# GLOBALS
+GRADLE_FAST_PATH = env_flag('GRADLE_FAST_PATH', True)
+
+EXECUTION_PATH_FAST = 'fast'
+EXECUTION_PATH_GRADLE = 'gradle'
+
+# Plugins that change nothing about compiling, running or testing the project
+ALLOWED_PLUGINS = {'java', 'application', 'eclipse', 'idea'}
+# Blocks that only configure repositories or IDE files
+IGNORED_BLOCKS = {'repositories', 'eclipse', 'idea', 'wrapper'}
+# Assignments that only name the project
+IGNORED_PROPERTIES = {'group', 'version', 'description'}
+
+# JUnit dependencies, the console launcher ships the same API up to its own versions
+JUNIT_DEPENDENCY_PATTERN = re.compile(r'^(testImplementation|testCompile|testRuntimeOnly|testCompileOnly)\s*\(?\s*'
+                                      r'[\'"]org\.junit\.(jupiter|platform):junit-[\w.-]+(:([\w.-]+))?[\'"]\s*\)?$')
+JUNIT_VERSION_PATTERN = re.compile(r'^\d+(\.\d+)*$')
+# The versions of the console launcher at "JUNIT_PATH"
+JUNIT_BUNDLED_VERSIONS = {'jupiter': (5, 6, 2), 'platform': (1, 6, 2)}
+PLUGIN_PATTERN = re.compile(r'^id\s*\(?\s*[\'"]([\w.-]+)[\'"]\s*\)?$')
+APPLY_PLUGIN_PATTERN = re.compile(r'^apply\s+plugin\s*:\s*[\'"]([\w.-]+)[\'"]$')
+PROPERTY_PATTERN = re.compile(r'^(\w+)\s*=\s*[\'"]([^\'"$]*)[\'"]$')
+ROOT_PROJECT_PATTERN = re.compile(r'^rootProject\.name\s*=\s*[\'"][^\'"$]*[\'"]$')
+CLASS_NAME_PATTERN = re.compile(r'^[A-Za-z_$][\w$]*(\.[A-Za-z_$][\w$]*)*$')
+
+# Files that make the build more than the plugins above
+UNSUPPORTED_FILES = ('build.gradle.kts', 'settings.gradle.kts', 'buildSrc')
+
+
+class FastProject(NamedTuple):
+    """A gradle project that compiles and runs the same without gradle.
+    """
+    path: str
+    main_class: Optional[str]
+    junit_platform: bool
+    main_sources: List[str]
+    test_sources: List[str]
+    main_resources: Optional[str]
+    test_resources: Optional[str]
+
+
+def analyze_project(project_path: str, exec_type: ExecType) -> Tuple[Optional[FastProject], str]:
+    """Checks if the project can be run or tested without gradle. That is only the case
+    for a single project with the plugins "java" and "application", the standard source
+    layout and no dependencies but JUnit. Anything else in the build script, or anything
+    this check does not understand, leaves the project to gradle, as does setting
+    "GRADLE_FAST_PATH" to 0.
+
+    :param project_path: The root dir of the gradle project.
+    :type project_path: str
+    :param exec_type: Decides to run or test the project.
+    :type exec_type: ExecType
+
+    :return: The project or None, and why the project is left to gradle.
+    :rtype: Tuple[Optional[FastProject], str]
+    """
+    if not GRADLE_FAST_PATH:
+        return None, 'disabled'
+
+    for name in UNSUPPORTED_FILES:
+        if os.path.exists(os.path.join(project_path, name)):
+            return None, 'unsupported file [{0}]'.format(name)
+
+    try:
+        with open(os.path.join(project_path, 'build.gradle'), errors='replace') as f:
+            build_script = f.read()
+    except OSError:
+        return None, 'no build.gradle'
+
+    settings_path = os.path.join(project_path, 'settings.gradle')
+    if os.path.exists(settings_path):
+        with open(settings_path, errors='replace') as f:
+            for line in _statements(f.read()):
+                if not ROOT_PROJECT_PATTERN.match(line[0]) or line[1] is not None:
+                    return None, 'settings.gradle: {0}'.format(line[0])
+
+    main_class, junit_platform, reason = _read_build_script(build_script)
+    if reason is not None:
+        return None, 'build.gradle: {0}'.format(reason)
+
+    src_path = os.path.join(project_path, 'src')
+    source_sets = sorted(os.listdir(src_path)) if os.path.isdir(src_path) else []
+    for source_set in source_sets:
+        if source_set.startswith('.'):
+            continue
+        if source_set not in ('main', 'test'):
+            return None, 'source set [{0}]'.format(source_set)
+        for kind in os.listdir(os.path.join(src_path, source_set)):
+            if kind not in ('java', 'resources') and not kind.startswith('.'):
+                return None, 'source dir [{0}/{1}]'.format(source_set, kind)
+
+    project = FastProject(path=project_path,
+                          main_class=main_class,
+                          junit_platform=junit_platform,
+                          main_sources=_java_files(os.path.join(src_path, 'main', 'java')),
+                          test_sources=_java_files(os.path.join(src_path, 'test', 'java')),
+                          main_resources=_dir_or_none(os.path.join(src_path, 'main', 'resources')),
+                          test_resources=_dir_or_none(os.path.join(src_path, 'test', 'resources')))
+
+    if exec_type == ExecType.run and (project.main_class is None or not project.main_sources):
+        return None, 'no main class'
+    if exec_type == ExecType.test and (not project.junit_platform or not project.test_sources):
+        return None, 'no JUnit platform tests'
+    return project, ''
+
+
+def compile_project(project: FastProject, exec_type: ExecType) -> Tuple[Optional[str], Optional[str]]:
+    """Compiles the main sources, and for testing the test sources, like "gradle classes"
+    and "gradle testClasses" do.
+
+    :param project: The analyzed project.
+    :type project: FastProject
+    :param exec_type: Decides to run or test the project.
+    :type exec_type: ExecType
+
+    :return: The stdout and stderr of javac.
+    :rtype: Tuple[Optional[str], Optional[str]]
+    """
+    main_out, test_out = _out_paths(project)
+    if project.main_sources:
+        stdout, stderr = javac_cached(file_paths=project.main_sources,
+                                      out_path=main_out,
+                                      class_path=main_out)
+        if stdout is not None or stderr is not None:
+            return stdout, stderr
+    else:
+        os.makedirs(main_out, exist_ok=True)
+
+    if exec_type == ExecType.test:
+        return javac_cached(file_paths=project.test_sources,
+                            out_path=test_out,
+                            class_path=':'.join([test_out, main_out, JUNIT_PATH]))
+    return None, None
+
+
+def run_project(project: FastProject, exec_type: ExecType, args_str: str) -> Tuple[Optional[str], Optional[str]]:
+    """Runs the main class or the tests of a compiled project like "gradle run" and
+    "gradle test" do. Program arguments are split like gradle splits "--args", failing
+    tests are reported as error like gradle reports a failed build.
+
+    :param project: The compiled project.
+    :type project: FastProject
+    :param exec_type: Decides to run or test the project.
+    :type exec_type: ExecType
+    :param args_str: The program arguments, only used for running.
+    :type args_str: str
+
+    :return: The stdout and stderr of the program or the tests.
+    :rtype: Tuple[Optional[str], Optional[str]]
+    """
+    main_out, test_out = _out_paths(project)
+    if exec_type == ExecType.run:
+        try:
+            args = shlex.split(args_str)
+        except ValueError as e:
+            return None, 'Invalid program arguments: {0}'.format(e)
+        return java(exec_type=ExecType.run,
+                    class_path=':'.join(filter(None, [main_out, project.main_resources])),
+                    main_file=project.main_class,
+                    args=args,
+                    cwd=project.path)
+
+    stdout, stderr = java(exec_type=ExecType.test,
+                          class_path=':'.join(filter(None, [test_out, project.test_resources, main_out,
+                                                            project.main_resources, JUNIT_PATH])),
+                          main_file=None,
+                          args=[],
+                          cwd=project.path,
+                          scan_path=test_out)
+    tests = parse_junit_summary(stdout or '')
+    if stderr is None and (tests.get('failed', 0) or tests.get('aborted', 0)):
+        stderr = "Execution failed for task ':test'.\n> There were failing tests."
+    return stdout, stderr
+
+
+def _read_build_script(build_script: str) -> Tuple[Optional[str], bool, Optional[str]]:
+    """Reads the main class and whether tests use the JUnit platform.
+
+    :return: The main class, the JUnit platform flag and the first statement that is not
+        understood, if any.
+    :rtype: Tuple[Optional[str], bool, Optional[str]]
+    """
+    main_class = None
+    junit_platform = False
+    plugins = set()
+
+    for head, body in _statements(build_script):
+        prop = PROPERTY_PATTERN.match(head)
+        apply_plugin = APPLY_PLUGIN_PATTERN.match(head)
+        if body is None and prop is not None and prop.group(1) == 'mainClassName':
+            main_class = prop.group(2)
+        elif body is None and prop is not None and prop.group(1) in IGNORED_PROPERTIES:
+            continue
+        elif body is None and apply_plugin is not None:
+            plugins.add(apply_plugin.group(1))
+        elif head == 'plugins' and body is not None:
+            for line, block in _statements(body):
+                plugin = PLUGIN_PATTERN.match(line)
+                if plugin is None or block is not None:
+                    return None, False, line
+                plugins.add(plugin.group(1))
+        elif head == 'application' and body is not None:
+            for line, block in _statements(body):
+                # "mainClass" only exists since gradle 6.4
+                prop = PROPERTY_PATTERN.match(line)
+                if prop is not None and prop.group(1) == 'mainClassName' and block is None:
+                    main_class = prop.group(2)
+                else:
+                    return None, False, line
+        elif head == 'dependencies' and body is not None:
+            for line, block in _statements(body):
+                dependency = JUNIT_DEPENDENCY_PATTERN.match(line)
+                if dependency is None or block is not None or not _bundled_junit(dependency.group(2),
+                                                                                 dependency.group(4)):
+                    return None, False, line
+        elif head == 'test' and body is not None:
+            for line, block in _statements(body):
+                if line == 'useJUnitPlatform()' and block is None:
+                    junit_platform = True
+                elif line != 'testLogging':
+                    # Only the console output of gradle depends on "testLogging"
+                    return None, False, line
+        elif head in IGNORED_BLOCKS and body is not None:
+            continue
+        else:
+            return None, False, head
+
+    if not plugins <= ALLOWED_PLUGINS:
+        return None, False, 'plugins {0}'.format(sorted(plugins - ALLOWED_PLUGINS))
+    if 'java' not in plugins and 'application' not in plugins:
+        return None, False, 'no java plugin'
+    if main_class is not None and not CLASS_NAME_PATTERN.match(main_class):
+        return None, False, 'mainClassName'
+    return main_class, junit_platform, None
+
+
+def _bundled_junit(module: str, version: Optional[str]) -> bool:
+    """Whether the console launcher ships a JUnit "jupiter" or "platform" artifact of the
+    version, newer ones may have API it lacks. Without a version gradle takes the one
+    of the other JUnit artifacts.
+    """
+    if version is None:
+        return True
+    if not JUNIT_VERSION_PATTERN.match(version):
+        return False
+    return tuple(int(part) for part in version.split('.')) <= JUNIT_BUNDLED_VERSIONS[module]
+
+
+def _statements(script: str) -> List[Tuple[str, Optional[str]]]:
+    """Splits a groovy script into its top level statements, each with the body of its
+    block, if it has one. Statements with strings spanning lines or unbalanced braces
+    end up as statements no rule accepts.
+    """
+    script = re.sub(r'/\*.*?\*/', ' ', script, flags=re.DOTALL)
+    # Line comments, but not "//" inside strings, e.g. urls of repositories
+    script = re.sub(r'^((?:[^\'"\n]|\'[^\'\n]*\'|"[^"\n]*")*?)//[^\n]*', r'\1', script, flags=re.MULTILINE)
+
+    statements = []
+    head = []
+    depth = 0
+    body_start = 0
+    for i, char in enumerate(script):
+        if depth == 0:
+            if char == '{':
+                depth, body_start = 1, i + 1
+            elif char in '\n;':
+                if ''.join(head).strip():
+                    statements.append((' '.join(''.join(head).split()), None))
+                head = []
+            else:
+                head.append(char)
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                statements.append((' '.join(''.join(head).split()), script[body_start:i]))
+                head = []
+
+    if depth != 0 or ''.join(head).strip():
+        statements.append((' '.join(''.join(head).split()) or '{', None))
+    return statements
+
+
+def _java_files(path: str) -> List[str]:
+    return sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names
+                  if name.endswith('.java') and not name.startswith('.'))
+
+
+def _dir_or_none(path: str) -> Optional[str]:
+    return path if os.path.isdir(path) else None
+
+
+def _out_paths(project: FastProject) -> Tuple[str, str]:
+    return (os.path.join(project.path, 'build', 'fast', 'main'),
+            os.path.join(project.path, 'build', 'fast', 'test'))
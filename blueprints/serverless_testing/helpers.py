@@ -1,10 +1,11 @@
 import os
+import selectors
 import subprocess
-import zipfile
-from typing import Tuple, Optional, List
+import time
+from functools import lru_cache
+from typing import Tuple, Optional, List, Dict, Iterator
 
 from werkzeug.datastructures import MultiDict
-from werkzeug.utils import secure_filename
 
 # GLOBALS
 JAVAC_PATH = '/usr/lib/jvm/default-jvm/bin/javac'
@@ -12,6 +13,95 @@ JAVA_PATH = '/usr/lib/jvm/default-jvm/bin/java'
 JUNIT_PATH = '/app/junit-platform-console-standalone-1.6.2.jar'
 GRADLE_PATH = '/app/gradle-6.3/bin/gradle'
 
+# Longest piece of a line held back while waiting for its line break
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def env_int(name: str, default: int) -> int:
+    """Reads an integer setting from the environment.
+
+    :param name: The name of the environment variable.
+    :type name: str
+    :param default: Used if the variable is unset or not a number.
+    :type default: int
+
+    :return: The configured value.
+    :rtype: int
+    """
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def env_flag(name: str, default: bool) -> bool:
+    """Reads an on/off setting from the environment ("1", "true", "yes" and "on" are on).
+
+    :param name: The name of the environment variable.
+    :type name: str
+    :param default: Used if the variable is unset.
+    :type default: bool
+
+    :return: The configured value.
+    :rtype: bool
+    """
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# Captured output keeps the first and last KB of each stream, a command writing more than the cap in total is killed
+OUTPUT_HEAD_KB = env_int('OUTPUT_HEAD_KB', 64)
+OUTPUT_TAIL_KB = env_int('OUTPUT_TAIL_KB', 64)
+OUTPUT_MAX_MB = env_int('OUTPUT_MAX_MB', 16)
+
+
+@lru_cache(maxsize=1)
+def jdk_fingerprint() -> str:
+    """Identifies the installed JDK by the javac binary and the "release" file of
+    its JDK home, so anything built with another JDK is not reused.
+
+    :return: The fingerprint of the JDK.
+    :rtype: str
+    """
+    javac_real = os.path.realpath(JAVAC_PATH)
+    release = os.path.join(os.path.dirname(os.path.dirname(javac_real)), 'release')
+
+    parts = [javac_real]
+    for path in (javac_real, release):
+        try:
+            stat = os.stat(path)
+            parts.append('{0}:{1}'.format(stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            parts.append('-')
+    return '|'.join(parts)
+
+
+def path_fingerprint(path: str) -> str:
+    """Describes a class-path entry by size and modification time of its files.
+
+    :param path: A jar file or class directory.
+    :type path: str
+
+    :return: The fingerprint of the entry.
+    :rtype: str
+    """
+    if os.path.isdir(path):
+        parts = []
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                stat = os.stat(os.path.join(root, name))
+                parts.append('{0}:{1}:{2}'.format(os.path.relpath(os.path.join(root, name), path),
+                                                  stat.st_size, stat.st_mtime_ns))
+        return ','.join(sorted(parts))
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return '-'
+    return '{0}:{1}'.format(stat.st_size, stat.st_mtime_ns)
+
 
 def check_files(request_files: MultiDict,
                 allowed_ext: Optional[List[str]]) -> Tuple[Optional[MultiDict], Optional[str]]:
@@ -76,44 +166,236 @@ def get_file_extension(filename: str) -> str:
     return ext
 
 
-def run_cmd(cmd: List[str]) -> Tuple[Optional[str], Optional[str]]:
+def run_cmd(cmd: List[str],
+            cwd: Optional[str] = None,
+            env: Optional[Dict[str, str]] = None) -> Tuple[Optional[str], Optional[str]]:
     """Run command and possibly capture stdout and stderr
-    and flatten them to strings.
+    and flatten them to strings. Working directory and environment are passed to the
+    child only, the process wide state of the app is never changed, so concurrent
+    requests can not interfere with each other. The output is read while it is written
+    and only its head and tail are kept, see "OutputBuffer". A command writing more than
+    "OUTPUT_MAX_MB" is killed.
 
     :param cmd: The command parts to run.
     :type cmd: List[str]
+    :param cwd: The working directory of the command, defaults to the one of the app.
+    :type cwd: Optional[str]
+    :param env: The environment of the command, defaults to the environment of the app.
+    :type env: Optional[Dict[str, str]]
 
     :return: A tuple with
     :rtype: Tuple[Optional[str], Optional[str]]
     """
-    cmd_out = subprocess.run(cmd, capture_output=True)
+    stdout, stderr = OutputBuffer(), OutputBuffer()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd, env=env)
+    try:
+        exceeded = capture_output(proc, stdout, stderr, max_bytes=OUTPUT_MAX_MB * 1024 * 1024)
+        if exceeded:
+            proc.kill()
+        proc.wait()
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+
+    if exceeded:
+        return stdout.text(), ((stderr.text() or '') + '\n' + output_limit_message(OUTPUT_MAX_MB)).strip()
+    return stdout.text(), stderr.text()
 
-    stdout = None
-    stderr = None
-    if cmd_out.stdout != b'':
-        stdout = cmd_out.stdout.decode().strip()
-    if cmd_out.stderr != b'':
-        stderr = cmd_out.stderr.decode().strip()
 
-    return stdout, stderr
+def read_lines(proc: subprocess.Popen, deadline: Optional[float] = None) -> Iterator[Tuple[str, str]]:
+    """Reads stdout and stderr of a running process line by line until both are closed.
 
+    :param proc: The process, started with both streams piped.
+    :type proc: subprocess.Popen
+    :param deadline: A value of "time.monotonic()" after which reading stops.
+    :type deadline: Optional[float]
 
-def extract_zip(zip_file, dest: str):
-    """Unzips zip file and stores its content on filesystem.
+    :raises TimeoutError: If the streams are still open at the deadline.
 
-    :param zip_file: The zip file to unzip.
-    :param dest: The location to unzip to.
-    :type dest: str
+    :return: Tuples of stream name and line, lines keep their line break.
+    :rtype: Iterator[Tuple[str, str]]
     """
+    pending = {'stdout': b'', 'stderr': b''}
+    for stream, chunk in read_chunks(proc, deadline=deadline):
+        yield from split_lines(pending, stream, chunk)
+
+
+def split_lines(pending: Dict[str, bytes], stream: str, chunk: bytes) -> List[Tuple[str, str]]:
+    """Splits the chunks of a stream into lines. The incomplete last line is kept in
+    "pending" until the next chunk, an empty chunk closes the stream and passes it on.
+
+    :param pending: The incomplete line of each stream, updated in place.
+    :type pending: Dict[str, bytes]
+    :param stream: The name of the stream, "stdout" or "stderr".
+    :type stream: str
+    :param chunk: The bytes as read from the stream.
+    :type chunk: bytes
+
+    :return: Tuples of stream name and line, lines keep their line break.
+    :rtype: List[Tuple[str, str]]
+    """
+    if not chunk:
+        line, pending[stream] = pending[stream], b''
+        return [(stream, line.decode(errors='replace'))] if line else []
+
+    lines = (pending[stream] + chunk).split(b'\n')
+    pending[stream] = lines.pop()
+    result = [(stream, line.decode(errors='replace') + '\n') for line in lines]
+
+    # Flush overlong lines instead of buffering them
+    if len(pending[stream]) >= STREAM_CHUNK_SIZE:
+        result.append((stream, pending[stream].decode(errors='replace')))
+        pending[stream] = b''
+    return result
+
+
+def read_chunks(proc: subprocess.Popen, deadline: Optional[float] = None) -> Iterator[Tuple[str, bytes]]:
+    """Reads stdout and stderr of a running process as they are written until both are closed.
 
-    # Get safe filename to store on filesystem
-    filename = secure_filename(zip_file.filename)
-    zip_file.save(os.path.join(dest, filename))
+    :param proc: The process, started with both streams piped.
+    :type proc: subprocess.Popen
+    :param deadline: A value of "time.monotonic()" after which reading stops.
+    :type deadline: Optional[float]
 
-    # Unzip newly stored zip file
-    zip_file = zipfile.ZipFile(os.path.join(dest, filename), 'r')
-    zip_file.extractall(path=dest)
-    zip_file.close()
+    :raises TimeoutError: If the streams are still open at the deadline.
+
+    :return: Tuples of stream name and at most "STREAM_CHUNK_SIZE" bytes, an empty chunk
+        when the stream was closed.
+    :rtype: Iterator[Tuple[str, bytes]]
+    """
+    with selectors.DefaultSelector() as selector:
+        selector.register(proc.stdout, selectors.EVENT_READ, 'stdout')
+        selector.register(proc.stderr, selectors.EVENT_READ, 'stderr')
+
+        while selector.get_map():
+            timeout = None if deadline is None else deadline - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                raise TimeoutError()
+
+            for key, _ in selector.select(timeout):
+                chunk = os.read(key.fileobj.fileno(), STREAM_CHUNK_SIZE)
+                if not chunk:
+                    selector.unregister(key.fileobj)
+                yield key.data, chunk
+
+
+class OutputBuffer:
+    """The captured output of one stream. Only the first "head_bytes" and the last
+    "tail_bytes" are kept, so a program printing in a loop can not fill the memory of
+    the worker, what is in between is only counted.
+    """
+
+    def __init__(self, head_bytes: Optional[int] = None, tail_bytes: Optional[int] = None):
+        self.head_bytes = OUTPUT_HEAD_KB * 1024 if head_bytes is None else head_bytes
+        self.tail_bytes = OUTPUT_TAIL_KB * 1024 if tail_bytes is None else tail_bytes
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total_bytes = 0
+
+    def write(self, chunk: bytes):
+        """Adds output to the buffer.
+
+        :param chunk: The bytes as read from the stream.
+        :type chunk: bytes
+        """
+        self.total_bytes += len(chunk)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk and self.tail_bytes > 0:
+            self.tail += chunk[-self.tail_bytes:]
+            del self.tail[:-self.tail_bytes]
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_bytes > len(self.head) + len(self.tail)
+
+    def text(self) -> Optional[str]:
+        """Decodes the kept output, bytes that are no valid UTF-8 are replaced. If output
+        was dropped, a line between head and tail tells how much.
+
+        :return: The stripped output or None if nothing was written.
+        :rtype: Optional[str]
+        """
+        if not self.truncated:
+            return flatten_output(bytes(self.head + self.tail))
+        omitted = self.total_bytes - len(self.head) - len(self.tail)
+        return (self.head.decode(errors='replace') +
+                '\n... [{0} bytes of output omitted] ...\n'.format(omitted) +
+                self.tail.decode(errors='replace')).strip()
+
+
+def capture_output(proc: subprocess.Popen,
+                   stdout: OutputBuffer,
+                   stderr: OutputBuffer,
+                   deadline: Optional[float] = None,
+                   max_bytes: int = 0) -> bool:
+    """Reads stdout and stderr of a running process into their buffers, until both are
+    closed or the process wrote more than "max_bytes" in total.
+
+    :param proc: The process, started with both streams piped.
+    :type proc: subprocess.Popen
+    :param stdout: The buffer of stdout.
+    :type stdout: OutputBuffer
+    :param stderr: The buffer of stderr.
+    :type stderr: OutputBuffer
+    :param deadline: A value of "time.monotonic()" after which reading stops.
+    :type deadline: Optional[float]
+    :param max_bytes: The output cap, 0 means unlimited.
+    :type max_bytes: int
+
+    :raises TimeoutError: If the streams are still open at the deadline, the buffers keep
+        what was read until then.
+
+    :return: True if the cap was exceeded, the caller then has to stop the process.
+    :rtype: bool
+    """
+    buffers = {'stdout': stdout, 'stderr': stderr}
+    for stream, chunk in read_chunks(proc, deadline=deadline):
+        buffers[stream].write(chunk)
+        if 0 < max_bytes < stdout.total_bytes + stderr.total_bytes:
+            return True
+    return False
+
+
+def output_limit_message(max_mb: int) -> str:
+    """Describes an exceeded output cap for the client.
+
+    :param max_mb: The cap in MB.
+    :type max_mb: int
+
+    :return: The message.
+    :rtype: str
+    """
+    return 'Output limit of {0} MB exceeded, the program was stopped!'.format(max_mb)
+
+
+def elapsed_ms(start: float) -> int:
+    """Milliseconds passed since "start".
+
+    :param start: A value of "time.monotonic()".
+    :type start: float
+
+    :return: The elapsed milliseconds.
+    :rtype: int
+    """
+    return int((time.monotonic() - start) * 1000)
+
+
+def flatten_output(output: bytes) -> Optional[str]:
+    """Flattens the captured output of a command to a string.
+
+    :param output: The raw bytes written to stdout or stderr.
+    :type output: bytes
+
+    :return: The stripped output or None if nothing was written.
+    :rtype: Optional[str]
+    """
+    if output == b'':
+        return None
+    return output.decode(errors='replace').strip()
 
-    # Remove zip file
-    os.remove(os.path.join(dest, filename))
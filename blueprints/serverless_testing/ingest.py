@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import zipfile
+
+from flask import Request
+from werkzeug.datastructures import FileStorage
+
+from blueprints.serverless_testing.helpers import env_int
+from blueprints.serverless_testing.workspaces import WORKSPACE_RAM, WORKSPACE_RAM_ROOT
+
+# GLOBALS
+# On the file system of the workspaces, uploads are moved into a workspace without copying them
+UPLOAD_DIR = os.environ.get('UPLOAD_DIR', os.path.join(WORKSPACE_RAM_ROOT, 'uploads') if WORKSPACE_RAM
+                            else os.path.join(tempfile.gettempdir(), 'uploads'))
+UPLOAD_MAX_BYTES = env_int('UPLOAD_MAX_MB', 64) * 1024 * 1024
+ZIP_MAX_ENTRIES = env_int('ZIP_MAX_ENTRIES', 10000)
+ZIP_MAX_BYTES = env_int('ZIP_MAX_MB', 256) * 1024 * 1024
+ZIP_MAX_RATIO = env_int('ZIP_MAX_RATIO', 200)
+
+# Entries smaller than this are never rejected for their compression ratio, e.g. empty or repetitive files
+ZIP_RATIO_MIN_BYTES = 1024 * 1024
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """Raised if an uploaded archive is invalid or exceeds the limits.
+    """
+
+
+class WorkspaceRequest(Request):
+    """Request that writes uploaded files straight to a per request dir on disk instead
+    of spooling them in memory first. The dir lives next to the job workspaces, so
+    :meth:save_upload moves files into a workspace without copying them again. The dir
+    is removed when the request is closed.
+    """
+    upload_path = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.upload_path is None:
+            try:
+                os.makedirs(UPLOAD_DIR, exist_ok=True)
+                self.upload_path = tempfile.mkdtemp(dir=UPLOAD_DIR)
+            except OSError:
+                # No RAM file system, the uploads are copied into the workspaces
+                self.upload_path = tempfile.mkdtemp()
+
+        # Reopened by path, so the stream knows its file name
+        fd, path = tempfile.mkstemp(dir=self.upload_path)
+        os.close(fd)
+        return open(path, 'wb+')
+
+    def close(self):
+        super().close()
+        if self.upload_path is not None:
+            shutil.rmtree(self.upload_path, ignore_errors=True)
+
+
+def save_upload(f: FileStorage, dest: str):
+    """Saves an uploaded file to "dest". Files written to disk by :class:WorkspaceRequest
+    are moved, all others are copied.
+
+    :param f: The uploaded file.
+    :type f: FileStorage
+    :param dest: The path to store the file at.
+    :type dest: str
+    """
+    name = getattr(f.stream, 'name', None)
+    if isinstance(name, str) and os.path.dirname(os.path.dirname(os.path.abspath(name))) == \
+            os.path.abspath(UPLOAD_DIR):
+        f.stream.flush()
+        try:
+            os.replace(name, dest)
+            return
+        except OSError:
+            # Another file system, fall back to copying
+            pass
+
+    f.save(dest)
+
+
+def extract_zip(zip_file: FileStorage, dest: str):
+    """Extracts an uploaded zip file straight from its upload stream. The limits on
+    entry count, total size and compression ratio are checked against the central
+    directory before anything is written, and the written bytes are counted as well.
+
+    :param zip_file: The zip file to unzip.
+    :type zip_file: FileStorage
+    :param dest: The location to unzip to.
+    :type dest: str
+
+    :raises UploadError: If the file is no zip file or exceeds the limits.
+    """
+    stream = zip_file.stream
+    stream.seek(0)
+    try:
+        archive = zipfile.ZipFile(stream)
+    except zipfile.BadZipFile:
+        raise UploadError('File [{0}] is no valid zip file!'.format(zip_file.filename))
+
+    with archive:
+        members = archive.infolist()
+        if len(members) > ZIP_MAX_ENTRIES:
+            raise UploadError('Zip file has more than {0} entries!'.format(ZIP_MAX_ENTRIES))
+        if sum(m.file_size for m in members) > ZIP_MAX_BYTES:
+            raise UploadError('Zip file extracts to more than {0} MB!'.format(ZIP_MAX_BYTES // (1024 * 1024)))
+        for m in members:
+            if m.file_size > ZIP_RATIO_MIN_BYTES and m.file_size > ZIP_MAX_RATIO * max(m.compress_size, 1):
+                raise UploadError('Zip entry [{0}] is compressed more than {1}:1!'.format(m.filename, ZIP_MAX_RATIO))
+
+        dest = os.path.realpath(dest)
+        written = 0
+        for m in members:
+            path = os.path.realpath(os.path.join(dest, m.filename))
+            if os.path.commonpath([dest, path]) != dest:
+                raise UploadError('Zip entry [{0}] points outside of the project!'.format(m.filename))
+
+            if m.is_dir():
+                os.makedirs(path, exist_ok=True)
+                continue
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with archive.open(m) as src, open(path, 'wb') as dst:
+                while True:
+                    chunk = src.read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if written > ZIP_MAX_BYTES:
+                        raise UploadError('Zip file extracts to more than {0} MB!'.format(
+                            ZIP_MAX_BYTES // (1024 * 1024)))
+                    dst.write(chunk)
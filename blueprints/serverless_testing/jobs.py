@@ -0,0 +1,257 @@
+import fcntl
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Dict, Any
+
+from flask import Flask, Request, g, request
+from werkzeug.datastructures import FileStorage, MultiDict
+from werkzeug.utils import secure_filename
+
+from blueprints.serverless_testing.helpers import env_int
+from blueprints.serverless_testing.ingest import save_upload
+from blueprints.serverless_testing.metrics import QUEUE_DEPTH
+from blueprints.serverless_testing.scheduler import DEFAULT_JOB_SECONDS, JOB_SECONDS_WEIGHT, QueueFullError
+
+# GLOBALS
+JOBS_DIR = os.environ.get('JOBS_DIR', os.path.join(tempfile.gettempdir(), 'jobs'))
+JOBS_WORKERS = env_int('JOBS_WORKERS', 4)
+JOBS_TTL = env_int('JOBS_TTL', 3600)
+JOBS_MAX_STORED = env_int('JOBS_MAX_STORED', 1000)
+# Unfinished jobs per gunicorn worker, further jobs are rejected with 429
+JOBS_MAX_QUEUED = env_int('JOBS_MAX_QUEUED', 64)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+_executor = ThreadPoolExecutor(max_workers=JOBS_WORKERS, thread_name_prefix='job')
+_pending_lock = threading.Lock()
+_pending = 0
+_job_seconds = DEFAULT_JOB_SECONDS
+
+
+def submit_job(app: Flask,
+               kind: str,
+               req: Request,
+               handler: Callable[[Request], Any]) -> Dict[str, Any]:
+    """Stores the uploaded files, form and query of "req" in a job dir and queues the job
+    on the background executor. The job later replays the request through "handler",
+    so jobs behave exactly like the synchronous endpoints.
+
+    :param app: The app the job is run in.
+    :type app: Flask
+    :param kind: The endpoint the job stands for, e.g. "run/java".
+    :type kind: str
+    :param req: The request object.
+    :type req: Request
+    :param handler: The view function handling the replayed request.
+    :type handler: Callable[[Request], Any]
+
+    :raises QueueFullError: If "JOBS_MAX_QUEUED" jobs of this worker are unfinished.
+
+    :return: The stored job record.
+    :rtype: Dict[str, Any]
+    """
+    global _pending
+
+    # The slot is taken before the upload is stored, a full queue stores nothing
+    with _pending_lock:
+        if _pending >= JOBS_MAX_QUEUED:
+            raise QueueFullError(max(1, math.ceil(_pending / max(JOBS_WORKERS, 1) * _job_seconds)))
+        _pending += 1
+
+    try:
+        prune_jobs()
+
+        job_id = uuid.uuid4().hex
+        input_path = os.path.join(JOBS_DIR, job_id)
+        os.makedirs(input_path)
+
+        files = []
+        for i, f in enumerate(req.files.getlist('file')):
+            stored_name = '{0}_{1}'.format(i, secure_filename(f.filename) or 'file')
+            save_upload(f, os.path.join(input_path, stored_name))
+            files.append({'stored': stored_name, 'filename': f.filename, 'content_type': f.content_type})
+
+        query = [(k, v) for k, v in req.args.items(multi=True) if k != 'type']
+        form = [(k, v) for k, v in req.form.items(multi=True) if k != 'type']
+
+        record = {'id': job_id, 'type': kind, 'status': JOB_QUEUED, 'created': time.time(), 'pid': os.getpid()}
+        _write_record(record)
+    except BaseException:
+        with _pending_lock:
+            _pending -= 1
+        raise
+
+    QUEUE_DEPTH.labels('jobs').inc()
+    _executor.submit(_run_job, app, record, '/' + kind, files, form, query, handler)
+
+    return record
+
+
+def load_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Reads a job record, any gunicorn worker can answer for jobs of the others.
+
+    :param job_id: The id returned when the job was submitted.
+    :type job_id: str
+
+    :return: The job record or None if the job is unknown or expired.
+    :rtype: Optional[Dict[str, Any]]
+    """
+    if not JOB_ID_PATTERN.match(job_id):
+        return None
+
+    try:
+        with open(_record_path(job_id)) as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if _expired(record, time.time()):
+        return None
+    if _lost(record):
+        record = _fail_lost(record)
+    return record
+
+
+def pending_jobs() -> int:
+    """The number of jobs of this worker that wait for or run on the executor.
+
+    :return: The number of unfinished jobs.
+    :rtype: int
+    """
+    with _pending_lock:
+        return _pending
+
+
+def prune_jobs():
+    """Removes expired jobs and the oldest finished jobs beyond "JOBS_MAX_STORED". Jobs
+    of a worker that exited are marked failed, they would never finish.
+    """
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    with open(os.path.join(JOBS_DIR, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        now = time.time()
+        finished = []
+        for name in os.listdir(JOBS_DIR):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(JOBS_DIR, name)) as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                continue
+
+            if _lost(record):
+                record = _fail_lost(record)
+            if _expired(record, now):
+                _remove_job(record['id'])
+            elif record['status'] in (JOB_DONE, JOB_FAILED):
+                finished.append((record.get('finished', 0), record['id']))
+
+        for _, job_id in sorted(finished)[:max(len(finished) - JOBS_MAX_STORED, 0)]:
+            _remove_job(job_id)
+
+
+def _run_job(app: Flask, record: Dict[str, Any], path: str, files, form, query, handler):
+    """Replays the stored request of a job through "handler" and stores the result.
+    """
+    global _pending, _job_seconds
+
+    QUEUE_DEPTH.labels('jobs').dec()
+    input_path = os.path.join(JOBS_DIR, record['id'])
+    record.update(status=JOB_RUNNING, started=time.time())
+    _write_record(record)
+
+    streams = []
+    try:
+        data = MultiDict(form)
+        for f in files:
+            stream = open(os.path.join(input_path, f['stored']), 'rb')
+            streams.append(stream)
+            data.add('file', FileStorage(stream=stream, filename=f['filename'], content_type=f['content_type']))
+
+        with app.test_request_context(path, method='POST', data=data, query_string=query):
+            g.job_id = record['id']
+            resp = app.make_response(handler(request))
+            # Closing the response releases what it holds, e.g. the scheduler slot of a streamed response
+            try:
+                result = {'status_code': resp.status_code}
+                if resp.is_json:
+                    result['json'] = resp.get_json()
+                else:
+                    result['body'] = resp.get_data(as_text=True)
+            finally:
+                resp.close()
+        record.update(status=JOB_DONE, result=result)
+    except Exception as e:
+        record.update(status=JOB_FAILED, error=str(e))
+    finally:
+        for stream in streams:
+            stream.close()
+        shutil.rmtree(input_path, ignore_errors=True)
+        with _pending_lock:
+            _pending -= 1
+            _job_seconds += JOB_SECONDS_WEIGHT * (time.time() - record['started'] - _job_seconds)
+
+    record['finished'] = time.time()
+    _write_record(record)
+
+
+def _expired(record: Dict[str, Any], now: float) -> bool:
+    # Unfinished jobs expire too, in case the pid of their exited worker was reused
+    return now - record.get('finished', record['created']) > JOBS_TTL
+
+
+def _lost(record: Dict[str, Any]) -> bool:
+    """Checks if a job is unfinished although the worker running it exited.
+    """
+    if record['status'] not in (JOB_QUEUED, JOB_RUNNING) or 'pid' not in record:
+        return False
+    try:
+        os.kill(record['pid'], 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def _fail_lost(record: Dict[str, Any]) -> Dict[str, Any]:
+    record = dict(record, status=JOB_FAILED, error='The worker running the job exited!', finished=time.time())
+    _write_record(record)
+    shutil.rmtree(os.path.join(JOBS_DIR, record['id']), ignore_errors=True)
+    return record
+
+
+def _record_path(job_id: str) -> str:
+    return os.path.join(JOBS_DIR, job_id + '.json')
+
+
+def _write_record(record: Dict[str, Any]):
+    """Writes a job record atomically, readers never see half written records.
+    """
+    tmp_path = '{0}.{1}.tmp'.format(_record_path(record['id']), threading.get_ident())
+    with open(tmp_path, 'w') as f:
+        json.dump(record, f)
+    os.replace(tmp_path, _record_path(record['id']))
+
+
+def _remove_job(job_id: str):
+    try:
+        os.remove(_record_path(job_id))
+    except OSError:
+        pass
+    shutil.rmtree(os.path.join(JOBS_DIR, job_id), ignore_errors=True)
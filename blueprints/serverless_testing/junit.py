@@ -0,0 +1,259 @@
+import glob
+import os
+import re
+import xml.etree.ElementTree as ElementTree
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from werkzeug.datastructures import MultiDict
+
+from blueprints.serverless_testing.classfile import ClassFileError, read_class_info
+from blueprints.serverless_testing.helpers import JUNIT_PATH, env_int
+
+# GLOBALS
+# Tests run in one JVM by default, "jupiter" runs test classes on parallel threads, "shards" splits them across JVMs
+JUNIT_PARALLEL = os.environ.get('JUNIT_PARALLEL', 'off')
+JUNIT_PARALLELISM = env_int('JUNIT_PARALLELISM', os.cpu_count() or 1)
+# "fixed" uses "JUNIT_PARALLELISM" threads, "dynamic" one thread per core
+JUNIT_PARALLEL_STRATEGY = os.environ.get('JUNIT_PARALLEL_STRATEGY', 'fixed')
+
+PARALLEL_OFF = 'off'
+PARALLEL_JUPITER = 'jupiter'
+PARALLEL_SHARDS = 'shards'
+PARALLEL_MODES = (PARALLEL_OFF, PARALLEL_JUPITER, PARALLEL_SHARDS)
+
+# Fully qualified class names, e.g. "pkg.CalculatorTest" or "CalculatorTest$Nested"
+CLASS_PATTERN = re.compile(r'^[A-Za-z_$][\w$]*(\.[A-Za-z_$][\w$]*)*$')
+# Methods with optional parameter types, e.g. "CalculatorTest#testAdd" or "CalculatorTest#testAdd(int, int)"
+METHOD_PATTERN = re.compile(r'^[A-Za-z_$][\w$.]*#[A-Za-z_$][\w$]*(\([\w$.,\[\] ]*\))?$')
+# Tags and tag expressions, e.g. "fast" or "fast & !slow"
+TAG_PATTERN = re.compile(r'^[\w.\-&|!() ]+$')
+
+MAX_SELECTORS = 100
+
+# Outcome of a test case by the element the legacy XML report adds to it
+STATUS_ELEMENTS = (('failure', 'failed'), ('error', 'errored'), ('skipped', 'skipped'))
+
+
+class JUnitSelection(NamedTuple):
+    """The tests to run instead of all tests on the class path.
+    """
+    classes: List[str]
+    methods: List[str]
+    tags: List[str]
+
+
+def read_selection(args: MultiDict) -> Tuple[Optional[JUnitSelection], Optional[str]]:
+    """Reads the tests to run from the query parameters, has form:
+    ?select_class=CalculatorTest&select_method=CalculatorTest#testAdd&include_tag=fast
+
+    :param args: The query parameters.
+    :type args: MultiDict
+
+    :return: The selection, None if all tests should run, and an error message if a selector is invalid.
+    :rtype: Tuple[Optional[JUnitSelection], Optional[str]]
+    """
+    selection = JUnitSelection(classes=args.getlist('select_class'),
+                               methods=args.getlist('select_method'),
+                               tags=args.getlist('include_tag'))
+
+    for key, values, pattern in (('select_class', selection.classes, CLASS_PATTERN),
+                                 ('select_method', selection.methods, METHOD_PATTERN),
+                                 ('include_tag', selection.tags, TAG_PATTERN)):
+        for value in values:
+            if not pattern.match(value):
+                return None, 'Query parameter [{0}] is invalid: {1}'.format(key, value)
+
+    count = len(selection.classes) + len(selection.methods) + len(selection.tags)
+    if count > MAX_SELECTORS:
+        return None, 'At most {0} test selectors allowed!'.format(MAX_SELECTORS)
+    return (selection if count else None), None
+
+
+def selector_args(selection: Optional[JUnitSelection], scan_path: Optional[str] = None) -> List[str]:
+    """Builds the launcher options selecting the tests. Without classes or methods the
+    class path is scanned, tags filter whatever is selected.
+
+    :param selection: The tests to run, None for all.
+    :type selection: Optional[JUnitSelection]
+    :param scan_path: The class-path root to look for tests in, defaults to all of the class path.
+    :type scan_path: Optional[str]
+
+    :return: The command parts.
+    :rtype: List[str]
+    """
+    if selection is None or not (selection.classes or selection.methods):
+        args = ['--scan-class-path'] + ([scan_path] if scan_path is not None else [])
+    else:
+        # Values are attached with "=", so they are never taken for options
+        args = ['--select-class=' + c for c in selection.classes] + \
+               ['--select-method=' + m for m in selection.methods]
+
+    if selection is not None:
+        args += ['--include-tag=' + t for t in selection.tags]
+    return args
+
+
+def read_parallel(args: MultiDict) -> Tuple[str, Optional[str]]:
+    """Reads how tests are run in parallel from the query parameters, has form:
+    ?parallel=shards, defaults to "JUNIT_PARALLEL".
+
+    :param args: The query parameters.
+    :type args: MultiDict
+
+    :return: The parallel mode and an error message if the mode is unknown.
+    :rtype: Tuple[str, Optional[str]]
+    """
+    parallel = args.get('parallel', JUNIT_PARALLEL)
+    if parallel not in PARALLEL_MODES:
+        return PARALLEL_OFF, 'Query parameter [parallel] must be one of {0}!'.format(list(PARALLEL_MODES))
+    return parallel, None
+
+
+def jupiter_parallel_args() -> List[str]:
+    """Builds the launcher options running test classes on parallel threads of one JVM.
+    The tests of a class still run one after the other, as student tests often share
+    static state, classes may opt in with "@Execution(CONCURRENT)".
+
+    :return: The command parts.
+    :rtype: List[str]
+    """
+    args = ['--config=junit.jupiter.execution.parallel.enabled=true',
+            '--config=junit.jupiter.execution.parallel.mode.default=same_thread',
+            '--config=junit.jupiter.execution.parallel.mode.classes.default=concurrent',
+            '--config=junit.jupiter.execution.parallel.config.strategy=' + JUNIT_PARALLEL_STRATEGY]
+    if JUNIT_PARALLEL_STRATEGY == 'fixed':
+        args.append('--config=junit.jupiter.execution.parallel.config.fixed.parallelism={0}'
+                    .format(max(JUNIT_PARALLELISM, 1)))
+    return args
+
+
+def grading_class_path(tests_path: str, out_path: str) -> str:
+    """The class-path running precompiled tests against a compiled submission. The tests
+    come first, so a submission can not replace them with classes of the same name.
+
+    :param tests_path: The dir of the compiled test classes.
+    :type tests_path: str
+    :param out_path: The dir of the compiled submission.
+    :type out_path: str
+
+    :return: The class-path.
+    :rtype: str
+    """
+    return ':'.join([tests_path, JUNIT_PATH, out_path])
+
+
+def find_test_classes(class_dirs: List[str]) -> List[str]:
+    """Finds the top level test classes below "class_dirs", i.e. classes referring to
+    JUnit, e.g. by their annotations. Nested classes run with their outer class.
+
+    :param class_dirs: The dirs of the compiled classes.
+    :type class_dirs: List[str]
+
+    :return: The fully qualified class names, sorted.
+    :rtype: List[str]
+    """
+    names = set()
+    for class_dir in class_dirs:
+        for root, _, files in os.walk(class_dir):
+            for name in files:
+                if not name.endswith('.class') or '$' in name:
+                    continue
+                try:
+                    info = read_class_info(os.path.join(root, name))
+                except (ClassFileError, OSError):
+                    continue
+                if any(ref.startswith('org/junit/') for ref in info.references):
+                    names.add(info.name.replace('/', '.'))
+    return sorted(names)
+
+
+def shard_classes(classes: List[str], count: int) -> List[List[str]]:
+    """Splits the test classes into at most "count" shards, dealt out in name order so
+    the same classes always end up in the same shard.
+
+    :param classes: The test classes, sorted.
+    :type classes: List[str]
+    :param count: The maximum number of shards.
+    :type count: int
+
+    :return: The non-empty shards.
+    :rtype: List[List[str]]
+    """
+    shards = [classes[i::max(count, 1)] for i in range(max(count, 1))]
+    return [shard for shard in shards if shard]
+
+
+def parse_reports(reports_path: str) -> Optional[Dict[str, Any]]:
+    """Reads the legacy XML reports the launcher writes with "--reports-dir", one per
+    test engine and shard, into per class and per test results. Classes are ordered by
+    name, so results do not depend on how tests were run in parallel.
+
+    :param reports_path: The reports dir.
+    :type reports_path: str
+
+    :return: The summary and the results by class or None if no report was written,
+        e.g. if the launcher did not start.
+    :rtype: Optional[Dict[str, Any]]
+    """
+    report_paths = sorted(glob.glob(os.path.join(reports_path, '**', 'TEST-*.xml'), recursive=True))
+    if not report_paths:
+        return None
+
+    classes = {}
+    for report_path in report_paths:
+        try:
+            root = ElementTree.parse(report_path).getroot()
+        except ElementTree.ParseError:
+            continue
+        for case in root.iter('testcase'):
+            test = _parse_case(case)
+            classes.setdefault(case.get('classname', ''), []).append(test)
+
+    summary = {'tests': 0, 'passed': 0, 'failed': 0, 'errored': 0, 'skipped': 0, 'duration_ms': 0}
+    results = []
+    for name, tests in sorted(classes.items()):
+        for test in tests:
+            summary['tests'] += 1
+            summary[test['status']] += 1
+            summary['duration_ms'] += test['duration_ms']
+        statuses = {test['status'] for test in tests}
+        status = next((s for s in ('errored', 'failed', 'passed') if s in statuses), 'skipped')
+        results.append({'name': name, 'status': status, 'tests': tests})
+
+    return {'summary': summary, 'classes': results}
+
+
+def _parse_case(case: ElementTree.Element) -> Dict[str, Any]:
+    name = case.get('name', '')
+    # Parameterized and repeated tests are named e.g. "testAdd(int)[2]", the selector runs all invocations
+    method = name.split(')', 1)[0] + ')' if '(' in name else name
+    test = {'name': name,
+            'display_name': name,
+            'status': 'passed',
+            'duration_ms': _duration_ms(case.get('time')),
+            'selector': '{0}#{1}'.format(case.get('classname', ''), method),
+            'message': None,
+            'type': None,
+            'stack_trace': None}
+
+    for tag, status in STATUS_ELEMENTS:
+        element = case.find(tag)
+        if element is not None:
+            test.update(status=status, message=element.get('message'), type=element.get('type'),
+                        stack_trace=(element.text or '').strip() or None)
+            break
+
+    # The launcher lists the unique id and the display name in the captured output
+    system_out = case.findtext('system-out') or ''
+    for line in system_out.splitlines():
+        if line.startswith('display-name: '):
+            test['display_name'] = line[len('display-name: '):]
+    return test
+
+
+def _duration_ms(value: Optional[str]) -> int:
+    # Durations are seconds with grouping, e.g. "1,204.5"
+    try:
+        return int(float((value or '0').replace(',', '')) * 1000)
+    except ValueError:
+        return 0
@@ -0,0 +1,612 @@
+import asyncio
+import os
+import resource
+import signal
+import subprocess
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from flask import g, has_app_context
+
+from blueprints.serverless_testing.helpers import OUTPUT_MAX_MB, OutputBuffer, capture_output, env_int, \
+    output_limit_message, read_lines
+from blueprints.serverless_testing.metrics import observe_usage
+from blueprints.serverless_testing.supervisor import asyncio_enabled, capture_output_async, iterate_on_loop, \
+    job_limiter, read_lines_async, reap, reap_blocking, run_on_loop
+
+# GLOBALS
+JOB_TIMEOUT = env_int('JOB_TIMEOUT', 60)
+GRADLE_JOB_TIMEOUT = env_int('GRADLE_JOB_TIMEOUT', 300)
+JOB_CPU_SECONDS = env_int('JOB_CPU_SECONDS', 60)
+JOB_MEMORY_MB = env_int('JOB_MEMORY_MB', 1024)
+JOB_PROCESSES = env_int('JOB_PROCESSES', 128)
+JOB_CGROUP_ROOT = os.environ.get('JOB_CGROUP_ROOT', '')
+
+LIMIT_WALL = 'wall'
+LIMIT_CPU = 'cpu'
+LIMIT_MEMORY = 'memory'
+LIMIT_OUTPUT = 'output'
+
+# Seconds between the soft and the hard CPU limit, SIGXCPU first, then SIGKILL
+CPU_GRACE = 2
+
+
+class Limits(NamedTuple):
+    """The resources a single job command may use, 0 means unlimited.
+    """
+    timeout: int
+    cpu_seconds: int
+    memory_bytes: int
+    processes: int
+    output_bytes: int = 0
+
+
+def job_limits(tool: str = 'java') -> Limits:
+    """The configured limits for a job command.
+
+    :param tool: One of "javac", "java", "junit" or "gradle". Gradle builds get their own timeout.
+    :type tool: str
+
+    :return: The limits.
+    :rtype: Limits
+    """
+    return Limits(timeout=GRADLE_JOB_TIMEOUT if tool == 'gradle' else JOB_TIMEOUT,
+                  cpu_seconds=JOB_CPU_SECONDS,
+                  memory_bytes=JOB_MEMORY_MB * 1024 * 1024,
+                  processes=JOB_PROCESSES,
+                  output_bytes=OUTPUT_MAX_MB * 1024 * 1024)
+
+
+class LimitedProcess:
+    """A command started in its own process group with CPU and memory rlimits, inside
+    its own cgroup v2 if "JOB_CGROUP_ROOT" points to a delegated cgroup. The limits
+    are applied right after the start with prlimit, a "preexec_fn" is not safe in the
+    threads of the gunicorn workers.
+    """
+
+    def __init__(self, cmd: List[str], cwd: Optional[str], env: Optional[Dict[str, str]], limits: Limits):
+        self.limits = limits
+        self.start = time.monotonic()
+        self.exceeded = None
+        self.output_bytes = 0
+        self.truncated = False
+        self.cgroup = create_cgroup(limits)
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd, env=env,
+                                     start_new_session=True)
+        self.cmd = cmd
+        self.tool = os.path.basename(cmd[0])
+        apply_limits(self.proc.pid, limits, self.cgroup)
+
+    @property
+    def deadline(self) -> Optional[float]:
+        return self.start + self.limits.timeout if self.limits.timeout > 0 else None
+
+    def kill(self, reason: Optional[str] = None):
+        """Kills the whole process group, and the cgroup with every process that left the group.
+
+        :param reason: The limit that was exceeded, if any.
+        :type reason: Optional[str]
+        """
+        if reason is not None and self.exceeded is None:
+            self.exceeded = reason
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        if self.cgroup is not None:
+            kill_cgroup(self.cgroup)
+
+    def wait(self) -> Dict[str, Any]:
+        """Waits for the command and measures what it used. A command still running at
+        its deadline, e.g. after closing its streams, is killed.
+
+        :return: Exit code, wall time, CPU time, peak memory, output size and the exceeded limit, if any.
+        :rtype: Dict[str, Any]
+        """
+        reaped = reap_blocking(self.proc.pid, deadline=self.deadline)
+        if reaped is None:
+            self.kill(LIMIT_WALL)
+            reaped = reap_blocking(self.proc.pid)
+        usage = self.finish(*reaped)
+        record_usage(usage, cmd=self.cmd)
+        return usage
+
+    def finish(self, status: int, rusage: resource.struct_rusage) -> Dict[str, Any]:
+        """Measures what the reaped command used and removes what is left of it. Unlike
+        "wait" the usage is not recorded, e.g. when the command was reaped off the request.
+
+        :param status: The wait status of the command.
+        :type status: int
+        :param rusage: The resource usage of the command.
+        :type rusage: resource.struct_rusage
+
+        :return: Exit code, wall time, CPU time, peak memory, output size and the exceeded limit, if any.
+        :rtype: Dict[str, Any]
+        """
+        self.proc.returncode = _exit_code(status)
+
+        # Leftovers of the group, e.g. background processes of the program
+        self.kill()
+        self.proc.stdout.close()
+        self.proc.stderr.close()
+
+        max_rss_kb = rusage.ru_maxrss
+        if self.cgroup is not None:
+            peak = _read(self.cgroup, 'memory.peak')
+            if peak is not None and peak.isdigit():
+                max_rss_kb = max(max_rss_kb, int(peak) // 1024)
+
+        cpu_seconds = rusage.ru_utime + rusage.ru_stime
+        self.exceeded = self.exceeded or exceeded_limit(self.limits, self.proc.returncode, cpu_seconds, self.cgroup)
+        if self.cgroup is not None:
+            remove_cgroup(self.cgroup)
+
+        usage = {'tool': self.tool,
+                 'exit_code': self.proc.returncode,
+                 'wall_ms': int((time.monotonic() - self.start) * 1000),
+                 'cpu_ms': int(cpu_seconds * 1000),
+                 'max_rss_kb': max_rss_kb,
+                 'output_bytes': self.output_bytes,
+                 'truncated': self.truncated,
+                 'limit': self.exceeded}
+        return usage
+
+    async def finish_async(self, status: int, rusage: resource.struct_rusage) -> Dict[str, Any]:
+        """Like "finish", but called on the event loop. Removing the cgroup waits for the
+        killed processes to leave it, so it runs on a thread of the loop.
+
+        :param status: The wait status of the command.
+        :type status: int
+        :param rusage: The resource usage of the command.
+        :type rusage: resource.struct_rusage
+
+        :return: Exit code, wall time, CPU time, peak memory, output size and the exceeded limit, if any.
+        :rtype: Dict[str, Any]
+        """
+        # Reaped already, cleanup paths must not wait for the command again
+        self.proc.returncode = _exit_code(status)
+        return await asyncio.get_event_loop().run_in_executor(None, self.finish, status, rusage)
+
+
+def run_limited(cmd: List[str],
+                cwd: Optional[str] = None,
+                env: Optional[Dict[str, str]] = None,
+                limits: Optional[Limits] = None) -> Tuple[Optional[str], Optional[str], Dict[str, Any]]:
+    """Like "run_cmd", but the command runs within "limits" and its usage is measured.
+    If a limit is exceeded the message is appended to stderr. Writing more output than
+    "limits.output_bytes" counts as exceeding a limit.
+
+    :param cmd: The command parts to run.
+    :type cmd: List[str]
+    :param cwd: The working directory of the command.
+    :type cwd: Optional[str]
+    :param env: The environment of the command.
+    :type env: Optional[Dict[str, str]]
+    :param limits: The limits, defaults to the ones of a java job.
+    :type limits: Optional[Limits]
+
+    :return: The stdout, stderr and usage of the command.
+    :rtype: Tuple[Optional[str], Optional[str], Dict[str, Any]]
+    """
+    if asyncio_enabled():
+        stdout_text, stderr_text, usage = run_on_loop(supervise_limited(cmd, cwd, env, limits or job_limits()))
+        record_usage(usage, cmd=cmd)
+        return stdout_text, stderr_text, usage
+
+    stdout, stderr = OutputBuffer(), OutputBuffer()
+    process = LimitedProcess(cmd, cwd, env, limits or job_limits())
+    try:
+        if capture_output(process.proc, stdout, stderr, deadline=process.deadline,
+                          max_bytes=process.limits.output_bytes):
+            process.kill(LIMIT_OUTPUT)
+    except TimeoutError:
+        process.kill(LIMIT_WALL)
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+    process.output_bytes = stdout.total_bytes + stderr.total_bytes
+    process.truncated = stdout.truncated or stderr.truncated
+    return _limited_result(process, stdout, stderr, process.wait())
+
+
+async def supervise_limited(cmd: List[str],
+                            cwd: Optional[str],
+                            env: Optional[Dict[str, str]],
+                            limits: Limits) -> Tuple[Optional[str], Optional[str], Dict[str, Any]]:
+    """Like "run_limited", but on the event loop of the worker, which waits for the
+    output, the timeout and the exit of all commands at once. The command starts once
+    one of the "EXEC_CONCURRENCY" slots is free, waiting for it does not count against
+    its timeout. The usage is not recorded, the loop is not part of the request.
+
+    :param cmd: The command parts to run.
+    :type cmd: List[str]
+    :param cwd: The working directory of the command.
+    :type cwd: Optional[str]
+    :param env: The environment of the command.
+    :type env: Optional[Dict[str, str]]
+    :param limits: The limits of the command.
+    :type limits: Limits
+
+    :return: The stdout, stderr and usage of the command.
+    :rtype: Tuple[Optional[str], Optional[str], Dict[str, Any]]
+    """
+    async with job_limiter():
+        stdout, stderr = OutputBuffer(), OutputBuffer()
+        process = LimitedProcess(cmd, cwd, env, limits)
+        try:
+            timeout = limits.timeout if limits.timeout > 0 else None
+            try:
+                if await asyncio.wait_for(capture_output_async(process.proc, stdout, stderr, limits.output_bytes),
+                                          timeout=timeout):
+                    process.kill(LIMIT_OUTPUT)
+            except asyncio.TimeoutError:
+                process.kill(LIMIT_WALL)
+
+            # Programs may close their streams and keep running
+            reaped = await reap(process.proc.pid, deadline=process.deadline)
+            if reaped is None:
+                process.kill(LIMIT_WALL)
+                reaped = await reap(process.proc.pid)
+        except BaseException:
+            process.kill()
+            await process.finish_async(*await reap(process.proc.pid))
+            raise
+
+    process.output_bytes = stdout.total_bytes + stderr.total_bytes
+    process.truncated = stdout.truncated or stderr.truncated
+    return _limited_result(process, stdout, stderr, await process.finish_async(*reaped))
+
+
+def run_limited_all(cmds: List[List[str]],
+                    cwd: Optional[str] = None,
+                    env: Optional[Dict[str, str]] = None,
+                    limits: Optional[Limits] = None) -> List[Tuple[Optional[str], Optional[str], Dict[str, Any]]]:
+    """Runs the commands at the same time, each like "run_limited", on the event loop
+    with "EXEC_MODE=asyncio", otherwise on a thread each. The usage is recorded for the
+    current request in the order of "cmds".
+
+    :param cmds: The commands to run.
+    :type cmds: List[List[str]]
+    :param cwd: The working directory of the commands.
+    :type cwd: Optional[str]
+    :param env: The environment of the commands.
+    :type env: Optional[Dict[str, str]]
+    :param limits: The limits of each command, defaults to the ones of a java job.
+    :type limits: Optional[Limits]
+
+    :return: The stdout, stderr and usage of each command.
+    :rtype: List[Tuple[Optional[str], Optional[str], Dict[str, Any]]]
+    """
+    limits = limits or job_limits()
+    if asyncio_enabled():
+        results = run_on_loop(_gather([supervise_limited(cmd, cwd, env, limits) for cmd in cmds]))
+        observe = True
+    else:
+        # The commands are child processes, the threads only wait for them
+        with ThreadPoolExecutor(max_workers=max(len(cmds), 1)) as executor:
+            results = list(executor.map(lambda cmd: run_limited(cmd, cwd=cwd, env=env, limits=limits), cmds))
+        # Usage measured on the threads was already counted in the metrics
+        observe = False
+
+    for cmd, (_, _, usage) in zip(cmds, results):
+        record_usage(usage, cmd=cmd, observe=observe)
+    return results
+
+
+async def _gather(coroutines: List[Awaitable]) -> List[Any]:
+    return list(await asyncio.gather(*coroutines))
+
+
+def _limited_result(process: LimitedProcess,
+                    stdout: OutputBuffer,
+                    stderr: OutputBuffer,
+                    usage: Dict[str, Any]) -> Tuple[Optional[str], Optional[str], Dict[str, Any]]:
+    stdout_text, stderr_text = stdout.text(), stderr.text()
+    if usage['limit'] is not None:
+        stderr_text = ((stderr_text or '') + '\n' + limit_message(usage['limit'], process.limits)).strip()
+    return stdout_text, stderr_text, usage
+
+
+def stream_limited(cmd: List[str],
+                   cwd: Optional[str] = None,
+                   env: Optional[Dict[str, str]] = None,
+                   limits: Optional[Limits] = None) -> Iterator[Tuple[str, Any]]:
+    """Runs a command within "limits" and yields its output line by line while it is
+    written. Lines are tagged with "stdout" or "stderr", the last item is tagged "exit"
+    and holds the usage dict including the exit code. Lines are passed on and not kept,
+    the output cap still stops a command writing endlessly. If the consumer stops early,
+    e.g. because the client disconnected, the command is killed. With "EXEC_MODE=asyncio"
+    the command is supervised on the event loop like "run_limited" does.
+
+    :param cmd: The command parts to run.
+    :type cmd: List[str]
+    :param cwd: The working directory of the command.
+    :type cwd: Optional[str]
+    :param env: The environment of the command.
+    :type env: Optional[Dict[str, str]]
+    :param limits: The limits, defaults to the ones of a java job.
+    :type limits: Optional[Limits]
+
+    :return: Tuples of stream name and line, then the usage.
+    :rtype: Iterator[Tuple[str, Any]]
+    """
+    if asyncio_enabled():
+        events = iterate_on_loop(supervise_stream(cmd, cwd, env, limits or job_limits()))
+        try:
+            for kind, data in events:
+                if kind == 'exit':
+                    record_usage(data, cmd=cmd)
+                yield kind, data
+        finally:
+            events.close()
+        return
+
+    process = LimitedProcess(cmd, cwd, env, limits or job_limits())
+    try:
+        try:
+            for stream, line in read_lines(process.proc, deadline=process.deadline):
+                yield stream, line
+                process.output_bytes += len(line.encode())
+                if 0 < process.limits.output_bytes < process.output_bytes:
+                    process.kill(LIMIT_OUTPUT)
+                    break
+        except TimeoutError:
+            process.kill(LIMIT_WALL)
+        usage = process.wait()
+        if usage['limit'] is not None:
+            yield 'stderr', limit_message(usage['limit'], process.limits) + '\n'
+        yield 'exit', usage
+    finally:
+        if process.proc.returncode is None:
+            process.kill()
+            process.wait()
+
+
+async def supervise_stream(cmd: List[str],
+                           cwd: Optional[str],
+                           env: Optional[Dict[str, str]],
+                           limits: Limits) -> AsyncIterator[Tuple[str, Any]]:
+    """Like "stream_limited", but on the event loop of the worker. The command holds one
+    of the "EXEC_CONCURRENCY" slots until it was reaped, the usage is not recorded.
+
+    :param cmd: The command parts to run.
+    :type cmd: List[str]
+    :param cwd: The working directory of the command.
+    :type cwd: Optional[str]
+    :param env: The environment of the command.
+    :type env: Optional[Dict[str, str]]
+    :param limits: The limits of the command.
+    :type limits: Limits
+
+    :return: Tuples of stream name and line, then the usage.
+    :rtype: AsyncIterator[Tuple[str, Any]]
+    """
+    async with job_limiter():
+        process = LimitedProcess(cmd, cwd, env, limits)
+        try:
+            # Closed right away, the loop must stop watching the pipes before they are closed
+            lines = read_lines_async(process.proc, deadline=process.deadline)
+            try:
+                async for stream, line in lines:
+                    yield stream, line
+                    process.output_bytes += len(line.encode())
+                    if 0 < limits.output_bytes < process.output_bytes:
+                        process.kill(LIMIT_OUTPUT)
+                        break
+            except asyncio.TimeoutError:
+                process.kill(LIMIT_WALL)
+            finally:
+                await lines.aclose()
+
+            # Programs may close their streams and keep running
+            reaped = await reap(process.proc.pid, deadline=process.deadline)
+            if reaped is None:
+                process.kill(LIMIT_WALL)
+                reaped = await reap(process.proc.pid)
+            usage = await process.finish_async(*reaped)
+            if usage['limit'] is not None:
+                yield 'stderr', limit_message(usage['limit'], limits) + '\n'
+            yield 'exit', usage
+        finally:
+            if process.proc.returncode is None:
+                process.kill()
+                await process.finish_async(*await reap(process.proc.pid))
+
+
+def limit_message(limit: str, limits: Limits) -> str:
+    """Describes an exceeded limit for the client.
+
+    :param limit: One of "wall", "cpu", "memory" or "output".
+    :type limit: str
+    :param limits: The limits of the command.
+    :type limits: Limits
+
+    :return: The message.
+    :rtype: str
+    """
+    if limit == LIMIT_WALL:
+        return 'Time limit of {0} seconds exceeded, the program was stopped!'.format(limits.timeout)
+    if limit == LIMIT_CPU:
+        return 'CPU time limit of {0} seconds exceeded, the program was stopped!'.format(limits.cpu_seconds)
+    if limit == LIMIT_OUTPUT:
+        return output_limit_message(limits.output_bytes // (1024 * 1024))
+    return 'Memory limit of {0} MB exceeded, the program was stopped!'.format(limits.memory_bytes // (1024 * 1024))
+
+
+def record_usage(usage: Dict[str, Any], cmd: Optional[List[str]] = None, observe: bool = True):
+    """Remembers the usage of a command for the current request and counts it in the metrics.
+
+    :param usage: The usage of the command.
+    :type usage: Dict[str, Any]
+    :param cmd: The command line, only reported with ?debug=1.
+    :type cmd: Optional[List[str]]
+    :param observe: False if the command was already counted in the metrics, e.g. when it
+        ran on a thread without the request and is added to the request afterwards.
+    :type observe: bool
+    """
+    if observe:
+        observe_usage(usage)
+    if has_app_context():
+        g.setdefault('usage', []).append(dict(usage, cmd=cmd))
+
+
+def usage_summary() -> Optional[Dict[str, Any]]:
+    """Sums up the usage of all commands of the current request.
+
+    :return: Total wall and CPU time, peak memory, total output and whether it was
+        truncated and the first exceeded limit, or None if no command ran.
+    :rtype: Optional[Dict[str, Any]]
+    """
+    usages = g.get('usage') if has_app_context() else None
+    if not usages:
+        return None
+
+    return {'wall_ms': sum(u['wall_ms'] for u in usages),
+            'cpu_ms': sum(u['cpu_ms'] or 0 for u in usages),
+            'max_rss_kb': max(u['max_rss_kb'] or 0 for u in usages),
+            # The daemon pools do not report their output
+            'output_bytes': sum(u.get('output_bytes') or 0 for u in usages),
+            'truncated': any(u.get('truncated') for u in usages),
+            'limit': next((u['limit'] for u in usages if u['limit'] is not None), None)}
+
+
+def _exit_code(status: int) -> int:
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def apply_limits(pid: int, limits: Limits, cgroup: Optional[str]):
+    """Moves a started process into its cgroup and sets its CPU and memory rlimits. The
+    memory is limited by the cgroup if there is one.
+
+    :param pid: The process id.
+    :type pid: int
+    :param limits: The limits of the process.
+    :type limits: Limits
+    :param cgroup: The cgroup of the process, see "create_cgroup".
+    :type cgroup: Optional[str]
+    """
+    try:
+        if cgroup is not None:
+            _write(cgroup, 'cgroup.procs', str(pid))
+        if limits.cpu_seconds > 0:
+            resource.prlimit(pid, resource.RLIMIT_CPU, (limits.cpu_seconds, limits.cpu_seconds + CPU_GRACE))
+        if limits.memory_bytes > 0 and cgroup is None:
+            resource.prlimit(pid, resource.RLIMIT_DATA, (limits.memory_bytes, limits.memory_bytes))
+    except OSError:
+        # The process already exited
+        pass
+
+
+def exceeded_limit(limits: Limits,
+                   returncode: int,
+                   cpu_seconds: Optional[float],
+                   cgroup: Optional[str]) -> Optional[str]:
+    """Tells which limit stopped a process, call it before the cgroup is removed.
+
+    :param limits: The limits of the process.
+    :type limits: Limits
+    :param returncode: The exit code of the process, negative if it was killed by a signal.
+    :type returncode: int
+    :param cpu_seconds: The CPU time the process used, None if unknown.
+    :type cpu_seconds: Optional[float]
+    :param cgroup: The cgroup of the process.
+    :type cgroup: Optional[str]
+
+    :return: "memory", "cpu" or None.
+    :rtype: Optional[str]
+    """
+    if cgroup is not None:
+        events = _read(cgroup, 'memory.events') or ''
+        if any(line.split()[0] == 'oom_kill' and line.split()[1] != '0' for line in events.splitlines()):
+            return LIMIT_MEMORY
+
+    # SIGXCPU is only sent at the soft limit, SIGKILL at the hard one. The measured
+    # CPU time can fall a tick short of the limit that stopped the process
+    if limits.cpu_seconds > 0 and \
+            (returncode == -signal.SIGXCPU or
+             returncode == -signal.SIGKILL and (cpu_seconds is None or cpu_seconds >= 0.9 * limits.cpu_seconds)):
+        return LIMIT_CPU
+    return None
+
+
+def create_cgroup(limits: Limits) -> Optional[str]:
+    """Creates a cgroup for one process below "JOB_CGROUP_ROOT". The root has to be a
+    cgroup v2 dir delegated to the app with the memory and pids controllers enabled.
+
+    :param limits: The limits of the process.
+    :type limits: Limits
+
+    :return: The path of the cgroup or None if processes run without one, also if neither
+        memory nor processes are limited.
+    :rtype: Optional[str]
+    """
+    if not JOB_CGROUP_ROOT or limits.memory_bytes <= 0 and limits.processes <= 0:
+        return None
+
+    path = os.path.join(JOB_CGROUP_ROOT, 'job-' + uuid.uuid4().hex)
+    try:
+        os.mkdir(path)
+        if limits.memory_bytes > 0:
+            _write(path, 'memory.max', str(limits.memory_bytes))
+            _write(path, 'memory.swap.max', '0')
+        if limits.processes > 0:
+            _write(path, 'pids.max', str(limits.processes))
+    except OSError:
+        remove_cgroup(path)
+        return None
+    return path
+
+
+def kill_cgroup(path: str):
+    """Kills every process of a cgroup.
+
+    :param path: The cgroup.
+    :type path: str
+    """
+    try:
+        _write(path, 'cgroup.kill', '1')
+        return
+    except OSError:
+        pass
+
+    # Kernels before 5.14 have no "cgroup.kill"
+    for pid in (_read(path, 'cgroup.procs') or '').split():
+        try:
+            os.kill(int(pid), signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+def remove_cgroup(path: str):
+    """Removes a cgroup once its killed processes left it.
+
+    :param path: The cgroup.
+    :type path: str
+    """
+    # Killed processes leave the cgroup asynchronously
+    for _ in range(50):
+        try:
+            os.rmdir(path)
+            return
+        except FileNotFoundError:
+            return
+        except OSError:
+            time.sleep(0.01)
+
+
+def _read(path: str, name: str) -> Optional[str]:
+    try:
+        with open(os.path.join(path, name)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _write(path: str, name: str, value: str):
+    with open(os.path.join(path, name), 'w') as f:
+        f.write(value)
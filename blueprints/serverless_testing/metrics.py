@@ -0,0 +1,109 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+from flask import has_request_context, request
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client import multiprocess
+
+from blueprints.serverless_testing.timings import add_timing
+
+# GLOBALS
+# Set by gunicorn.conf.py before the workers start, every worker writes its samples to this dir
+METRICS_DIR = os.environ.get('prometheus_multiproc_dir')
+
+STAGE_QUEUE = 'queue'
+STAGE_UPLOAD = 'upload'
+STAGE_EXTRACT = 'extract'
+STAGE_COMPILE = 'compile'
+STAGE_EXECUTE = 'execute'
+STAGE_CLEANUP = 'cleanup'
+
+# From a cached compile to a full gradle build
+BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+REQUESTS = Counter('quellcoda_requests_total', 'Requests by endpoint and status code.',
+                   ['endpoint', 'method', 'status'])
+REQUEST_DURATION = Histogram('quellcoda_request_duration_seconds', 'Duration of requests including streaming.',
+                             ['endpoint'], buckets=BUCKETS)
+STAGE_DURATION = Histogram('quellcoda_stage_duration_seconds', 'Duration of the stages of a job.',
+                           ['endpoint', 'stage'], buckets=BUCKETS)
+IN_FLIGHT = Gauge('quellcoda_requests_in_flight', 'Requests being handled.',
+                  ['endpoint'], multiprocess_mode='livesum')
+QUEUE_DEPTH = Gauge('quellcoda_queue_depth', 'Jobs waiting for a background worker, a gradle slot or a scheduler lane.',
+                    ['queue'], multiprocess_mode='livesum')
+SUBPROCESS_EXITS = Counter('quellcoda_subprocess_exits_total', 'Finished commands by tool and exit code.',
+                           ['tool', 'exit_code'])
+SUBPROCESS_LIMITS = Counter('quellcoda_subprocess_limit_exceeded_total',
+                            'Commands stopped by a limit, "wall" are timeouts.', ['tool', 'limit'])
+GRADLE_EXECUTION_PATHS = Counter('quellcoda_gradle_execution_path_total',
+                                 'Gradle projects by how they ran, "fast" ran without gradle.', ['path'])
+WARMUP_DURATION = Histogram('quellcoda_warmup_duration_seconds',
+                            'Duration of the warm-up of a worker by step, "total" for all steps.',
+                            ['step'], buckets=BUCKETS)
+
+
+def current_endpoint() -> str:
+    """The route of the current request, e.g. "/run/java". Background work outside of a
+    request is labelled "background".
+
+    :return: The endpoint label.
+    :rtype: str
+    """
+    if not has_request_context():
+        return 'background'
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+@contextmanager
+def measure_stage(name: str) -> Iterator[None]:
+    """Measures the duration of a stage of the current request.
+
+    :param name: One of "queue", "upload", "extract", "compile", "execute" or "cleanup".
+    :type name: str
+    """
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.monotonic() - start)
+
+
+def observe_stage(name: str, seconds: float):
+    """Records the duration of a stage that was measured by the caller, e.g. in a stream,
+    in the metrics and the timings of the request.
+
+    :param name: One of "queue", "upload", "extract", "compile", "execute" or "cleanup".
+    :type name: str
+    :param seconds: The duration.
+    :type seconds: float
+    """
+    STAGE_DURATION.labels(current_endpoint(), name).observe(seconds)
+    add_timing(name, seconds)
+
+
+def observe_usage(usage: Dict[str, Any]):
+    """Counts a finished command by exit code and the limit it exceeded.
+
+    :param usage: The usage of the command, see :func:limits.record_usage.
+    :type usage: Dict[str, Any]
+    """
+    SUBPROCESS_EXITS.labels(usage['tool'], str(usage['exit_code'])).inc()
+    if usage['limit'] is not None:
+        SUBPROCESS_LIMITS.labels(usage['tool'], usage['limit']).inc()
+
+
+def render_metrics() -> bytes:
+    """Renders all metrics in the Prometheus text format, summed over all gunicorn
+    workers if they share "METRICS_DIR".
+
+    :return: The metrics.
+    :rtype: bytes
+    """
+    if METRICS_DIR is None:
+        return generate_latest(REGISTRY)
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=METRICS_DIR)
+    return generate_latest(registry)
@@ -0,0 +1,251 @@
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+from blueprints.serverless_testing.helpers import GRADLE_PATH, env_flag
+
+# GLOBALS
+# A file based maven repository gradle builds resolve all dependencies and plugins from
+GRADLE_MIRROR_DIR = os.environ.get('GRADLE_MIRROR_DIR', '/app/gradle-mirror')
+GRADLE_MIRROR_ARTIFACTS = os.environ.get('GRADLE_MIRROR_ARTIFACTS', '/app/gradle-mirror.txt')
+GRADLE_MIRROR_UPSTREAM = os.environ.get('GRADLE_MIRROR_UPSTREAM', 'https://repo.maven.apache.org/maven2/')
+GRADLE_OFFLINE = env_flag('GRADLE_OFFLINE', True)
+
+INIT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mirror.gradle')
+
+ARTIFACT_PATTERN = re.compile(r'^[\w.-]+:[\w.-]+:[\w.+-]+$')
+
+# Seconds the rebuild may take to download everything
+MIRROR_RESOLVE_TIMEOUT = 1800
+
+
+class MirrorError(Exception):
+    """Raised if the mirror can not be rebuilt, e.g. if an artifact does not exist.
+    """
+
+
+def mirror_path() -> str:
+    """The path builds use, a link to the latest complete build of the mirror.
+
+    :return: The path of the repository.
+    :rtype: str
+    """
+    return os.path.join(GRADLE_MIRROR_DIR, 'repo')
+
+
+def mirror_args() -> List[str]:
+    """The gradle options that replace every repository of a build by the mirror and
+    keep the build off the network. Without a mirror builds resolve online as before.
+
+    :return: The gradle command line options.
+    :rtype: List[str]
+    """
+    if not GRADLE_OFFLINE or not os.path.isdir(mirror_path()):
+        return []
+    # The link is resolved once, a build keeps its mirror even if the mirror is rebuilt meanwhile
+    return ['--offline', '--init-script', INIT_SCRIPT, '-Dquellcoda.mirror=file://' + os.path.realpath(mirror_path())]
+
+
+def read_artifacts(path: Optional[str] = None) -> List[str]:
+    """Reads the allowlist of mirrored artifacts, one "group:artifact:version" per line.
+
+    :param path: The allowlist, defaults to "GRADLE_MIRROR_ARTIFACTS".
+    :type path: Optional[str]
+
+    :return: The artifacts in file order.
+    :rtype: List[str]
+    """
+    try:
+        with open(path or GRADLE_MIRROR_ARTIFACTS) as f:
+            lines = [line.split('#', 1)[0].strip() for line in f]
+    except FileNotFoundError:
+        return []
+    return [line for line in lines if line]
+
+
+def add_artifacts(artifacts: List[str], path: Optional[str] = None) -> List[str]:
+    """Appends artifacts to the allowlist, artifacts already listed are skipped.
+
+    :param artifacts: The artifacts, e.g. "org.assertj:assertj-core:3.16.1".
+    :type artifacts: List[str]
+    :param path: The allowlist, defaults to "GRADLE_MIRROR_ARTIFACTS".
+    :type path: Optional[str]
+
+    :raises MirrorError: If an artifact is not of the form "group:artifact:version".
+
+    :return: The added artifacts.
+    :rtype: List[str]
+    """
+    for artifact in artifacts:
+        if not ARTIFACT_PATTERN.match(artifact):
+            raise MirrorError('Artifact [{0}] is not of the form group:artifact:version!'.format(artifact))
+
+    known = set(read_artifacts(path))
+    added = []
+    for artifact in artifacts:
+        if artifact not in known:
+            known.add(artifact)
+            added.append(artifact)
+
+    if added:
+        with open(path or GRADLE_MIRROR_ARTIFACTS, 'a') as f:
+            f.write(''.join(artifact + '\n' for artifact in added))
+    return added
+
+
+def rebuild_mirror(artifacts: List[str]) -> str:
+    """Downloads the artifacts with all their dependencies from "GRADLE_MIRROR_UPSTREAM"
+    and replaces the mirror once everything is downloaded. Builds running meanwhile keep
+    using the previous mirror, which is kept until the next rebuild.
+
+    :param artifacts: The artifacts to mirror.
+    :type artifacts: List[str]
+
+    :raises MirrorError: If gradle could not resolve the artifacts.
+
+    :return: The path of the new mirror.
+    :rtype: str
+    """
+    os.makedirs(GRADLE_MIRROR_DIR, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=GRADLE_MIRROR_DIR, prefix='.resolve-') as work_path:
+        gradle_home = os.path.join(work_path, 'home')
+        resolve_artifacts(artifacts, os.path.join(work_path, 'project'), gradle_home)
+
+        repo_path = os.path.join(GRADLE_MIRROR_DIR, 'repo-{0}'.format(int(time.time() * 1000)))
+        copy_cache_to_repo(os.path.join(gradle_home, 'caches', 'modules-2', 'files-2.1'), repo_path)
+
+    publish_repo(repo_path)
+    return repo_path
+
+
+def resolve_artifacts(artifacts: List[str], project_path: str, gradle_home: str):
+    """Lets gradle download the artifacts and their dependencies into a fresh gradle user
+    home, for compiling and running like the builds of the service do. Every listed
+    version of a module is downloaded.
+
+    :param artifacts: The artifacts to resolve.
+    :type artifacts: List[str]
+    :param project_path: The dir of the generated project.
+    :type project_path: str
+    :param gradle_home: The gradle user home the artifacts are downloaded to.
+    :type gradle_home: str
+
+    :raises MirrorError: If gradle could not resolve the artifacts.
+    """
+    # Each artifact is resolved on its own, in one configuration gradle would only keep the
+    # newest of several versions of a module
+    notations = ', '.join("'{0}'".format(a) for a in artifacts)
+    os.makedirs(project_path)
+    with open(os.path.join(project_path, 'settings.gradle'), 'w') as f:
+        f.write("rootProject.name = 'mirror'\n")
+    with open(os.path.join(project_path, 'build.gradle'), 'w') as f:
+        f.write("plugins {{ id 'java' }}\n"
+                "repositories {{ maven {{ url '{0}' }} }}\n"
+                "task resolveMirror {{\n"
+                "    doLast {{\n"
+                "        [{1}].each {{ notation ->\n"
+                "            [Usage.JAVA_API, Usage.JAVA_RUNTIME].each {{ usage ->\n"
+                "                def conf = configurations.detachedConfiguration(dependencies.create(notation))\n"
+                "                conf.attributes.attribute(Usage.USAGE_ATTRIBUTE, objects.named(Usage, usage))\n"
+                "                conf.attributes.attribute(Category.CATEGORY_ATTRIBUTE,\n"
+                "                                          objects.named(Category, Category.LIBRARY))\n"
+                "                conf.resolve()\n"
+                "            }}\n"
+                "        }}\n"
+                "    }}\n"
+                "}}\n".format(GRADLE_MIRROR_UPSTREAM, notations))
+
+    cmd = [GRADLE_PATH, 'resolveMirror', '--no-daemon', '--console=plain',
+           '--gradle-user-home', gradle_home, '--project-dir', project_path]
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=MIRROR_RESOLVE_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise MirrorError('Gradle could not be run: {0}'.format(e))
+    if proc.returncode != 0:
+        raise MirrorError(proc.stdout.decode(errors='replace'))
+
+
+def copy_cache_to_repo(cache_path: str, repo_path: str) -> int:
+    """Copies the artifacts of a gradle cache into the layout of a maven repository.
+    The cache has one dir per checksum, "<group>/<artifact>/<version>/<sha1>/<file>",
+    the repository "<group as path>/<artifact>/<version>/<file>".
+
+    :param cache_path: The "files-2.1" dir of a gradle user home.
+    :type cache_path: str
+    :param repo_path: The dir of the repository, created if missing.
+    :type repo_path: str
+
+    :return: The number of copied files.
+    :rtype: int
+    """
+    count = 0
+    for root, _, names in os.walk(cache_path):
+        parts = os.path.relpath(root, cache_path).split(os.sep)
+        if len(parts) != 4:
+            continue
+        group, artifact, version, _ = parts
+        dest = os.path.join(repo_path, *group.split('.'), artifact, version)
+        os.makedirs(dest, exist_ok=True)
+        for name in names:
+            shutil.copyfile(os.path.join(root, name), os.path.join(dest, name))
+            count += 1
+    return count
+
+
+def publish_repo(repo_path: str):
+    """Points the mirror to "repo_path" at once and removes all but the previous mirror.
+
+    :param repo_path: The new repository, inside "GRADLE_MIRROR_DIR".
+    :type repo_path: str
+    """
+    previous = os.path.realpath(mirror_path()) if os.path.islink(mirror_path()) else None
+
+    link_path = os.path.join(GRADLE_MIRROR_DIR, '.repo-{0}'.format(os.getpid()))
+    os.symlink(os.path.basename(repo_path), link_path)
+    os.replace(link_path, mirror_path())
+
+    for name in os.listdir(GRADLE_MIRROR_DIR):
+        path = os.path.join(GRADLE_MIRROR_DIR, name)
+        if name.startswith('repo-') and path not in (repo_path, previous):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintains the offline dependency mirror of the gradle builds.')
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('list', help='List the mirrored artifacts.')
+    add = commands.add_parser('add', help='Rebuild the mirror with further artifacts and add them to the allowlist.')
+    add.add_argument('artifacts', nargs='+', help='Artifacts of the form group:artifact:version.')
+    add.add_argument('--no-rebuild', action='store_true', help='Only add the artifacts to the allowlist.')
+    commands.add_parser('rebuild', help='Download all artifacts of the allowlist again.')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'list':
+            print('\n'.join(read_artifacts()))
+            return
+        if args.command == 'add':
+            # The allowlist only takes artifacts that could be downloaded
+            if not args.no_rebuild:
+                print('mirror: {0}'.format(rebuild_mirror(read_artifacts() + args.artifacts)))
+            for artifact in add_artifacts(args.artifacts):
+                print('added {0}'.format(artifact))
+        elif args.command == 'rebuild':
+            print('mirror: {0}'.format(rebuild_mirror(read_artifacts())))
+        else:
+            parser.print_help()
+            sys.exit(2)
+    except MirrorError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    # python -m blueprints.serverless_testing.mirror add org.assertj:assertj-core:3.16.1
+    main()
@@ -0,0 +1,225 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from flask import g, has_app_context
+
+from blueprints.serverless_testing.helpers import env_flag, env_int
+from blueprints.serverless_testing.limits import JOB_MEMORY_MB
+from blueprints.serverless_testing.metrics import QUEUE_DEPTH, STAGE_QUEUE, observe_stage
+
+# GLOBALS
+SCHEDULER_ENABLED = env_flag('SCHEDULER', True)
+# Jobs running at once per gunicorn worker, 0 derives the number from cores and memory
+SCHEDULER_SLOTS = env_int('SCHEDULER_SLOTS', 0)
+# Jobs waiting per gunicorn worker, 0 derives the number from the request threads of the worker
+SCHEDULER_QUEUE_SIZE = env_int('SCHEDULER_QUEUE_SIZE', 0)
+# The queue size while the request threads are unknown, e.g. outside of gunicorn
+DEFAULT_QUEUE_SIZE = 32
+
+# Lanes in the order they are served, a job only starts if no lane before has jobs waiting
+LANE_INTERACTIVE = 'interactive'
+LANE_TEST = 'test'
+LANE_GRADLE = 'gradle'
+LANE_BATCH = 'batch'
+LANES = (LANE_INTERACTIVE, LANE_TEST, LANE_GRADLE, LANE_BATCH)
+
+# Seconds a job is expected to take before any job finished, for "Retry-After"
+DEFAULT_JOB_SECONDS = 2.0
+# Weight of the latest job in the moving average of the job duration
+JOB_SECONDS_WEIGHT = 0.2
+
+
+class QueueFullError(Exception):
+    """Raised if a job can not be queued because the queue is full.
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__('Too many jobs queued, retry in {0} seconds!'.format(retry_after))
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A job admitted by the scheduler. The slot is held until the ticket is released,
+    e.g. at the end of a "with" block.
+    """
+    __slots__ = ('scheduler', 'granted', 'released', 'start')
+
+    def __init__(self, scheduler: Optional['Scheduler']):
+        self.scheduler = scheduler
+        self.granted = False
+        self.released = False
+        self.start = None
+
+    def release(self):
+        """Frees the slot for the next job, only the first call counts.
+        """
+        if self.scheduler is not None and self.granted and not self.released:
+            self.released = True
+            self.scheduler.release(time.monotonic() - self.start)
+
+    def __enter__(self) -> 'Ticket':
+        return self
+
+    def __exit__(self, *_):
+        self.release()
+
+
+class Scheduler:
+    """Admits jobs to a fixed number of slots. Waiting jobs are served by lane, and
+    within a lane round robin by client, so a client sending many jobs only delays its
+    own jobs. Slots and queue are per gunicorn worker.
+    """
+
+    def __init__(self, slots: int, queue_size: int):
+        self.slots = max(slots, 1)
+        self.queue_size = queue_size
+        self.running = 0
+        self.queued = 0
+        self.job_seconds = DEFAULT_JOB_SECONDS
+        self._cond = threading.Condition()
+        self._lanes = {lane: OrderedDict() for lane in LANES}
+
+    def acquire(self, lane: str, client: str, bounded: bool = True) -> Ticket:
+        """Waits for a slot.
+
+        :param lane: One of "LANES".
+        :type lane: str
+        :param client: Identifies the sender of the job for fair queuing.
+        :type client: str
+        :param bounded: False to queue the job even if the queue is full, e.g. for jobs
+            that already waited in a queue of their own.
+        :type bounded: bool
+
+        :raises QueueFullError: If the job would have to wait and the queue is full.
+
+        :return: The granted ticket.
+        :rtype: Ticket
+        """
+        ticket = Ticket(self)
+        with self._cond:
+            if self.running < self.slots and self.queued == 0:
+                self.running += 1
+                ticket.granted = True
+            else:
+                if bounded and self.queued >= self.queue_size:
+                    raise QueueFullError(self.retry_after())
+                self._lanes[lane].setdefault(client, deque()).append(ticket)
+                self.queued += 1
+                QUEUE_DEPTH.labels(lane).inc()
+                while not ticket.granted:
+                    self._cond.wait()
+        ticket.start = time.monotonic()
+        return ticket
+
+    def release(self, seconds: float):
+        """Frees a slot and starts the next waiting job.
+
+        :param seconds: How long the slot was held.
+        :type seconds: float
+        """
+        with self._cond:
+            self.running -= 1
+            self.job_seconds += JOB_SECONDS_WEIGHT * (seconds - self.job_seconds)
+            self._dispatch()
+
+    def retry_after(self) -> int:
+        """Estimates when a job would not have to wait anymore.
+
+        :return: The seconds, at least 1.
+        :rtype: int
+        """
+        return max(1, math.ceil((self.queued + 1) / self.slots * self.job_seconds))
+
+    def _dispatch(self):
+        while self.running < self.slots and self.queued > 0:
+            lane = next(lane for lane in LANES if self._lanes[lane])
+            clients = self._lanes[lane]
+            client, tickets = next(iter(clients.items()))
+            ticket = tickets.popleft()
+            if tickets:
+                clients.move_to_end(client)
+            else:
+                del clients[client]
+
+            self.queued -= 1
+            self.running += 1
+            QUEUE_DEPTH.labels(lane).dec()
+            ticket.granted = True
+        self._cond.notify_all()
+
+
+def default_slots() -> int:
+    """The jobs that fit on the machine, one per core as long as every job can use its
+    full "JOB_MEMORY_MB".
+
+    :return: The number of slots.
+    :rtype: int
+    """
+    cores = os.cpu_count() or 1
+    memory_mb = _memory_mb()
+    if memory_mb is None or JOB_MEMORY_MB <= 0:
+        return cores
+    return max(1, min(cores, memory_mb // JOB_MEMORY_MB))
+
+
+def configure_threads(threads: int):
+    """Bounds the queue of this worker by its request threads, unless "SCHEDULER_QUEUE_SIZE"
+    is set. Every waiting job holds a thread, so a longer queue would never fill up and
+    further requests would wait for a thread instead of being rejected. One thread stays
+    free to answer them.
+
+    :param threads: The request threads of the worker, e.g. "--threads" of gunicorn.
+    :type threads: int
+    """
+    if SCHEDULER_QUEUE_SIZE <= 0:
+        _scheduler.queue_size = max(threads - _scheduler.slots - 1, 0)
+
+
+def admit(lane: str, client: str, bounded: bool = True) -> Ticket:
+    """Waits for a slot of the scheduler of this worker. The wait is reported as stage
+    "queue" of the request.
+
+    :param lane: One of "LANES".
+    :type lane: str
+    :param client: Identifies the sender of the job for fair queuing.
+    :type client: str
+    :param bounded: False to queue the job even if the queue is full.
+    :type bounded: bool
+
+    :raises QueueFullError: If the job would have to wait and the queue is full.
+
+    :return: The ticket, to be released when the job is done.
+    :rtype: Ticket
+    """
+    if not SCHEDULER_ENABLED:
+        return Ticket(None)
+
+    start = time.monotonic()
+    ticket = _scheduler.acquire(lane, client, bounded=bounded)
+    observe_stage(STAGE_QUEUE, time.monotonic() - start)
+    if has_app_context():
+        g.queue_wait_ms = int((time.monotonic() - start) * 1000)
+    return ticket
+
+
+def _memory_mb() -> Optional[int]:
+    # The cgroup limit of the container, if any, otherwise the memory of the machine
+    try:
+        with open('/sys/fs/cgroup/memory.max') as f:
+            value = f.read().strip()
+        if value.isdigit():
+            return int(value) // (1024 * 1024)
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (ValueError, OSError):
+        return None
+
+
+# Slots and queue of this worker
+_scheduler = Scheduler(SCHEDULER_SLOTS or default_slots(), SCHEDULER_QUEUE_SIZE or DEFAULT_QUEUE_SIZE)
@@ -0,0 +1,378 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from blueprints.serverless_testing.classfile import ClassFileError, read_class_info
+from blueprints.serverless_testing.exec_types.compile import javac
+from blueprints.serverless_testing.helpers import JUNIT_PATH, env_int, jdk_fingerprint
+from blueprints.serverless_testing.workspaces import WORKSPACE_RAM, WORKSPACE_RAM_ROOT
+
+# GLOBALS
+# Next to the RAM workspaces by default, sessions are shared by all gunicorn workers
+SESSIONS_DIR = os.environ.get('SESSIONS_DIR', os.path.join(WORKSPACE_RAM_ROOT, 'sessions') if WORKSPACE_RAM
+                              else os.path.join(tempfile.gettempdir(), 'sessions'))
+SESSIONS_TTL = env_int('SESSIONS_TTL', 1800)
+SESSIONS_MAX_BYTES = env_int('SESSIONS_MAX_MB', 256) * 1024 * 1024
+
+PRUNE_INTERVAL = 60
+
+SESSION_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# References to these packages never point to a source of the session
+LIBRARY_PREFIXES = ('java/', 'javax/', 'jdk/', 'sun/', 'org/junit/', 'org/opentest4j/', 'org/apiguardian/')
+
+_last_prune = 0.0
+
+
+def create_session() -> Dict[str, Any]:
+    """Creates an empty editor session.
+
+    :return: The metadata of the session.
+    :rtype: Dict[str, Any]
+    """
+    prune_sessions()
+
+    session_id = uuid.uuid4().hex
+    os.makedirs(os.path.join(_session_path(session_id), 'src'))
+    os.makedirs(os.path.join(_session_path(session_id), 'classes'))
+
+    state = {'id': session_id, 'created': time.time(), 'jdk': jdk_fingerprint(), 'sources': {}}
+    _write_state(state)
+    return {'id': session_id, 'created': state['created']}
+
+
+@contextmanager
+def use_session(session_id: str) -> Iterator[Optional[str]]:
+    """Locks a session for one submission, so compiling and running never overlap with
+    another submission of the same session. Marks the session as used.
+
+    :param session_id: The id of the session.
+    :type session_id: str
+
+    :return: The dir of the compiled classes or None if the session is unknown or expired.
+    :rtype: Iterator[Optional[str]]
+    """
+    _prune_if_due()
+
+    if not SESSION_ID_PATTERN.match(session_id):
+        yield None
+        return
+
+    try:
+        lock = open(os.path.join(_session_path(session_id), '.lock'), 'w')
+    except OSError:
+        yield None
+        return
+
+    with lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        # The session may have been evicted while waiting for the lock
+        try:
+            os.utime(_state_path(session_id))
+            classes_path = os.path.join(_session_path(session_id), 'classes')
+        except OSError:
+            classes_path = None
+        yield classes_path
+
+
+def update_session(session_id: str, file_paths: List[str]) -> Tuple[Optional[str], Optional[str], List[str]]:
+    """Replaces the sources of a session with "file_paths" and compiles only what is needed:
+    changed and new files, plus every file depending on a changed or removed one. Classes
+    of removed files are deleted. Has to be called within :func:use_session.
+
+    A file depends on another if its classes refer to the classes of the other, or if its
+    source mentions one of their names, which catches constants javac inlines.
+
+    :param session_id: The id of the session.
+    :type session_id: str
+    :param file_paths: All java files of the submission.
+    :type file_paths: List[str]
+
+    :return: The stdout and stderr of javac and the names of the compiled files.
+    :rtype: Tuple[Optional[str], Optional[str], List[str]]
+    """
+    state = _read_state(session_id)
+    src_path = os.path.join(_session_path(session_id), 'src')
+    classes_path = os.path.join(_session_path(session_id), 'classes')
+
+    # Classes built by another JDK are rebuilt from scratch
+    if state.get('jdk') != jdk_fingerprint():
+        shutil.rmtree(classes_path, ignore_errors=True)
+        os.makedirs(classes_path)
+        state.update(jdk=jdk_fingerprint(), sources={})
+
+    sources = state['sources']
+    paths = {os.path.basename(path): path for path in file_paths}
+    hashes = {}
+    for name, path in paths.items():
+        with open(path, 'rb') as f:
+            hashes[name] = hashlib.sha256(f.read()).hexdigest()
+
+    changed = {name for name, digest in hashes.items() if sources.get(name, {}).get('hash') != digest}
+    removed = set(sources) - set(hashes)
+    dirty_types = {t for name in changed | removed for t in sources.get(name, {}).get('types', [])}
+
+    depending = dependents(sources, changed | removed, dirty_types, src_path)
+
+    for name in changed:
+        shutil.copyfile(paths[name], os.path.join(src_path, name))
+    for name in removed:
+        _remove_classes(classes_path, sources.pop(name)['classes'])
+        os.remove(os.path.join(src_path, name))
+
+    compile_names = sorted(changed | depending)
+    if not compile_names:
+        _write_state(state)
+        return None, None, []
+
+    # Sources that do not compile are compiled again with the next submission
+    for name in compile_names:
+        sources.setdefault(name, {'classes': [], 'types': [], 'refs': []})['hash'] = None
+
+    build_path = tempfile.mkdtemp(prefix='.build-', dir=_session_path(session_id))
+    try:
+        stdout, stderr = javac(file_paths=[os.path.join(src_path, name) for name in compile_names],
+                               out_path=build_path,
+                               class_path=classes_path + ':' + JUNIT_PATH)
+        if stdout is None and stderr is None:
+            for name in compile_names:
+                _remove_classes(classes_path, sources[name]['classes'])
+                sources[name] = {'hash': hashes[name], 'classes': [], 'types': [], 'refs': []}
+            _install_classes(build_path, classes_path, sources)
+    finally:
+        shutil.rmtree(build_path, ignore_errors=True)
+        _write_state(state)
+
+    return stdout, stderr, compile_names
+
+
+def dependents(sources: Dict[str, Dict[str, Any]],
+               names: Set[str],
+               dirty_types: Set[str],
+               src_path: str) -> Set[str]:
+    """Finds all files depending on "names", directly or through other files.
+
+    :param sources: The compiled files of the session with their classes and references.
+    :type sources: Dict[str, Dict[str, Any]]
+    :param names: The changed or removed files.
+    :type names: Set[str]
+    :param dirty_types: The classes the changed or removed files declared before.
+    :type dirty_types: Set[str]
+    :param src_path: The dir of the sources.
+    :type src_path: str
+
+    :return: The names of the depending files, without "names" themselves.
+    :rtype: Set[str]
+    """
+    owners = {t: name for name, source in sources.items() for t in source.get('types', [])}
+    users = {}
+    for name, source in sources.items():
+        for ref in source.get('refs', []):
+            owner = owners.get(ref)
+            if owner is not None and owner != name:
+                users.setdefault(owner, set()).add(name)
+
+    found = set()
+    pending = list(names)
+
+    # Compile time constants are inlined and leave no reference in the class file
+    simple_names = {t.rsplit('/', 1)[-1].split('$')[0] for t in dirty_types}
+    if simple_names:
+        pattern = re.compile(r'\b(' + '|'.join(re.escape(n) for n in sorted(simple_names)) + r')\b')
+        for name in sources:
+            if name not in names and pattern.search(_read_source(src_path, name)):
+                found.add(name)
+                pending.append(name)
+
+    while pending:
+        for user in users.get(pending.pop(), ()):
+            if user not in found and user not in names:
+                found.add(user)
+                pending.append(user)
+    return {name for name in found if name in sources}
+
+
+def describe_session(session_id: str) -> Optional[Dict[str, Any]]:
+    """Lists the files of a session.
+
+    :param session_id: The id of the session.
+    :type session_id: str
+
+    :return: The metadata of the session or None if the session is unknown.
+    :rtype: Optional[Dict[str, Any]]
+    """
+    if not SESSION_ID_PATTERN.match(session_id):
+        return None
+    try:
+        state = _read_state(session_id)
+        last_used = os.path.getmtime(_state_path(session_id))
+    except (OSError, ValueError):
+        return None
+
+    return {'id': session_id,
+            'created': state['created'],
+            'last_used': last_used,
+            'files': sorted(state['sources']),
+            'failed': sorted(name for name, source in state['sources'].items() if source['hash'] is None)}
+
+
+def delete_session(session_id: str) -> bool:
+    """Removes a session once no submission uses it.
+
+    :param session_id: The id of the session.
+    :type session_id: str
+
+    :return: False if the session is unknown.
+    :rtype: bool
+    """
+    with use_session(session_id) as classes_path:
+        if classes_path is None:
+            return False
+        _remove_session(session_id)
+    return True
+
+
+def prune_sessions():
+    """Removes sessions idle for "SESSIONS_TTL" and the least recently used sessions
+    beyond "SESSIONS_MAX_MB". Sessions in use are skipped.
+    """
+    global _last_prune
+    _last_prune = time.time()
+
+    os.makedirs(SESSIONS_DIR, exist_ok=True)
+    now = time.time()
+    sessions = []
+    for session_id in os.listdir(SESSIONS_DIR):
+        if not SESSION_ID_PATTERN.match(session_id):
+            continue
+        try:
+            last_used = os.path.getmtime(_state_path(session_id))
+        except OSError:
+            # Sessions are created with their state, anything else is a leftover
+            last_used = 0.0
+        sessions.append((last_used, _tree_size(_session_path(session_id)), session_id))
+
+    total = sum(size for _, size, _ in sessions)
+    for last_used, size, session_id in sorted(sessions):
+        if now - last_used <= SESSIONS_TTL and total <= SESSIONS_MAX_BYTES:
+            break
+        if _try_remove(session_id):
+            total -= size
+
+
+def _prune_if_due():
+    if time.time() - _last_prune > PRUNE_INTERVAL:
+        prune_sessions()
+
+
+def _try_remove(session_id: str) -> bool:
+    try:
+        lock = open(os.path.join(_session_path(session_id), '.lock'), 'w')
+    except OSError:
+        shutil.rmtree(_session_path(session_id), ignore_errors=True)
+        return True
+
+    with lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        _remove_session(session_id)
+    return True
+
+
+def _remove_session(session_id: str):
+    """Moves the session out of the way before deleting it, so it is gone at once for
+    every worker.
+    """
+    doomed = os.path.join(SESSIONS_DIR, '.removed-{0}-{1}'.format(session_id, time.monotonic_ns()))
+    try:
+        os.rename(_session_path(session_id), doomed)
+    except OSError:
+        return
+    shutil.rmtree(doomed, ignore_errors=True)
+
+
+def _install_classes(build_path: str, classes_path: str, sources: Dict[str, Dict[str, Any]]):
+    """Moves freshly compiled classes into the session and records per file which
+    classes it declares and refers to.
+    """
+    for root, _, names in os.walk(build_path):
+        for class_name in names:
+            if not class_name.endswith('.class'):
+                continue
+            rel_path = os.path.relpath(os.path.join(root, class_name), build_path)
+            try:
+                info = read_class_info(os.path.join(root, class_name))
+            except ClassFileError:
+                continue
+
+            # javac -g:none drops the source file attribute, top level classes share the name of their file
+            source_name = info.source_file or class_name.split('$')[0].replace('.class', '.java')
+            source = sources.get(source_name)
+            if source is None:
+                continue
+
+            os.makedirs(os.path.join(classes_path, os.path.dirname(rel_path)), exist_ok=True)
+            os.replace(os.path.join(root, class_name), os.path.join(classes_path, rel_path))
+            source['classes'].append(rel_path)
+            source['types'].append(info.name)
+            source['refs'] = sorted(set(source['refs']) |
+                                    {ref for ref in info.references if not ref.startswith(LIBRARY_PREFIXES)})
+
+
+def _remove_classes(classes_path: str, rel_paths: List[str]):
+    for rel_path in rel_paths:
+        try:
+            os.remove(os.path.join(classes_path, rel_path))
+        except OSError:
+            pass
+
+
+def _read_source(src_path: str, name: str) -> str:
+    try:
+        with open(os.path.join(src_path, name), errors='replace') as f:
+            return f.read()
+    except OSError:
+        return ''
+
+
+def _read_state(session_id: str) -> Dict[str, Any]:
+    with open(_state_path(session_id)) as f:
+        return json.load(f)
+
+
+def _write_state(state: Dict[str, Any]):
+    """Writes the state of a session atomically.
+    """
+    tmp_path = _state_path(state['id']) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, _state_path(state['id']))
+
+
+def _tree_size(path: str) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return size
+
+
+def _session_path(session_id: str) -> str:
+    return os.path.join(SESSIONS_DIR, session_id)
+
+
+def _state_path(session_id: str) -> str:
+    return os.path.join(_session_path(session_id), 'session.json')
@@ -0,0 +1,79 @@
+import json
+from typing import Iterator, Optional, Tuple, Dict, Any
+
+from flask import Response, stream_with_context
+
+# GLOBALS
+STREAM_SSE = 'sse'
+STREAM_TEXT = 'text'
+STREAM_MODES = (STREAM_SSE, STREAM_TEXT)
+
+
+def stream_response(events: Iterator[Tuple[str, Any]], mode: str) -> Response:
+    """Wraps a generator of output events in a chunked response. Events are
+    ("stdout", line), ("stderr", line) and a final ("exit", trailer) where the trailer
+    holds exit code and timings. The request context stays alive while streaming.
+
+    :param events: The events of the job.
+    :type events: Iterator[Tuple[str, Any]]
+    :param mode: Either "sse" for Server-Sent Events or "text" for plain chunked text.
+    :type mode: str
+
+    :return: The streaming response.
+    :rtype: Response
+    """
+    assert mode in STREAM_MODES, '[mode] can only be sse or text'
+
+    body = (format_event(kind, data, mode) for kind, data in events)
+    mimetype = 'text/event-stream' if mode == STREAM_SSE else 'text/plain'
+    resp = Response(stream_with_context(body), status=200, mimetype=mimetype)
+
+    # Keep proxies from buffering the stream
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
+
+
+def format_event(kind: str, data: Any, mode: str) -> str:
+    """Formats one event for the wire.
+
+    :param kind: "stdout", "stderr" or "exit".
+    :type kind: str
+    :param data: The line, or the trailer dict for "exit".
+    :type data: Any
+    :param mode: Either "sse" or "text".
+    :type mode: str
+
+    :return: The encoded event.
+    :rtype: str
+    """
+    if kind == 'exit':
+        data = json.dumps(data)
+        if mode == STREAM_TEXT:
+            return '\n[exit] ' + data + '\n'
+
+    if mode == STREAM_TEXT:
+        return data
+
+    # Data of an event can not span lines, split lines are joined again by the client
+    lines = data[:-1] if data.endswith('\n') else data
+    return 'event: {0}\n{1}\n\n'.format(kind, '\n'.join('data: ' + line for line in lines.split('\n')))
+
+
+def trailer(exit_code: int, stage: str, timings: Dict[str, int],
+            usage: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+    """Builds the final event of a stream.
+
+    :param exit_code: The exit code of the last command.
+    :type exit_code: int
+    :param stage: The stage that ended the job, e.g. "compile", "run" or "test".
+    :type stage: str
+    :param timings: Durations of the stages in milliseconds.
+    :type timings: Dict[str, int]
+    :param usage: The measured usage of the last command.
+    :type usage: Optional[Dict[str, Any]]
+
+    :return: The "exit" event.
+    :rtype: Tuple[str, Dict[str, Any]]
+    """
+    return 'exit', {'exit_code': exit_code, 'stage': stage, 'timings': timings, 'usage': usage}
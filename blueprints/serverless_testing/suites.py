@@ -0,0 +1,217 @@
+import fcntl
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Any, Tuple
+
+from blueprints.serverless_testing.exec_types.compile import javac
+from blueprints.serverless_testing.helpers import JUNIT_PATH, env_int, jdk_fingerprint
+
+# GLOBALS
+SUITES_DIR = os.environ.get('SUITES_DIR', os.path.join(tempfile.gettempdir(), 'suites'))
+SUITES_TTL = env_int('SUITES_TTL', 7 * 24 * 3600)
+SUITES_MAX_VERSIONS = env_int('SUITES_MAX_VERSIONS', 5)
+
+# Versions used within this many seconds are never evicted, tests may still run against them
+SUITE_IN_USE_GRACE = 600
+PRUNE_INTERVAL = 60
+
+SUITE_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+_last_prune = 0.0
+
+
+class SuiteError(Exception):
+    """Raised if the sources of a suite do not compile.
+    """
+
+
+def register_suite(test_paths: List[str],
+                   reference_paths: List[str],
+                   suite_id: Optional[str] = None) -> Dict[str, Any]:
+    """Compiles test sources and stores the classes as a new version of a suite.
+    The classes under test are read from "reference_paths" but not stored, every
+    submission brings its own.
+
+    :param test_paths: The test java files.
+    :type test_paths: List[str]
+    :param reference_paths: Java files of a reference solution the tests refer to.
+    :type reference_paths: List[str]
+    :param suite_id: The suite to add a version to, a new suite is created if None.
+    :type suite_id: Optional[str]
+
+    :raises SuiteError: If the tests do not compile.
+    :raises KeyError: If "suite_id" is no known suite.
+
+    :return: The metadata of the stored version.
+    :rtype: Dict[str, Any]
+    """
+    prune_suites()
+
+    if suite_id is None:
+        suite_id = uuid.uuid4().hex
+        os.makedirs(_suite_path(suite_id))
+    elif not os.path.isdir(_suite_path(suite_id)):
+        raise KeyError(suite_id)
+
+    # Build next to the final location, versions become visible with a single rename
+    build_path = tempfile.mkdtemp(prefix='.build-', dir=_suite_path(suite_id))
+    try:
+        classes_path = os.path.join(build_path, 'classes')
+        reference_dirs = sorted({os.path.dirname(p) for p in reference_paths})
+        stdout, stderr = javac(file_paths=test_paths,
+                               out_path=classes_path,
+                               class_path=classes_path + ':' + JUNIT_PATH,
+                               source_path=':'.join(reference_dirs) if reference_dirs else None)
+        if stdout is not None or stderr is not None:
+            raise SuiteError(stdout or stderr)
+
+        with _lock(suite_id):
+            version = max(list_versions(suite_id) or [0]) + 1
+            meta = {'id': suite_id,
+                    'version': version,
+                    'created': time.time(),
+                    'tests': sorted(os.path.basename(p) for p in test_paths),
+                    'jdk': jdk_fingerprint()}
+            with open(os.path.join(build_path, 'suite.json'), 'w') as f:
+                json.dump(meta, f)
+            os.rename(build_path, _version_path(suite_id, version))
+    finally:
+        shutil.rmtree(build_path, ignore_errors=True)
+
+    return meta
+
+
+def resolve_suite(ref: str) -> Optional[str]:
+    """Finds the test classes of a suite reference "<id>" (latest version) or
+    "<id>@<version>" and marks the version as used.
+
+    :param ref: The suite reference.
+    :type ref: str
+
+    :return: The dir of the test classes or None if the suite or version is unknown.
+    :rtype: Optional[str]
+    """
+    _prune_if_due()
+
+    suite_id, _, version = ref.partition('@')
+    if not SUITE_ID_PATTERN.match(suite_id):
+        return None
+
+    versions = list_versions(suite_id)
+    if version:
+        if not version.isdigit() or int(version) not in versions:
+            return None
+        version = int(version)
+    elif versions:
+        version = max(versions)
+    else:
+        return None
+
+    version_path = _version_path(suite_id, version)
+    try:
+        os.utime(os.path.join(version_path, 'suite.json'))
+    except OSError:
+        return None
+    return os.path.join(version_path, 'classes')
+
+
+def describe_suite(suite_id: str) -> Optional[Dict[str, Any]]:
+    """Lists the stored versions of a suite.
+
+    :param suite_id: The id of the suite.
+    :type suite_id: str
+
+    :return: The metadata of all versions or None if the suite is unknown.
+    :rtype: Optional[Dict[str, Any]]
+    """
+    if not SUITE_ID_PATTERN.match(suite_id) or not os.path.isdir(_suite_path(suite_id)):
+        return None
+
+    versions = []
+    for version in list_versions(suite_id):
+        meta, last_used = _read_meta(suite_id, version)
+        if meta is not None:
+            meta['last_used'] = last_used
+            versions.append(meta)
+    return {'id': suite_id, 'versions': versions}
+
+
+def list_versions(suite_id: str) -> List[int]:
+    """The stored versions of a suite.
+
+    :param suite_id: The id of the suite.
+    :type suite_id: str
+
+    :return: The version numbers, sorted.
+    :rtype: List[int]
+    """
+    try:
+        names = os.listdir(_suite_path(suite_id))
+    except OSError:
+        return []
+    return sorted(int(name[1:]) for name in names if name.startswith('v') and name[1:].isdigit())
+
+
+def prune_suites():
+    """Removes versions unused for "SUITES_TTL" and the oldest versions of a suite
+    beyond "SUITES_MAX_VERSIONS". Suites without versions are removed as well.
+    """
+    global _last_prune
+    _last_prune = time.time()
+
+    os.makedirs(SUITES_DIR, exist_ok=True)
+    now = time.time()
+    for suite_id in os.listdir(SUITES_DIR):
+        if not SUITE_ID_PATTERN.match(suite_id):
+            continue
+
+        with _lock(suite_id):
+            versions = list_versions(suite_id)
+            surplus = versions[:max(len(versions) - SUITES_MAX_VERSIONS, 0)]
+            for version in versions:
+                _, last_used = _read_meta(suite_id, version)
+                unused = now - last_used
+                if unused > SUITES_TTL or (version in surplus and unused > SUITE_IN_USE_GRACE):
+                    shutil.rmtree(_version_path(suite_id, version), ignore_errors=True)
+
+            # Keep new suites whose first version is still being built
+            leftovers = [name for name in os.listdir(_suite_path(suite_id)) if name != '.lock']
+            if not leftovers and now - os.stat(_suite_path(suite_id)).st_mtime > SUITE_IN_USE_GRACE:
+                shutil.rmtree(_suite_path(suite_id), ignore_errors=True)
+
+
+def _prune_if_due():
+    if time.time() - _last_prune > PRUNE_INTERVAL:
+        prune_suites()
+
+
+def _read_meta(suite_id: str, version: int) -> Tuple[Optional[Dict[str, Any]], float]:
+    path = os.path.join(_version_path(suite_id, version), 'suite.json')
+    try:
+        with open(path) as f:
+            return json.load(f), os.stat(path).st_mtime
+    except (OSError, ValueError):
+        return None, 0.0
+
+
+@contextmanager
+def _lock(suite_id: str) -> Iterator[None]:
+    """An exclusive file lock of a suite, held while versions are added or removed.
+    """
+    with open(os.path.join(_suite_path(suite_id), '.lock'), 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def _suite_path(suite_id: str) -> str:
+    return os.path.join(SUITES_DIR, suite_id)
+
+
+def _version_path(suite_id: str, version: int) -> str:
+    return os.path.join(_suite_path(suite_id), 'v{0}'.format(version))
@@ -0,0 +1,279 @@
+import asyncio
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Awaitable, Iterator, Optional, Tuple
+
+from blueprints.serverless_testing.helpers import STREAM_CHUNK_SIZE, OutputBuffer, env_int, split_lines
+
+# GLOBALS
+# "asyncio" supervises all commands on one event loop per worker, "threads" every command on the thread of its request
+EXEC_MODE = os.environ.get('EXEC_MODE', 'asyncio')
+# Commands and daemon pool jobs running at once per worker in "asyncio" mode, further ones wait for a slot
+EXEC_CONCURRENCY = env_int('EXEC_CONCURRENCY', os.cpu_count() or 1)
+
+EXEC_MODE_THREADS = 'threads'
+EXEC_MODE_ASYNCIO = 'asyncio'
+
+# Seconds between checks if a command whose streams are closed has exited, doubled up to the maximum
+REAP_INTERVAL = 0.005
+REAP_INTERVAL_MAX = 0.1
+
+_lock = threading.Lock()
+_loop = None
+_loop_pid = None
+_limiter = None
+
+
+def asyncio_enabled() -> bool:
+    """Whether commands are supervised on the event loop of the worker.
+
+    :return: True for "EXEC_MODE=asyncio".
+    :rtype: bool
+    """
+    return EXEC_MODE == EXEC_MODE_ASYNCIO
+
+
+def event_loop() -> asyncio.AbstractEventLoop:
+    """The event loop of the worker, started on a daemon thread on first use. A forked
+    worker starts its own loop, the thread of the parent does not exist in the child.
+
+    :return: The running loop.
+    :rtype: asyncio.AbstractEventLoop
+    """
+    global _loop, _loop_pid, _limiter
+    with _lock:
+        if _loop is None or _loop_pid != os.getpid():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='supervisor', daemon=True).start()
+            _loop, _loop_pid, _limiter = loop, os.getpid(), None
+        return _loop
+
+
+def run_on_loop(awaitable: Awaitable) -> Any:
+    """Runs a coroutine on the event loop of the worker and waits for its result. The
+    calling thread only waits, reading output, timeouts and reaping happen on the loop.
+
+    :param awaitable: The coroutine.
+    :type awaitable: Awaitable
+
+    :return: The result of the coroutine.
+    :rtype: Any
+    """
+    return asyncio.run_coroutine_threadsafe(awaitable, event_loop()).result()
+
+
+def iterate_on_loop(iterator: AsyncIterator) -> Iterator:
+    """Iterates an async generator on the event loop of the worker, each item is awaited
+    on the loop while the calling thread waits. Closing the returned iterator closes the
+    generator on the loop.
+
+    :param iterator: The async generator.
+    :type iterator: AsyncIterator
+
+    :return: The items of the generator.
+    :rtype: Iterator
+    """
+    try:
+        while True:
+            try:
+                item = run_on_loop(_next(iterator))
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        run_on_loop(_close(iterator))
+
+
+async def _next(iterator: AsyncIterator) -> Any:
+    return await iterator.__anext__()
+
+
+async def _close(iterator: AsyncIterator):
+    await iterator.aclose()
+
+
+@contextmanager
+def exec_slot() -> Iterator[None]:
+    """Holds one of the "EXEC_CONCURRENCY" slots of the event loop while the calling
+    thread runs a job outside of the loop, e.g. on a warm JVM of a daemon pool. Without
+    "EXEC_MODE=asyncio" jobs run without slots.
+
+    :return: Nothing, the slot is held inside the block.
+    :rtype: Iterator[None]
+    """
+    if not asyncio_enabled():
+        yield
+        return
+
+    loop = event_loop()
+    limiter = run_on_loop(_acquire_slot())
+    try:
+        yield
+    finally:
+        loop.call_soon_threadsafe(limiter.release)
+
+
+async def _acquire_slot() -> asyncio.Semaphore:
+    limiter = job_limiter()
+    await limiter.acquire()
+    return limiter
+
+
+def job_limiter() -> asyncio.Semaphore:
+    """The slots of the commands running at once, only to be used on the event loop.
+
+    :return: The semaphore with "EXEC_CONCURRENCY" slots.
+    :rtype: asyncio.Semaphore
+    """
+    global _limiter
+    # Created on the loop, the semaphore of Python 3.7 binds to the loop of the creating thread
+    if _limiter is None:
+        _limiter = asyncio.Semaphore(max(EXEC_CONCURRENCY, 1))
+    return _limiter
+
+
+async def capture_output_async(proc: subprocess.Popen,
+                               stdout: OutputBuffer,
+                               stderr: OutputBuffer,
+                               max_bytes: int = 0) -> bool:
+    """Like "capture_output", but the streams are read by the event loop whenever they
+    have data, no thread waits for them.
+
+    :param proc: The process, started with both streams piped.
+    :type proc: subprocess.Popen
+    :param stdout: The buffer of stdout.
+    :type stdout: OutputBuffer
+    :param stderr: The buffer of stderr.
+    :type stderr: OutputBuffer
+    :param max_bytes: The output cap, 0 means unlimited.
+    :type max_bytes: int
+
+    :return: True if the cap was exceeded, the caller then has to stop the process.
+    :rtype: bool
+    """
+    loop = asyncio.get_event_loop()
+    done = loop.create_future()
+    buffers = {proc.stdout.fileno(): stdout, proc.stderr.fileno(): stderr}
+    open_fds = set(buffers)
+
+    def on_readable(fd: int):
+        try:
+            chunk = os.read(fd, STREAM_CHUNK_SIZE)
+        except BlockingIOError:
+            return
+        if not chunk:
+            loop.remove_reader(fd)
+            open_fds.discard(fd)
+            if not open_fds and not done.done():
+                done.set_result(False)
+            return
+        buffers[fd].write(chunk)
+        if 0 < max_bytes < stdout.total_bytes + stderr.total_bytes and not done.done():
+            done.set_result(True)
+
+    for fd in buffers:
+        os.set_blocking(fd, False)
+        loop.add_reader(fd, on_readable, fd)
+    try:
+        return await done
+    finally:
+        for fd in open_fds:
+            loop.remove_reader(fd)
+
+
+async def read_lines_async(proc: subprocess.Popen, deadline: Optional[float] = None) -> AsyncIterator[Tuple[str, str]]:
+    """Like "read_lines", but the streams are read by the event loop. A stream is only
+    read again once its last chunk was consumed, so a slow consumer holds the process
+    back instead of filling the memory.
+
+    :param proc: The process, started with both streams piped.
+    :type proc: subprocess.Popen
+    :param deadline: A value of "time.monotonic()" after which reading stops.
+    :type deadline: Optional[float]
+
+    :raises asyncio.TimeoutError: If the streams are still open at the deadline.
+
+    :return: Tuples of stream name and line, lines keep their line break.
+    :rtype: AsyncIterator[Tuple[str, str]]
+    """
+    loop = asyncio.get_event_loop()
+    chunks = asyncio.Queue()
+    names = {proc.stdout.fileno(): 'stdout', proc.stderr.fileno(): 'stderr'}
+    open_fds = set(names)
+    pending = {'stdout': b'', 'stderr': b''}
+
+    def on_readable(fd: int):
+        loop.remove_reader(fd)
+        try:
+            chunk = os.read(fd, STREAM_CHUNK_SIZE)
+        except BlockingIOError:
+            loop.add_reader(fd, on_readable, fd)
+            return
+        if not chunk:
+            open_fds.discard(fd)
+        chunks.put_nowait((fd, chunk))
+
+    for fd in names:
+        os.set_blocking(fd, False)
+        loop.add_reader(fd, on_readable, fd)
+    try:
+        while open_fds or not chunks.empty():
+            timeout = None if deadline is None else deadline - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                raise asyncio.TimeoutError()
+            fd, chunk = await asyncio.wait_for(chunks.get(), timeout=timeout)
+            if chunk:
+                loop.add_reader(fd, on_readable, fd)
+            for line in split_lines(pending, names[fd], chunk):
+                yield line
+    finally:
+        for fd in open_fds:
+            loop.remove_reader(fd)
+
+
+async def reap(pid: int, deadline: Optional[float] = None) -> Optional[Tuple[int, Any]]:
+    """Waits for a child to exit without blocking the event loop. The streams of the
+    child are usually closed by then, so it is checked at short intervals.
+
+    :param pid: The process id of the child.
+    :type pid: int
+    :param deadline: A value of "time.monotonic()" after which waiting stops.
+    :type deadline: Optional[float]
+
+    :return: The wait status and resource usage as of "os.wait4", or None at the deadline.
+    :rtype: Optional[Tuple[int, Any]]
+    """
+    interval = REAP_INTERVAL
+    while True:
+        reaped, status, rusage = os.wait4(pid, os.WNOHANG)
+        if reaped != 0:
+            return status, rusage
+        if deadline is not None and time.monotonic() >= deadline:
+            return None
+        await asyncio.sleep(interval)
+        interval = min(interval * 2, REAP_INTERVAL_MAX)
+
+
+def reap_blocking(pid: int, deadline: Optional[float] = None) -> Optional[Tuple[int, Any]]:
+    """Like "reap", but the calling thread waits.
+
+    :param pid: The process id of the child.
+    :type pid: int
+    :param deadline: A value of "time.monotonic()" after which waiting stops.
+    :type deadline: Optional[float]
+
+    :return: The wait status and resource usage as of "os.wait4", or None at the deadline.
+    :rtype: Optional[Tuple[int, Any]]
+    """
+    interval = REAP_INTERVAL
+    while True:
+        reaped, status, rusage = os.wait4(pid, os.WNOHANG)
+        if reaped != 0:
+            return status, rusage
+        if deadline is not None and time.monotonic() >= deadline:
+            return None
+        time.sleep(interval)
+        interval = min(interval * 2, REAP_INTERVAL_MAX)
@@ -0,0 +1,99 @@
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import g, has_app_context, has_request_context, request
+
+from blueprints.serverless_testing.helpers import env_flag
+
+# GLOBALS
+# Allows ?debug=1 to reveal the command lines of a request, off by default as they hold server paths
+TIMING_DEBUG_ENABLED = env_flag('TIMING_DEBUG', False)
+
+
+def start_timing():
+    """Remembers when the current request started.
+    """
+    g.request_start = time.monotonic()
+
+
+def add_timing(name: str, seconds: float):
+    """Adds the duration of a stage to the timings of the current request. Stages that
+    run more than once, e.g. javac for tests and sources, are summed up.
+
+    :param name: The name of the stage, e.g. "compile".
+    :type name: str
+    :param seconds: The duration.
+    :type seconds: float
+    """
+    if has_app_context():
+        g.setdefault('timings', []).append((name, seconds))
+
+
+def request_timings() -> Dict[str, int]:
+    """The stages of the current request in milliseconds, in the order they finished,
+    followed by the commands and the total so far.
+
+    :return: e.g. {"upload_ms": 2, "compile_ms": 840, "javac_ms": 830, "total_ms": 1204}.
+    :rtype: Dict[str, int]
+    """
+    timings = {}
+    for name, ms in _entries():
+        timings[name + '_ms'] = timings.get(name + '_ms', 0) + int(ms)
+    return timings
+
+
+def server_timing() -> Optional[str]:
+    """Renders the timings of the current request as "Server-Timing" header. With debug
+    enabled every command carries its exit code and command line as description.
+
+    :return: The header value or None if nothing was measured.
+    :rtype: Optional[str]
+    """
+    entries = []
+    for name, ms in _entries():
+        entries.append('{0};dur={1:.1f}'.format(name, ms))
+
+    if debug_requested():
+        for i, command in enumerate(g.get('usage') or []):
+            desc = 'exit {0}: {1}'.format(command['exit_code'], ' '.join(command.get('cmd') or []))
+            entries.append('cmd{0};dur={1};desc="{2}"'.format(i, command['wall_ms'], _quote(desc)))
+
+    return ', '.join(entries) or None
+
+
+def debug_commands() -> List[Dict[str, Any]]:
+    """The commands of the current request with their command lines and usage.
+
+    :return: One dict per command in the order they finished.
+    :rtype: List[Dict[str, Any]]
+    """
+    return [dict(usage) for usage in g.get('usage') or []] if has_app_context() else []
+
+
+def debug_requested() -> bool:
+    """Checks for ?debug=1 on the current request, only answered with "TIMING_DEBUG" enabled.
+
+    :return: True if command lines should be included.
+    :rtype: bool
+    """
+    return TIMING_DEBUG_ENABLED and has_request_context() and request.args.get('debug') in ('1', 'true')
+
+
+def _entries() -> List[Tuple[str, float]]:
+    if not has_app_context():
+        return []
+
+    totals = {}
+    for name, seconds in g.get('timings') or []:
+        totals[name] = totals.get(name, 0) + seconds * 1000
+    for usage in g.get('usage') or []:
+        totals[usage['tool']] = totals.get(usage['tool'], 0) + usage['wall_ms']
+    if 'request_start' in g:
+        totals['total'] = (time.monotonic() - g.request_start) * 1000
+    return list(totals.items())
+
+
+def _quote(value: str) -> str:
+    # Headers are latin-1, quotes and backslashes are escaped inside a quoted string
+    value = value.encode('latin-1', errors='replace').decode('latin-1')
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
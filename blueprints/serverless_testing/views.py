@@ -1,13 +1,34 @@
+import json
 import os
-import tempfile
-from typing import Tuple, Union
-from flask import Blueprint, Response, request, Request, jsonify, render_template
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from flask import Blueprint, Response, current_app, g, request, Request, jsonify, render_template, url_for, \
+    make_response, stream_with_context
+from prometheus_client import CONTENT_TYPE_LATEST
 
-from .exec_types.compile import javac
+from .exec_types.compile import javac_cached
 from .exec_types.exec_types import ExecType
-from .exec_types.execute import java
-from .helpers import check_files, run_cmd, JUNIT_PATH, get_file_extension, GRADLE_PATH, \
-    extract_zip
+from .batch import BatchError, grade_batch
+from .daemons.executor_pool import run_cwd
+from .daemons.gradle_pool import child_limits, gradle_limits, gradle_slot
+from .exec_types.execute import java, java_cmd
+from .exec_types.gradle import gradle, gradle_cmd
+from .exec_types.gradle_fast import EXECUTION_PATH_FAST, EXECUTION_PATH_GRADLE, analyze_project, compile_project, \
+    run_project
+from .helpers import check_files, allowed_file_exts, JUNIT_PATH, get_file_extension, elapsed_ms
+from .ingest import UploadError, extract_zip, save_upload
+from .jobs import submit_job, load_job
+from .junit import PARALLEL_OFF, JUnitSelection, grading_class_path, parse_reports, read_parallel, read_selection
+from .limits import job_limits, stream_limited, usage_summary
+from .metrics import STAGE_UPLOAD, STAGE_EXTRACT, STAGE_COMPILE, STAGE_EXECUTE, REQUESTS, REQUEST_DURATION, \
+    IN_FLIGHT, GRADLE_EXECUTION_PATHS, current_endpoint, measure_stage, observe_stage, render_metrics
+from .scheduler import LANE_BATCH, LANE_GRADLE, LANE_INTERACTIVE, LANE_TEST, QueueFullError, Ticket, admit
+from .sessions import create_session, delete_session, describe_session, update_session, use_session
+from .suites import SuiteError, register_suite, resolve_suite, describe_suite
+from .workspaces import workspace
+from .streaming import STREAM_MODES, stream_response, trailer
+from .timings import debug_commands, debug_requested, request_timings, server_timing, start_timing
+from .warmup import WARMUP_READY, start_warmup, warmup_status, workers_status
 
 serverless_testing_bp = Blueprint('serverless_testing', __name__)
 
@@ -27,11 +48,11 @@ def index():
 
 
 @serverless_testing_bp.route('/run/java', methods=['POST'])
-def run_java_files() -> Response:
+def run_java_files() -> Union[Response, Tuple[Response, int]]:
     """Route to compile and run java files.
 
     :return: The stdout of the java program.
-    :rtype: Response
+    :rtype: Union[Response, Tuple[Response, int]]
     """
     resp = execute_java(request, exec_type=ExecType.run)
     return resp
@@ -49,16 +70,41 @@ def run_gradle() -> Union[Response, Tuple[Response, int]]:
 
 
 @serverless_testing_bp.route('/test/java', methods=['POST'])
-def test_java_files() -> Response:
+def test_java_files() -> Union[Response, Tuple[Response, int]]:
     """Route to compile and test java files.
 
     :return: The test result.
-    :rtype: Response
+    :rtype: Union[Response, Tuple[Response, int]]
     """
     resp = execute_java(request, exec_type=ExecType.test)
     return resp
 
 
+@serverless_testing_bp.route('/test/java/batch', methods=['POST'])
+def test_java_batch() -> Response:
+    """Route to test many submissions with the same java test files. The test files
+    are sent as "file", the submissions as zip "submissions" with one top level dir
+    per submission.
+
+    :return: One json line per submission while the batch runs, then a summary line.
+    :rtype: Response
+    """
+    with measure_stage(STAGE_UPLOAD):
+        files, err = check_files(request.files, allowed_ext=['java'])
+    if err is not None:
+        return Response(err, status=400)
+
+    submissions = request.files.get('submissions')
+    if submissions is None or get_file_extension(submissions.filename).lower() != 'zip':
+        return Response('File [submissions] must be a zip file!', status=400)
+
+    # The whole batch takes one slot, its submissions are graded by "BATCH_WORKERS" threads
+    ticket = admit_request(request, LANE_BATCH)
+    resp = Response(stream_with_context(batch_report(files, submissions)), mimetype='application/x-ndjson')
+    resp.call_on_close(ticket.release)
+    return resp
+
+
 @serverless_testing_bp.route('/test/gradle', methods=['POST'])
 def test_gradle() -> Union[Response, Tuple[Response, int]]:
     """Route to test a gradle program.
@@ -70,7 +116,348 @@ def test_gradle() -> Union[Response, Tuple[Response, int]]:
     return resp
 
 
-def execute_java(req: Request, exec_type: ExecType) -> Response:
+@serverless_testing_bp.route('/jobs', methods=['POST'])
+def create_job() -> Tuple[Response, int]:
+    """Route to queue a run or test job in the background. Takes the same files and
+    parameters as the synchronous routes plus "type", one of "run/java", "test/java",
+    "run/gradle" or "test/gradle".
+
+    :return: The job id and the url to poll for the result.
+    :rtype: Tuple[Response, int]
+    """
+    kind = request.args.get('type') or request.form.get('type')
+    if kind not in JOB_TYPES:
+        return jsonify(error='Parameter [type] must be one of: ' + ', '.join(JOB_TYPES)), 400
+
+    execute, exec_type = JOB_TYPES[kind]
+    job = submit_job(current_app._get_current_object(), kind, request,
+                     handler=lambda req: execute(req, exec_type=exec_type))
+    return jsonify(id=job['id'], status=job['status'],
+                   url=url_for('serverless_testing.get_job', job_id=job['id'])), 202
+
+
+@serverless_testing_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id: str) -> Union[Response, Tuple[Response, int]]:
+    """Route to poll the status and, once done, the result of a job.
+
+    :return: The job record as json.
+    :rtype: Union[Response, Tuple[Response, int]]
+    """
+    job = load_job(job_id)
+    if job is None:
+        return jsonify(error='Job [{0}] not found or expired!'.format(job_id)), 404
+    return jsonify(job)
+
+
+@serverless_testing_bp.route('/suites', methods=['POST'])
+def create_suite() -> Tuple[Response, int]:
+    """Route to register a test suite. The test files are sent as "file", optional
+    files of a reference solution the tests refer to as "reference".
+
+    :return: The id and version of the suite, or the compiler errors.
+    :rtype: Tuple[Response, int]
+    """
+    return store_suite(request, suite_id=None)
+
+
+@serverless_testing_bp.route('/suites/<suite_id>', methods=['POST'])
+def update_suite(suite_id: str) -> Tuple[Response, int]:
+    """Route to add a new version to a registered test suite.
+
+    :return: The id and version of the suite, or the compiler errors.
+    :rtype: Tuple[Response, int]
+    """
+    if describe_suite(suite_id) is None:
+        return jsonify(error='Suite [{0}] not found!'.format(suite_id)), 404
+    return store_suite(request, suite_id=suite_id)
+
+
+@serverless_testing_bp.route('/suites/<suite_id>', methods=['GET'])
+def get_suite(suite_id: str) -> Union[Response, Tuple[Response, int]]:
+    """Route to list the versions of a registered test suite.
+
+    :return: The versions of the suite as json.
+    :rtype: Union[Response, Tuple[Response, int]]
+    """
+    suite = describe_suite(suite_id)
+    if suite is None:
+        return jsonify(error='Suite [{0}] not found!'.format(suite_id)), 404
+    return jsonify(suite)
+
+
+@serverless_testing_bp.route('/metrics', methods=['GET'])
+def metrics() -> Response:
+    """Route to the Prometheus metrics of all gunicorn workers.
+
+    :return: The metrics in the Prometheus text format.
+    :rtype: Response
+    """
+    return Response(render_metrics(), status=200, mimetype=CONTENT_TYPE_LATEST)
+
+
+@serverless_testing_bp.route('/ready', methods=['GET'])
+def ready() -> Tuple[Response, int]:
+    """Route for readiness probes. The first call starts the warm-up of the worker, unless
+    it started with the worker, the route answers 503 until every live worker is warm.
+
+    :return: The progress of the warm-up of this worker and the status of every worker as json.
+    :rtype: Tuple[Response, int]
+    """
+    start_warmup()
+    status = warmup_status()
+    workers = workers_status()
+    status['workers'] = {str(pid): workers[pid] for pid in sorted(workers)}
+    ready = all(worker == WARMUP_READY for worker in workers.values())
+    return jsonify(status), 200 if ready else 503
+
+
+@serverless_testing_bp.before_app_request
+def start_request_metrics():
+    """Counts the request as in flight and remembers when it started.
+    """
+    start_timing()
+    g.metrics_endpoint = current_endpoint()
+    IN_FLIGHT.labels(g.metrics_endpoint).inc()
+
+
+@serverless_testing_bp.after_app_request
+def count_request(response: Response) -> Response:
+    """Counts the request by endpoint and status code.
+
+    :param response: The response of the request.
+    :type response: Response
+
+    :return: The unchanged response.
+    :rtype: Response
+    """
+    REQUESTS.labels(current_endpoint(), request.method, str(response.status_code)).inc()
+    return response
+
+
+@serverless_testing_bp.teardown_app_request
+def finish_request_metrics(_):
+    """Records the duration of the request. Streamed responses are torn down once the
+    stream ended, so their duration includes the streaming.
+    """
+    if 'metrics_endpoint' not in g:
+        return
+    REQUEST_DURATION.labels(g.metrics_endpoint).observe(time.monotonic() - g.request_start)
+    IN_FLIGHT.labels(g.metrics_endpoint).dec()
+
+
+@serverless_testing_bp.after_app_request
+def add_usage_headers(response: Response) -> Response:
+    """Reports the resources used by the commands of the request, summed up over
+    compile and run. Streamed responses report them in their trailer instead.
+
+    :param response: The response of the request.
+    :type response: Response
+
+    :return: The response with the usage headers.
+    :rtype: Response
+    """
+    usage = usage_summary()
+    if usage is not None:
+        response.headers['X-Usage-Wall-Ms'] = str(usage['wall_ms'])
+        response.headers['X-Usage-Cpu-Ms'] = str(usage['cpu_ms'])
+        response.headers['X-Usage-Max-Rss-Kb'] = str(usage['max_rss_kb'])
+        response.headers['X-Output-Bytes'] = str(usage['output_bytes'])
+        if usage['truncated']:
+            response.headers['X-Output-Truncated'] = '1'
+        if usage['limit'] is not None:
+            response.headers['X-Limit-Exceeded'] = usage['limit']
+    return response
+
+
+@serverless_testing_bp.after_app_request
+def add_server_timing(response: Response) -> Response:
+    """Breaks the request down into its stages and commands in a "Server-Timing" header,
+    e.g. "upload;dur=1.9, compile;dur=812.4, javac;dur=804.0, execute;dur=95.1, total;dur=911.0".
+    Streamed responses send their headers before any stage ran and report the timings
+    in their trailer instead.
+
+    :param response: The response of the request.
+    :type response: Response
+
+    :return: The response with the header.
+    :rtype: Response
+    """
+    if not response.is_streamed:
+        value = server_timing()
+        if value is not None:
+            response.headers['Server-Timing'] = value
+    return response
+
+
+@serverless_testing_bp.after_app_request
+def add_execution_path_header(response: Response) -> Response:
+    """Reports whether a gradle project ran on the fast path without gradle.
+
+    :param response: The response of the request.
+    :type response: Response
+
+    :return: The response with the "X-Execution-Path" header.
+    :rtype: Response
+    """
+    if 'execution_path' in g:
+        response.headers['X-Execution-Path'] = g.execution_path
+    return response
+
+
+@serverless_testing_bp.after_app_request
+def add_queue_wait_header(response: Response) -> Response:
+    """Reports how long the job of the request waited for a slot of the scheduler.
+
+    :param response: The response of the request.
+    :type response: Response
+
+    :return: The response with the "X-Queue-Wait-Ms" header.
+    :rtype: Response
+    """
+    if 'queue_wait_ms' in g:
+        response.headers['X-Queue-Wait-Ms'] = str(g.queue_wait_ms)
+    return response
+
+
+@serverless_testing_bp.errorhandler(QueueFullError)
+def queue_full(e: QueueFullError) -> Response:
+    """Answers jobs the scheduler could not queue with 429 and when to retry.
+
+    :param e: The error of the scheduler.
+    :type e: QueueFullError
+
+    :return: The error as json or text.
+    :rtype: Response
+    """
+    if request.args.get('return') == 'json':
+        resp = jsonify(error=str(e), **json_report())
+    else:
+        resp = Response(str(e))
+    resp.status_code = 429
+    resp.headers['Retry-After'] = str(e.retry_after)
+    return resp
+
+
+def json_report() -> Dict[str, Any]:
+    """The usage and timings of the request for json responses, with ?debug=1 also the
+    commands with their command lines and exit codes. Gradle projects report whether
+    they ran without gradle, with ?debug=1 also why they did not.
+
+    :return: The fields to add to the json response.
+    :rtype: Dict[str, Any]
+    """
+    report = {'usage': usage_summary(), 'timings': request_timings()}
+    if 'execution_path' in g:
+        report['execution_path'] = g.execution_path
+    if debug_requested():
+        report['commands'] = debug_commands()
+        if g.get('execution_path_reason'):
+            report['execution_path_reason'] = g.execution_path_reason
+    return report
+
+
+@serverless_testing_bp.route('/sessions', methods=['POST'])
+def create_editor_session() -> Tuple[Response, int]:
+    """Route to start an editor session. Submissions to the session only compile the
+    files that changed since the previous submission.
+
+    :return: The session id and the urls to run and test the files of the session.
+    :rtype: Tuple[Response, int]
+    """
+    session = create_session()
+    return jsonify(id=session['id'],
+                   run_url=url_for('serverless_testing.run_session_java', session_id=session['id']),
+                   test_url=url_for('serverless_testing.test_session_java', session_id=session['id'])), 201
+
+
+@serverless_testing_bp.route('/sessions/<session_id>', methods=['GET'])
+def get_editor_session(session_id: str) -> Union[Response, Tuple[Response, int]]:
+    """Route to the files of an editor session.
+
+    :return: The session as json.
+    :rtype: Union[Response, Tuple[Response, int]]
+    """
+    session = describe_session(session_id)
+    if session is None:
+        return jsonify(error='Session [{0}] not found or expired!'.format(session_id)), 404
+    return jsonify(session)
+
+
+@serverless_testing_bp.route('/sessions/<session_id>', methods=['DELETE'])
+def delete_editor_session(session_id: str) -> Tuple[Response, int]:
+    """Route to end an editor session, e.g. when the editor is closed.
+
+    :return: An empty response.
+    :rtype: Tuple[Response, int]
+    """
+    if not delete_session(session_id):
+        return jsonify(error='Session [{0}] not found or expired!'.format(session_id)), 404
+    return Response(status=204), 204
+
+
+@serverless_testing_bp.route('/sessions/<session_id>/run/java', methods=['POST'])
+def run_session_java(session_id: str) -> Union[Response, Tuple[Response, int]]:
+    """Route to compile the changed files of a session and run them. Takes the same
+    files and parameters as /run/java, all files of the program are sent every time.
+
+    :return: The program result.
+    :rtype: Union[Response, Tuple[Response, int]]
+    """
+    return execute_session(request, session_id, exec_type=ExecType.run)
+
+
+@serverless_testing_bp.route('/sessions/<session_id>/test/java', methods=['POST'])
+def test_session_java(session_id: str) -> Union[Response, Tuple[Response, int]]:
+    """Route to compile the changed files of a session and test them. Takes the same
+    files and parameters as /test/java.
+
+    :return: The test result.
+    :rtype: Union[Response, Tuple[Response, int]]
+    """
+    return execute_session(request, session_id, exec_type=ExecType.test)
+
+
+def store_suite(req: Request, suite_id: Optional[str]) -> Tuple[Response, int]:
+    """Compiles the uploaded tests and stores them as new suite or new version.
+
+    :param req: The request object.
+    :type req: Request
+    :param suite_id: The suite to add a version to, a new suite is created if None.
+    :type suite_id: Optional[str]
+
+    :return: The id and version of the suite, or the compiler errors.
+    :rtype: Tuple[Response, int]
+    """
+    files, err = check_files(req.files, allowed_ext=['java'])
+    if err is not None:
+        return jsonify(error=err), 400
+
+    references = req.files.getlist('reference')
+    if not allowed_file_exts(references, ['java']):
+        return jsonify(error='Only java files allowed as [reference]!'), 400
+
+    with workspace() as work_path:
+        test_paths = []
+        for f in files:
+            test_paths.append(os.path.join(work_path, f.filename))
+            save_upload(f, test_paths[-1])
+
+        reference_path = os.path.join(work_path, 'reference')
+        os.makedirs(reference_path)
+        reference_paths = []
+        for f in references:
+            reference_paths.append(os.path.join(reference_path, f.filename))
+            save_upload(f, reference_paths[-1])
+
+        try:
+            suite = register_suite(test_paths, reference_paths, suite_id=suite_id)
+        except SuiteError as e:
+            return jsonify(error=str(e)), 400
+
+    return jsonify(id=suite['id'], version=suite['version']), 201
+
+
+def execute_java(req: Request, exec_type: ExecType) -> Union[Response, Tuple[Response, int]]:
     """Compiles ands executes java files. The "exec_type" denotes if
     files should be run or tested.
 
@@ -79,16 +466,150 @@ def execute_java(req: Request, exec_type: ExecType) -> Response:
     :param exec_type: Decides if files should be run or tested.
     :type exec_type: ExecType
 
-    :return: The java program stdout or stderr and status code.
-    :rtype: Response
+    :return: The java program stdout or stderr and status code as json or text/html.
+    :rtype: Union[Response, Tuple[Response, int]]
     """
     assert exec_type == ExecType.run or exec_type == ExecType.test, '[exec_type] can only be run or test'
 
-    # Check if files are present and valid
-    files, err = check_files(req.files, allowed_ext=['java'])
+    # Check if files are present and valid, the upload is read on first access
+    with measure_stage(STAGE_UPLOAD):
+        files, err = check_files(req.files, allowed_ext=['java'])
     if err is not None:
-        return Response(err, status=400)
+        return java_response(req, 400, err=err)
+
+    main_file, args_list, err = java_params(req, exec_type)
+    if err is not None:
+        return java_response(req, 400, err=err)
+
+    selection, err = read_selection(req.args) if exec_type == ExecType.test else (None, None)
+    if err is not None:
+        return java_response(req, 400, err=err)
+
+    parallel, err = read_parallel(req.args) if exec_type == ExecType.test else (PARALLEL_OFF, None)
+    if err is not None:
+        return java_response(req, 400, err=err)
+
+    # Test against the precompiled classes of a registered suite, has form:
+    # ?suite=<id> for the latest version or ?suite=<id>@<version>
+    suite_path = None
+    if exec_type == ExecType.test and req.args.get('suite') is not None:
+        suite_path = resolve_suite(req.args.get('suite'))
+        if suite_path is None:
+            return java_response(req, 404, err='Suite [{0}] not found!'.format(req.args.get('suite')))
+
+    # Forward the output while the program runs, selected with ?stream=sse or ?stream=text
+    stream_mode = req.args.get('stream')
+    if stream_mode is not None and stream_mode not in STREAM_MODES:
+        return Response('Query parameter [stream] must be one of {0}!'.format(list(STREAM_MODES)), status=400)
+
+    # Wait for a slot of the scheduler, answers 429 if the queue is full
+    ticket = admit_request(req, LANE_INTERACTIVE if exec_type == ExecType.run else LANE_TEST)
+    if stream_mode is not None:
+        resp = stream_response(stream_java(files, exec_type, main_file, args_list, suite_path, selection, parallel),
+                               mode=stream_mode)
+        resp.call_on_close(ticket.release)
+        return resp
 
+    # Compile and run or test files
+    with ticket, workspace() as work_path:
+        with measure_stage(STAGE_UPLOAD):
+            for f in files:
+                save_upload(f, os.path.join(work_path, f.filename))
+
+        out_path = os.path.join(work_path, 'out')
+        class_path = out_path + ':' + JUNIT_PATH
+        file_paths = [os.path.join(work_path, f.filename) for f in files]
+
+        # Compile java files, identical submissions are restored from the compile cache
+        with measure_stage(STAGE_COMPILE):
+            stdout, stderr = javac_cached(file_paths=file_paths,
+                                          out_path=out_path,
+                                          class_path=class_path)
+        if stdout is not None or stderr is not None:
+            return java_response(req, 500, err=stdout or stderr)
+
+        # Only the tests of the suite are run, the submission can not replace them
+        if suite_path is not None:
+            class_path = grading_class_path(suite_path, out_path)
+
+        # Execute compiled java files
+        reports_path = java_reports_path(req, exec_type, work_path)
+        with measure_stage(STAGE_EXECUTE):
+            result, err = java(exec_type=exec_type,
+                               class_path=class_path,
+                               main_file=main_file,
+                               args=args_list,
+                               cwd=run_cwd(work_path) if exec_type == ExecType.run else work_path,
+                               scan_path=suite_path,
+                               selection=selection,
+                               reports_path=reports_path,
+                               parallel=parallel)
+        return java_response(req, 500 if err is not None else 200, msg=result, err=err, reports_path=reports_path)
+
+
+def java_reports_path(req: Request, exec_type: ExecType, work_path: str) -> Optional[str]:
+    """Decides where the JUnit launcher writes its XML reports. Reports are only
+    written for tests answered as json.
+
+    :param req: The request object.
+    :type req: Request
+    :param exec_type: Decides if files should be run or tested.
+    :type exec_type: ExecType
+    :param work_path: The workspace of the request.
+    :type work_path: str
+
+    :return: The reports dir or None if no reports are needed.
+    :rtype: Optional[str]
+    """
+    if exec_type == ExecType.test and req.args.get('return') == 'json':
+        return os.path.join(work_path, 'reports')
+    return None
+
+
+def java_response(req: Request,
+                  status: int,
+                  msg: Optional[str] = None,
+                  err: Optional[str] = None,
+                  reports_path: Optional[str] = None) -> Union[Response, Tuple[Response, int]]:
+    """Answers a java run or test as text, or as json if ?return=json query param added.
+    Json answers of tests hold the per class and per test results in "results".
+
+    :param req: The request object.
+    :type req: Request
+    :param status: The status code.
+    :type status: int
+    :param msg: The output of the program or the launcher.
+    :type msg: Optional[str]
+    :param err: The error, answered instead of "msg" as text.
+    :type err: Optional[str]
+    :param reports_path: The XML reports of the launcher.
+    :type reports_path: Optional[str]
+
+    :return: The response.
+    :rtype: Union[Response, Tuple[Response, int]]
+    """
+    if req.args.get('return') == 'json':
+        report = json_report()
+        if reports_path is not None:
+            report['results'] = parse_reports(reports_path)
+        if err is not None:
+            return jsonify(error=err, msg=msg, **report), status
+        return jsonify(msg=msg, **report), status
+    else:
+        return Response(err if err is not None else msg, status=status)
+
+
+def java_params(req: Request, exec_type: ExecType) -> Tuple[Optional[str], List[str], Optional[str]]:
+    """Reads the main class and the program arguments of a java run or test.
+
+    :param req: The request object.
+    :type req: Request
+    :param exec_type: Decides if files should be run or tested.
+    :type exec_type: ExecType
+
+    :return: The main class, the arguments and an error message if the main class is missing.
+    :rtype: Tuple[Optional[str], List[str], Optional[str]]
+    """
     # Get main_file from form parameters, needed for /run java command
     main_file = None
     if exec_type == ExecType.run:
@@ -96,43 +617,86 @@ def execute_java(req: Request, exec_type: ExecType) -> Response:
         if main_file is not None:
             main_file = main_file.rsplit('.', maxsplit=1)[0]
         else:
-            return Response('Form parameter [main_file] is missing!', status=400)
+            return None, [], 'Form parameter [main_file] is missing!'
 
-    # Compile and run or test files
-    with tempfile.TemporaryDirectory() as work_path:
-        for f in files:
-            f.save(os.path.join(work_path, f.filename))
+    # Check for the command line arguments of the program, has form:
+    # ?args1=Foo&args2=Bar
+    args_list = []
+    for key in req.args:
+        k = str(key)
+        if k.startswith('args') and k != 'json':
+            args_list.append(str(req.args[key]))
 
-        out_path = os.path.join(work_path, 'out')
-        class_path = out_path + ':' + JUNIT_PATH
-        file_paths = [os.path.join(work_path, f.filename) for f in files]
+    return main_file, args_list, None
 
-        # Compile java files
-        stdout, stderr = javac(file_paths=file_paths,
-                               out_path=out_path,
-                               class_path=class_path)
-        if stdout is not None:
-            return Response(stdout, status=500)
-        elif stderr is not None:
-            return Response(stderr, status=500)
-
-        # Check for the command line arguments of the program, has form:
-        # ?args1=Foo&args2=Bar
-        args_list = []
-        for key in request.args:
-            k = str(key)
-            if k.startswith('args') and k != 'json':
-                args_list.append(str(request.args[key]))
 
-        # Execute compiled java files
-        result, err = java(exec_type=exec_type,
-                           class_path=class_path,
-                           main_file=main_file,
-                           args=args_list)
-        if err is not None:
-            return Response(err, status=500)
+def execute_session(req: Request, session_id: str, exec_type: ExecType) -> Union[Response, Tuple[Response, int]]:
+    """Runs or tests the files of an editor session like "execute_java", but only the
+    files that changed since the last submission, and the files depending on them, are
+    compiled. The compiled files are listed in the "X-Compiled-Files" header.
 
-    return Response(result, status=200)
+    :param req: The request object.
+    :type req: Request
+    :param session_id: The id of the session.
+    :type session_id: str
+    :param exec_type: Decides if files should be run or tested.
+    :type exec_type: ExecType
+
+    :return: The java program stdout or stderr and status code as json or text/html.
+    :rtype: Union[Response, Tuple[Response, int]]
+    """
+    assert exec_type == ExecType.run or exec_type == ExecType.test, '[exec_type] can only be run or test'
+
+    with measure_stage(STAGE_UPLOAD):
+        files, err = check_files(req.files, allowed_ext=['java'])
+    if err is not None:
+        return java_response(req, 400, err=err)
+
+    main_file, args_list, err = java_params(req, exec_type)
+    if err is not None:
+        return java_response(req, 400, err=err)
+
+    selection, err = read_selection(req.args) if exec_type == ExecType.test else (None, None)
+    if err is not None:
+        return java_response(req, 400, err=err)
+
+    parallel, err = read_parallel(req.args) if exec_type == ExecType.test else (PARALLEL_OFF, None)
+    if err is not None:
+        return java_response(req, 400, err=err)
+
+    lane = LANE_INTERACTIVE if exec_type == ExecType.run else LANE_TEST
+    with admit_request(req, lane), workspace() as work_path, use_session(session_id) as classes_path:
+        if classes_path is None:
+            return java_response(req, 404, err='Session [{0}] not found or expired!'.format(session_id))
+
+        sources_path = os.path.join(work_path, 'sources')
+        os.makedirs(sources_path)
+        with measure_stage(STAGE_UPLOAD):
+            for f in files:
+                save_upload(f, os.path.join(sources_path, f.filename))
+
+        with measure_stage(STAGE_COMPILE):
+            stdout, stderr, compiled = update_session(session_id,
+                                                      [os.path.join(sources_path, f.filename) for f in files])
+        if stdout is not None or stderr is not None:
+            resp = java_response(req, 500, err=stdout or stderr)
+        else:
+            reports_path = java_reports_path(req, exec_type, work_path)
+            with measure_stage(STAGE_EXECUTE):
+                result, err = java(exec_type=exec_type,
+                                   class_path=classes_path + ':' + JUNIT_PATH,
+                                   main_file=main_file,
+                                   args=args_list,
+                                   cwd=run_cwd(work_path) if exec_type == ExecType.run else work_path,
+                                   selection=selection,
+                                   reports_path=reports_path,
+                                   parallel=parallel)
+            resp = java_response(req, 500 if err is not None else 200, msg=result, err=err,
+                                 reports_path=reports_path)
+
+    resp = make_response(resp)
+    resp.headers['X-Compiled-Files'] = ','.join(compiled)
+    return resp
 
 
 def execute_gradle(req: Request, exec_type: ExecType) -> Union[Response, Tuple[Response, int]]:
@@ -150,11 +714,12 @@ def execute_gradle(req: Request, exec_type: ExecType) -> Union[Response, Tuple[R
     assert exec_type == ExecType.run or exec_type == ExecType.test,\
         '[exec_type] can only be run or test'
 
-    # Check if files are present and valid
-    files, err = check_files(req.files, allowed_ext=['zip'])
+    # Check if files are present and valid, the upload is read on first access
+    with measure_stage(STAGE_UPLOAD):
+        files, err = check_files(req.files, allowed_ext=['zip'])
     if err is not None:
-        if request.args.get('return') == 'json':
-            return jsonify(error=err), 400
+        if req.args.get('return') == 'json':
+            return jsonify(error=err, **json_report()), 400
         else:
             return Response(response=err, status=400)
 
@@ -164,48 +729,264 @@ def execute_gradle(req: Request, exec_type: ExecType) -> Union[Response, Tuple[R
         if get_file_extension(f.filename).lower() == 'zip':
             zip_file = f
 
-    # Run or test gradle project
-    with tempfile.TemporaryDirectory() as work_path:
-        extract_zip(zip_file, dest=work_path)
-
-        # Read all files in work_path
-        dirs = [d for d in os.listdir(work_path) if os.path.isdir(os.path.join(work_path, d))]
+    # Check for the command line arguments of the program, has form:
+    # ?args1=Foo&args2=Bar
+    args_str = ''
+    for key in req.args:
+        if str(key).startswith('args') and str(key) != 'json':
+            args_str = args_str + str(req.args[key]) + ' '
+    args_str = args_str.strip()
+
+    # Forward the build output while gradle runs, selected with ?stream=sse or ?stream=text
+    stream_mode = req.args.get('stream')
+    if stream_mode is not None and stream_mode not in STREAM_MODES:
+        return Response('Query parameter [stream] must be one of {0}!'.format(list(STREAM_MODES)), status=400)
+
+    # Wait for a slot of the scheduler, answers 429 if the queue is full
+    ticket = admit_request(req, LANE_GRADLE)
+    if stream_mode is not None:
+        resp = stream_response(stream_gradle(zip_file, exec_type, args_str), mode=stream_mode)
+        resp.call_on_close(ticket.release)
+        return resp
 
-        # Filter out possible temp files from previous extraction
-        clean_dirs = [d for d in dirs if not d.startswith('_') and not d.startswith('.')]
-
-        # Only project root dir left
-        project_dir = clean_dirs[0]
-
-        # Run: cd work_path/project_root
-        os.chdir(os.path.join(work_path, project_dir))
-
-        # Check for the command line arguments of the program, has form:
-        # ?args1=Foo&args2=Bar
-        args_str = ''
-        for key in request.args:
-            if str(key).startswith('args') and str(key) != 'json':
-                args_str = args_str + str(request.args[key]) + ' '
-        args_str = args_str.strip()
-
-        run_or_test = 'run' if exec_type == ExecType.run else 'test'
-
-        # Program args only needed for running not for executing JUnit tests
-        if len(args_str) > 0 and exec_type == ExecType.run:
-            gradle_stdout, err = run_cmd([GRADLE_PATH, run_or_test, '--args=' + str(args_str), '--console=plain'])
+    # Run or test gradle project
+    with ticket, workspace() as work_path:
+        try:
+            with measure_stage(STAGE_EXTRACT):
+                extract_zip(zip_file, dest=work_path)
+        except UploadError as e:
+            if req.args.get('return') == 'json':
+                return jsonify(error=str(e), **json_report()), 400
+            else:
+                return Response(response=str(e), status=400)
+        project_path = find_project_path(work_path)
+
+        # Simple projects are compiled and run without gradle, anything else is left to gradle
+        project, g.execution_path_reason = analyze_project(project_path, exec_type)
+        g.execution_path = EXECUTION_PATH_FAST if project is not None else EXECUTION_PATH_GRADLE
+        GRADLE_EXECUTION_PATHS.labels(g.execution_path).inc()
+
+        if project is not None:
+            with measure_stage(STAGE_COMPILE):
+                stdout, stderr = compile_project(project, exec_type)
+            if stdout is not None or stderr is not None:
+                gradle_stdout, err = None, stdout or stderr
+            else:
+                with measure_stage(STAGE_EXECUTE):
+                    gradle_stdout, err = run_project(project, exec_type, args_str)
         else:
-            gradle_stdout, err = run_cmd([GRADLE_PATH, run_or_test, '--console=plain'])
+            # Run or test on a warm daemon of the gradle pool
+            with measure_stage(STAGE_EXECUTE):
+                gradle_stdout, err = gradle(exec_type=exec_type, project_path=project_path, args_str=args_str)
 
         if err is not None:
-            if request.args.get('return') == 'json':
-                return jsonify(error=err, msg=gradle_stdout), 500
+            if req.args.get('return') == 'json':
+                return jsonify(error=err, msg=gradle_stdout, **json_report()), 500
             else:
                 return Response(response=err, status=500)
 
         result = gradle_stdout
 
-    if request.args.get('return') == 'json':
+    if req.args.get('return') == 'json':
         # Returns json if ?return=json query param added, primarily for frontend
-        return jsonify(msg=result), 200
+        return jsonify(msg=result, **json_report()), 200
     else:
         return Response(result, status=200)
+
+
+def admit_request(req: Request, lane: str) -> Ticket:
+    """Waits for a slot of the scheduler for the job of the request. Clients are told
+    apart by the "X-Client-Id" header, set by the frontend, or else by their address.
+    Background jobs always take the batch lane and are never rejected, they already
+    waited in the job queue.
+
+    :param req: The request object.
+    :type req: Request
+    :param lane: The lane of the route.
+    :type lane: str
+
+    :raises QueueFullError: If the queue of the scheduler is full.
+
+    :return: The ticket, to be released when the job is done.
+    :rtype: Ticket
+    """
+    if 'job_id' in g:
+        return admit(LANE_BATCH, 'jobs', bounded=False)
+
+    client = req.headers.get('X-Client-Id') or req.headers.get('X-Forwarded-For', '').split(',')[0].strip()
+    return admit(lane, client or req.remote_addr or 'unknown')
+
+
+def find_project_path(work_path: str) -> str:
+    """Finds the root dir of the extracted gradle project.
+
+    :param work_path: The dir the project zip was extracted to.
+    :type work_path: str
+
+    :return: The path of the project root dir.
+    :rtype: str
+    """
+    # Read all files in work_path
+    dirs = [d for d in os.listdir(work_path) if os.path.isdir(os.path.join(work_path, d))]
+
+    # Filter out possible temp files from previous extraction
+    clean_dirs = [d for d in dirs if not d.startswith('_') and not d.startswith('.')]
+
+    # Only project root dir left
+    return os.path.join(work_path, clean_dirs[0])
+
+
+def stream_java(files: List, exec_type: ExecType, main_file: Optional[str], args: List[str],
+                suite_path: Optional[str] = None,
+                selection: Optional[JUnitSelection] = None,
+                parallel: str = PARALLEL_OFF) -> Iterator[Tuple[str, Any]]:
+    """Compiles and runs or tests java files like "execute_java", but yields the output
+    while it is written. Programs are forked instead of run in the executor pool, which
+    answers only after the program ended. The workspace lives as long as the stream.
+
+    :param files: The validated java files.
+    :type files: List
+    :param exec_type: Decides if files should be run or tested.
+    :type exec_type: ExecType
+    :param main_file: Name of the class with the main method, needed for running.
+    :type main_file: Optional[str]
+    :param args: The program arguments.
+    :type args: List[str]
+    :param suite_path: The test classes of a registered suite to run instead of uploaded tests.
+    :type suite_path: Optional[str]
+    :param selection: The tests to run, defaults to all found tests.
+    :type selection: Optional[JUnitSelection]
+    :param parallel: How tests run in parallel, shards are streamed as one launcher.
+    :type parallel: str
+
+    :return: The output events followed by the exit trailer.
+    :rtype: Iterator[Tuple[str, Any]]
+    """
+    start = time.monotonic()
+    timings = {}
+
+    with workspace() as work_path:
+        with measure_stage(STAGE_UPLOAD):
+            for f in files:
+                save_upload(f, os.path.join(work_path, f.filename))
+
+        out_path = os.path.join(work_path, 'out')
+        class_path = out_path + ':' + JUNIT_PATH
+        file_paths = [os.path.join(work_path, f.filename) for f in files]
+
+        with measure_stage(STAGE_COMPILE):
+            stdout, stderr = javac_cached(file_paths=file_paths,
+                                          out_path=out_path,
+                                          class_path=class_path)
+        timings['compile_ms'] = elapsed_ms(start)
+        if stdout is not None or stderr is not None:
+            for output in (stdout, stderr):
+                if output is not None:
+                    yield 'stderr', output + '\n'
+            yield trailer(1, 'compile', timings)
+            return
+
+        if suite_path is not None:
+            class_path = grading_class_path(suite_path, out_path)
+
+        stage = 'run' if exec_type == ExecType.run else 'test'
+        stage_start = time.monotonic()
+        cmd = java_cmd(exec_type, class_path, main_file, args, scan_path=suite_path, selection=selection,
+                       parallel=parallel)
+        limits = job_limits('java' if stage == 'run' else 'junit')
+        for kind, data in stream_limited(cmd, cwd=work_path, limits=limits):
+            if kind == 'exit':
+                observe_stage(STAGE_EXECUTE, time.monotonic() - stage_start)
+                timings[stage + '_ms'] = elapsed_ms(stage_start)
+                timings['total_ms'] = elapsed_ms(start)
+                yield trailer(data['exit_code'], stage, timings, usage=data)
+            else:
+                yield kind, data
+
+
+def stream_gradle(zip_file, exec_type: ExecType, args_str: str) -> Iterator[Tuple[str, Any]]:
+    """Runs or tests a gradle project like "execute_gradle", but yields the build output
+    while it is written. The workspace lives as long as the stream.
+
+    :param zip_file: The uploaded project zip.
+    :param exec_type: Decides if the project should be run or tested.
+    :type exec_type: ExecType
+    :param args_str: The program arguments, only used for running.
+    :type args_str: str
+
+    :return: The output events followed by the exit trailer.
+    :rtype: Iterator[Tuple[str, Any]]
+    """
+    start = time.monotonic()
+    timings = {}
+
+    with workspace() as work_path:
+        try:
+            with measure_stage(STAGE_EXTRACT):
+                extract_zip(zip_file, dest=work_path)
+        except UploadError as e:
+            yield 'stderr', str(e) + '\n'
+            yield trailer(1, 'extract', timings)
+            return
+        project_path = find_project_path(work_path)
+        timings['extract_ms'] = elapsed_ms(start)
+
+        stage = 'run' if exec_type == ExecType.run else 'test'
+        cmd, env = gradle_cmd(exec_type, project_path, args_str)
+        with gradle_slot(), child_limits() as child_args:
+            stage_start = time.monotonic()
+            for kind, data in stream_limited(cmd + child_args, cwd=project_path, env=env, limits=gradle_limits()):
+                if kind == 'exit':
+                    observe_stage(STAGE_EXECUTE, time.monotonic() - stage_start)
+                    timings[stage + '_ms'] = elapsed_ms(stage_start)
+                    timings['total_ms'] = elapsed_ms(start)
+                    yield trailer(data['exit_code'], stage, timings, usage=data)
+                else:
+                    yield kind, data
+
+
+def batch_report(files: List, submissions) -> Iterator[str]:
+    """Grades the submissions of a batch and reports each result as a json line.
+    The workspace lives as long as the report is streamed.
+
+    :param files: The validated test java files.
+    :type files: List
+    :param submissions: The uploaded submissions zip.
+
+    :return: The json lines of the report.
+    :rtype: Iterator[str]
+    """
+    start = time.monotonic()
+    counts = {}
+
+    with workspace() as work_path:
+        tests_path = os.path.join(work_path, 'tests')
+        submissions_path = os.path.join(work_path, 'submissions')
+        os.makedirs(tests_path)
+        os.makedirs(submissions_path)
+
+        with measure_stage(STAGE_UPLOAD):
+            for f in files:
+                save_upload(f, os.path.join(tests_path, f.filename))
+        test_paths = [os.path.join(tests_path, f.filename) for f in files]
+
+        try:
+            with measure_stage(STAGE_EXTRACT):
+                extract_zip(submissions, dest=submissions_path)
+            for result in grade_batch(test_paths, submissions_path, tests_out=os.path.join(work_path, 'tests_out')):
+                counts[result['status']] = counts.get(result['status'], 0) + 1
+                yield json.dumps(result) + '\n'
+        except (BatchError, UploadError) as e:
+            yield json.dumps({'error': str(e)}) + '\n'
+            return
+
+    yield json.dumps({'summary': counts, 'duration_ms': elapsed_ms(start)}) + '\n'
+
+
+# Job types accepted by /jobs, mapped to the handler and exec type of the synchronous route
+JOB_TYPES = {
+    'run/java': (execute_java, ExecType.run),
+    'test/java': (execute_java, ExecType.test),
+    'run/gradle': (execute_gradle, ExecType.run),
+    'test/gradle': (execute_gradle, ExecType.test),
+}
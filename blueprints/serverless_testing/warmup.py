@@ -0,0 +1,230 @@
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from blueprints.serverless_testing import canned
+from blueprints.serverless_testing.daemons.compiler_pool import COMPILER_DAEMON_ENABLED, compiler_pool
+from blueprints.serverless_testing.daemons.executor_pool import EXECUTOR_POOL_WARM, JAVA_RUN_MODE, \
+    JAVA_RUN_MODE_POOL, executor_pool, run_cwd
+from blueprints.serverless_testing.exec_types.compile import javac
+from blueprints.serverless_testing.exec_types.exec_types import ExecType
+from blueprints.serverless_testing.exec_types.execute import java
+from blueprints.serverless_testing.exec_types.gradle import gradle
+from blueprints.serverless_testing.helpers import JUNIT_PATH, env_flag
+from blueprints.serverless_testing.metrics import METRICS_DIR, WARMUP_DURATION
+from blueprints.serverless_testing.workspaces import workspace
+
+# GLOBALS
+WARMUP_ENABLED = env_flag('WARMUP', True)
+# Starts the warm-up when the gunicorn worker starts instead of on the first /ready
+WARMUP_AT_BOOT = env_flag('WARMUP_AT_BOOT', True)
+
+WARMUP_COLD = 'cold'
+WARMUP_WARMING = 'warming'
+WARMUP_READY = 'ready'
+
+# Every worker shares its status as "warmup_<pid>.json" in the metrics dir, the master
+# clears it at start. Without it, e.g. outside of gunicorn, only this process counts
+WARMUP_STATE_PATTERN = re.compile(r'^warmup_(\d+)\.json$')
+
+_lock = threading.Lock()
+_state = {'status': WARMUP_COLD, 'pid': None, 'duration_ms': None, 'steps': {}}
+
+
+def start_warmup() -> bool:
+    """Starts the warm-up of this worker in the background, unless it already started.
+
+    :return: True if the warm-up was started by this call.
+    :rtype: bool
+    """
+    with _lock:
+        # A forked worker has not warmed up its own pools
+        if _state['pid'] == os.getpid():
+            return False
+        _state.update(status=WARMUP_WARMING if WARMUP_ENABLED else WARMUP_READY, pid=os.getpid(),
+                      duration_ms=None, steps={})
+        _publish(_state['status'])
+    if WARMUP_ENABLED:
+        threading.Thread(target=run_warmup, name='warmup', daemon=True).start()
+    return True
+
+
+def register_worker():
+    """Reports a new worker as cold, so no other worker is ready for it before its own
+    warm-up started, e.g. with "WARMUP_AT_BOOT" off.
+    """
+    with _lock:
+        if _state['pid'] != os.getpid():
+            _publish(WARMUP_COLD)
+
+
+def warmup_status() -> Dict[str, Any]:
+    """The progress of the warm-up of this worker.
+
+    :return: The status, one of "cold", "warming" or "ready", the total duration once
+        ready and the duration and error of every finished step.
+    :rtype: Dict[str, Any]
+    """
+    with _lock:
+        status = dict(_state, steps=dict(_state['steps']))
+    del status['pid']
+    return status
+
+
+def workers_status() -> Dict[int, str]:
+    """The warm-up status of every live worker, as they shared it. Files of workers that
+    exited are removed.
+
+    :return: The status of each worker by pid, this worker included.
+    :rtype: Dict[int, str]
+    """
+    statuses = {}
+    try:
+        names = os.listdir(METRICS_DIR) if METRICS_DIR else []
+    except OSError:
+        names = []
+    for name in names:
+        match = WARMUP_STATE_PATTERN.match(name)
+        if match is None:
+            continue
+        pid, path = int(match.group(1)), os.path.join(METRICS_DIR, name)
+        if not _alive(pid):
+            _remove(path)
+            continue
+        try:
+            with open(path) as f:
+                statuses[pid] = json.load(f)['status']
+        except (OSError, ValueError, KeyError):
+            continue
+
+    statuses[os.getpid()] = warmup_status()['status']
+    return statuses
+
+
+def run_warmup():
+    """Runs every tool once on the canned programs, so the first requests find the JVMs
+    started, their classes in the page cache and the gradle distribution unpacked. A
+    step that fails, e.g. because gradle is not installed, is reported but does not keep
+    the worker from getting ready.
+    """
+    start = time.monotonic()
+    with workspace() as work_path:
+        for name, step in (('pools', _prime_pools),
+                           ('javac', _compile),
+                           ('java', _run),
+                           ('junit', _test),
+                           ('gradle', _build)):
+            _run_step(name, step, work_path)
+
+    seconds = time.monotonic() - start
+    WARMUP_DURATION.labels('total').observe(seconds)
+    with _lock:
+        _state.update(status=WARMUP_READY, duration_ms=int(seconds * 1000))
+        _publish(WARMUP_READY)
+
+
+def _run_step(name: str, step: Callable[[str], Optional[str]], work_path: str):
+    start = time.monotonic()
+    try:
+        error = step(work_path)
+    except Exception as e:
+        error = str(e) or type(e).__name__
+    seconds = time.monotonic() - start
+
+    WARMUP_DURATION.labels(name).observe(seconds)
+    with _lock:
+        _state['steps'][name] = {'duration_ms': int(seconds * 1000), 'error': error}
+
+
+def _publish(status: str):
+    """Shares the status of this worker with the others, call it with "_lock" held.
+    """
+    if not METRICS_DIR:
+        return
+    path = os.path.join(METRICS_DIR, 'warmup_{0}.json'.format(os.getpid()))
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump({'status': status}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        _remove(tmp_path)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _prime_pools(_: str) -> Optional[str]:
+    if COMPILER_DAEMON_ENABLED:
+        compiler_pool.prestart()
+    if JAVA_RUN_MODE == JAVA_RUN_MODE_POOL and EXECUTOR_POOL_WARM > 0:
+        executor_pool.prestart(EXECUTOR_POOL_WARM)
+    return None
+
+
+def _compile(work_path: str) -> Optional[str]:
+    # Compiles without the compile cache, a cache hit would leave javac cold
+    source = _write(work_path, canned.HELLO_FILENAME, canned.HELLO_SOURCE)
+    stdout, stderr = javac(file_paths=[source], out_path=os.path.join(work_path, 'out'), class_path=JUNIT_PATH)
+    return stdout or stderr
+
+
+def _run(work_path: str) -> Optional[str]:
+    stdout, stderr = java(exec_type=ExecType.run,
+                          class_path=os.path.join(work_path, 'out'),
+                          main_file=canned.HELLO_MAIN,
+                          args=[],
+                          cwd=run_cwd(work_path))
+    return stderr
+
+
+def _test(work_path: str) -> Optional[str]:
+    test_out = os.path.join(work_path, 'test_out')
+    source = _write(work_path, canned.TEST_FILENAME, canned.TEST_SOURCE)
+    stdout, stderr = javac(file_paths=[source], out_path=test_out, class_path=JUNIT_PATH)
+    if stdout is not None or stderr is not None:
+        return stdout or stderr
+
+    stdout, stderr = java(exec_type=ExecType.test,
+                          class_path=test_out + ':' + JUNIT_PATH,
+                          main_file=None,
+                          args=[],
+                          cwd=work_path,
+                          scan_path=test_out)
+    return stderr
+
+
+def _build(work_path: str) -> Optional[str]:
+    # Runs on gradle even if the project qualifies for the fast path, to start the daemons
+    project_path = os.path.join(work_path, 'canned')
+    _write(project_path, 'settings.gradle', canned.GRADLE_SETTINGS_SOURCE)
+    _write(project_path, 'build.gradle', canned.GRADLE_BUILD_SOURCE)
+    _write(os.path.join(project_path, 'src', 'main', 'java'), canned.HELLO_FILENAME, canned.HELLO_SOURCE)
+
+    _, stderr = gradle(exec_type=ExecType.run, project_path=project_path, args_str='')
+    return stderr
+
+
+def _write(dest: str, filename: str, source: str) -> str:
+    os.makedirs(dest, exist_ok=True)
+    path = os.path.join(dest, filename)
+    with open(path, 'w') as f:
+        f.write(source)
+    return path
@@ -0,0 +1,231 @@
+import atexit
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from blueprints.serverless_testing.helpers import env_flag, env_int
+from blueprints.serverless_testing.metrics import STAGE_CLEANUP, observe_stage
+
+# GLOBALS
+WORKSPACE_RAM = env_flag('WORKSPACE_RAM', True)
+WORKSPACE_RAM_ROOT = os.environ.get('WORKSPACE_RAM_ROOT', '/dev/shm/quellcoda')
+WORKSPACE_DISK_ROOT = os.environ.get('WORKSPACE_DISK_ROOT', os.path.join(tempfile.gettempdir(), 'workspaces'))
+WORKSPACE_POOL_SIZE = env_int('WORKSPACE_POOL_SIZE', 8)
+WORKSPACE_MEMORY_MB = env_int('WORKSPACE_MEMORY_MB', 512)
+WORKSPACE_RESERVE_MB = env_int('WORKSPACE_RESERVE_MB', 64)
+
+
+class WorkspacePool:
+    """Hands out empty job directories. Directories live on a RAM backed file system
+    (tmpfs) as long as the memory budget allows and on disk otherwise. Used directories
+    are wiped by a background thread and RAM directories are reused afterwards, so
+    neither creating nor deleting a workspace adds latency to a request.
+
+    Every RAM workspace that is in use or waits for its wipe reserves "reserve_bytes"
+    of "budget_bytes", a workspace is also put on disk if the file system itself runs
+    short of free space.
+    """
+
+    def __init__(self,
+                 ram_root: Optional[str],
+                 disk_root: str,
+                 size: int,
+                 budget_bytes: int,
+                 reserve_bytes: int):
+        self.ram_root = ram_root
+        self.disk_root = disk_root
+        self.size = size
+        self.budget_bytes = budget_bytes
+        self.reserve_bytes = reserve_bytes
+        self._free = []
+        self._reserved = 0
+        self._created = 0
+        self._lock = threading.Lock()
+        self._dirty = queue.Queue()
+        self._started = False
+
+    @contextmanager
+    def acquire(self) -> Iterator[str]:
+        """Checks out an empty workspace for one job. The workspace is wiped in the
+        background once the block is left.
+
+        :return: The path of the workspace.
+        :rtype: Iterator[str]
+        """
+        path, in_ram = self._checkout()
+        try:
+            yield path
+        finally:
+            self._dirty.put((path, in_ram))
+
+    def prestart(self):
+        """Creates the RAM workspaces ahead of time.
+        """
+        while True:
+            with self._lock:
+                if self.ram_root is None or self._created >= self.size:
+                    return
+                self._created += 1
+            path = self._create_ram_dir()
+            with self._lock:
+                if path is None:
+                    self._created -= 1
+                    return
+                self._free.append(path)
+
+    def shutdown(self):
+        """Removes all workspaces of this process, e.g. when the worker exits.
+        """
+        for root in (self.ram_root, self.disk_root):
+            if root is not None:
+                shutil.rmtree(os.path.join(root, str(os.getpid())), ignore_errors=True)
+
+    def _start(self):
+        """Checks the RAM root, removes workspaces of dead workers and starts the
+        cleaner, which creates the RAM workspaces before it waits for dirty ones.
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        if self.ram_root is not None:
+            try:
+                os.makedirs(self.ram_root, exist_ok=True)
+            except OSError:
+                pass
+            if not os.access(self.ram_root, os.W_OK):
+                self.ram_root = None
+
+        remove_stale_roots([root for root in (self.ram_root, self.disk_root) if root is not None])
+        threading.Thread(target=self._clean_loop, name='workspace-cleaner', daemon=True).start()
+
+    def _checkout(self):
+        self._start()
+
+        with self._lock:
+            use_ram = self.ram_root is not None and self._reserved + self.reserve_bytes <= self.budget_bytes \
+                and self._has_free_space()
+            if use_ram:
+                self._reserved += self.reserve_bytes
+                if self._free:
+                    return self._free.pop(), True
+                self._created += 1
+
+        if use_ram:
+            path = self._create_ram_dir()
+            if path is not None:
+                return path, True
+            with self._lock:
+                self._reserved -= self.reserve_bytes
+                self._created -= 1
+
+        disk_root = os.path.join(self.disk_root, str(os.getpid()))
+        os.makedirs(disk_root, exist_ok=True)
+        return tempfile.mkdtemp(dir=disk_root), False
+
+    def _checkin(self, path: str, in_ram: bool):
+        if not in_ram:
+            shutil.rmtree(path, ignore_errors=True)
+            return
+
+        recycled = _wipe(path)
+        with self._lock:
+            self._reserved -= self.reserve_bytes
+            if recycled and len(self._free) < self.size:
+                self._free.append(path)
+                return
+            self._created -= 1
+        shutil.rmtree(path, ignore_errors=True)
+
+    def _clean_loop(self):
+        self.prestart()
+        while True:
+            path, in_ram = self._dirty.get()
+            start = time.monotonic()
+            try:
+                self._checkin(path, in_ram)
+            except OSError:
+                pass
+            finally:
+                observe_stage(STAGE_CLEANUP, time.monotonic() - start)
+                self._dirty.task_done()
+
+    def _has_free_space(self) -> bool:
+        try:
+            stat = os.statvfs(self.ram_root)
+        except OSError:
+            return True
+        return stat.f_bavail * stat.f_frsize >= 2 * self.reserve_bytes
+
+    def _create_ram_dir(self) -> Optional[str]:
+        ram_root = os.path.join(self.ram_root, str(os.getpid()))
+        try:
+            os.makedirs(ram_root, exist_ok=True)
+            return tempfile.mkdtemp(dir=ram_root)
+        except OSError:
+            return None
+
+
+def _wipe(path: str) -> bool:
+    """Removes the content of a workspace but keeps the directory itself.
+
+    :return: True if the workspace is empty afterwards.
+    :rtype: bool
+    """
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return False
+
+    for name in names:
+        entry = os.path.join(path, name)
+        if os.path.isdir(entry) and not os.path.islink(entry):
+            shutil.rmtree(entry, ignore_errors=True)
+        else:
+            try:
+                os.remove(entry)
+            except OSError:
+                pass
+    return not os.listdir(path)
+
+
+def remove_stale_roots(roots: List[str]):
+    """Removes the workspaces of gunicorn workers that no longer run.
+
+    :param roots: The roots holding one directory per worker pid.
+    :type roots: List[str]
+    """
+    for root in roots:
+        try:
+            pids = [name for name in os.listdir(root) if name.isdigit()]
+        except OSError:
+            continue
+        for pid in pids:
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                shutil.rmtree(os.path.join(root, pid), ignore_errors=True)
+            except PermissionError:
+                pass
+
+
+workspace_pool = WorkspacePool(ram_root=WORKSPACE_RAM_ROOT if WORKSPACE_RAM else None,
+                               disk_root=WORKSPACE_DISK_ROOT,
+                               size=WORKSPACE_POOL_SIZE,
+                               budget_bytes=WORKSPACE_MEMORY_MB * 1024 * 1024,
+                               reserve_bytes=WORKSPACE_RESERVE_MB * 1024 * 1024)
+atexit.register(workspace_pool.shutdown)
+
+
+def workspace():
+    """Checks out an empty job directory from the workspace pool, see :class:WorkspacePool.
+
+    :return: A context manager yielding the path of the workspace.
+    """
+    return workspace_pool.acquire()
@@ -0,0 +1,35 @@
+import os
+import shutil
+import tempfile
+
+# Every worker writes its metric samples to this dir and /metrics sums them up. It has
+# to be set before a worker imports prometheus_client, so it is set here in the master
+os.environ.setdefault('prometheus_multiproc_dir', os.path.join(tempfile.gettempdir(), 'metrics'))
+
+
+def on_starting(server):
+    """Removes the samples of a previous run before the workers start.
+    """
+    path = os.environ['prometheus_multiproc_dir']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+
+def post_worker_init(worker):
+    """Bounds the scheduler queue by the threads of a new worker and warms up its tools
+    and pools, unless "WARMUP_AT_BOOT" is off.
+    """
+    from blueprints.serverless_testing.scheduler import configure_threads
+    configure_threads(worker.cfg.threads)
+
+    from blueprints.serverless_testing.warmup import WARMUP_AT_BOOT, register_worker, start_warmup
+    register_worker()
+    if WARMUP_AT_BOOT:
+        start_warmup()
+
+
+def child_exit(server, worker):
+    """Drops the live gauges, e.g. in flight requests, of a worker that exited.
+    """
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
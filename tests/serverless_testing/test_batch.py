@@ -0,0 +1,73 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+import zipfile
+
+from flask import Flask
+from werkzeug.datastructures import FileStorage, MultiDict
+from blueprints.serverless_testing import batch
+from blueprints.serverless_testing.views import serverless_testing_bp
+from tests.serverless_testing.utils import CALC_PATH, CALC_FILENAME, CALC_TEST_PATH, CALC_TEST_FILENAME, \
+    CONTENT_TYPE_FORM_DATA, CONTENT_TYPE_PLAIN, CONTENT_TYPE_ZIP
+
+
+class TestBatch(unittest.TestCase):
+    """Tests grading many submissions with one test suite.
+    """
+    def setUp(self):
+        """Setup "app" with the blueprint.
+        """
+        self.app = Flask(__name__)
+        self.app.register_blueprint(serverless_testing_bp)
+        self.client = self.app.test_client()
+
+    def test_parse_junit_summary(self):
+        """Tests reading the test counts of the JUnit console launcher.
+        """
+        output = '[         2 containers found      ]\n[         5 tests found           ]\n' \
+                 '[         4 tests successful      ]\n[         1 tests failed          ]\n'
+
+        self.assertEqual(batch.parse_junit_summary(output), {'found': 5, 'successful': 4, 'failed': 1})
+
+    def test_find_submissions(self):
+        """Tests if every top level dir is a submission and extraction leftovers are skipped.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            for d in ('bob', 'alice', '__MACOSX', '.git'):
+                os.makedirs(os.path.join(tmp, d))
+            open(os.path.join(tmp, 'notes.txt'), 'w').close()
+
+            self.assertEqual(batch.find_submissions(tmp), ['alice', 'bob'])
+
+    def test_batch_endpoint(self):
+        """Tests the endpoint /test/java/batch with a passing and a broken submission.
+        """
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as z:
+            z.write(CALC_PATH, 'alice/' + CALC_FILENAME)
+            z.writestr('bob/' + CALC_FILENAME, 'public class Calculator {')
+        archive.seek(0)
+
+        with open(CALC_TEST_PATH, 'rb') as f:
+            data = MultiDict([('file', FileStorage(stream=f, filename=CALC_TEST_FILENAME,
+                                                   content_type=CONTENT_TYPE_PLAIN)),
+                              ('submissions', FileStorage(stream=archive, filename='submissions.zip',
+                                                          content_type=CONTENT_TYPE_ZIP))])
+            resp = self.client.post('/test/java/batch', data=data, content_type=CONTENT_TYPE_FORM_DATA)
+            lines = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+
+        results = {line['submission']: line for line in lines if 'submission' in line}
+        self.assertEqual(results['alice']['status'], 'passed')
+        self.assertEqual(results['alice']['tests']['successful'], 5)
+        self.assertEqual(results['bob']['status'], 'compile_error')
+        self.assertEqual(lines[-1]['summary'], {'passed': 1, 'compile_error': 1})
+
+    def test_missing_submissions(self):
+        """Tests if a batch without submissions zip is rejected.
+        """
+        data = {'file': (io.BytesIO(b'class ATest {}'), 'ATest.java')}
+        resp = self.client.post('/test/java/batch', data=data, content_type=CONTENT_TYPE_FORM_DATA)
+
+        self.assertEqual(resp.status_code, 400)
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+from blueprints.serverless_testing import cds
+
+
+class TestCds(unittest.TestCase):
+    """Tests validation and usage of the class data sharing archives.
+    """
+    def setUp(self):
+        """Point the archives to a fresh directory.
+        """
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cds_dir = cds.CDS_DIR
+        cds.CDS_DIR = self.tmp.name
+        cds._validated.clear()
+
+    def tearDown(self):
+        """Restore the archive directory.
+        """
+        cds.CDS_DIR = self.cds_dir
+        cds._validated.clear()
+        self.tmp.cleanup()
+
+    def write_archive(self, tool: str, fingerprint: str):
+        with open(cds.archive_path(tool), 'wb') as f:
+            f.write(b'archive')
+        with open(cds.archive_path(tool) + '.fingerprint', 'w') as f:
+            f.write(fingerprint)
+
+    def test_valid_archive_is_used(self):
+        """Tests if a matching archive is mapped by the JVM options.
+        """
+        self.write_archive('java', cds.fingerprint('java'))
+
+        flags = cds.jvm_flags('java')
+
+        self.assertIn('-XX:SharedArchiveFile=' + cds.archive_path('java'), flags)
+        self.assertIn('-Xshare:auto', flags)
+
+    def test_outdated_archive_is_ignored(self):
+        """Tests if an archive built for another JDK or jar is not used.
+        """
+        self.write_archive('junit', 'built for another jdk')
+
+        self.assertFalse(cds.archive_valid('junit'))
+        self.assertEqual(cds.jvm_flags('junit'), [])
+
+    def test_missing_archive_is_ignored(self):
+        """Tests if tools run without options while no archive exists.
+        """
+        self.assertFalse(os.path.exists(cds.archive_path('javac')))
+        self.assertEqual(cds.jvm_flags('javac'), [])
+
+    def test_build_archives(self):
+        """Tests if archives can be built for all tools of the image.
+        """
+        results = cds.ensure_archives()
+
+        for tool in cds.CDS_TOOLS:
+            self.assertTrue(results[tool])
+            self.assertTrue(cds.archive_valid(tool))
@@ -0,0 +1,68 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from blueprints.serverless_testing.classfile import ClassFileError, read_class_info
+
+
+def utf8(value: str) -> bytes:
+    data = value.encode()
+    return struct.pack('>BH', 1, len(data)) + data
+
+
+class TestClassFile(unittest.TestCase):
+    """Tests reading names and references of class files.
+    """
+    def setUp(self):
+        """Setup a dir for the class files.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Removes the class files.
+        """
+        self.tmp_dir.cleanup()
+
+    def write(self, data: bytes) -> str:
+        path = os.path.join(self.tmp_dir.name, 'Main.class')
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_read_class_info(self):
+        """Tests if the name, the source file and references of class entries, array
+        classes and descriptors are read, past long constants and member attributes.
+        """
+        pool = [utf8('pkg/Main'),                      # 1
+                struct.pack('>BH', 7, 1),               # 2
+                utf8('java/lang/Object'),               # 3
+                struct.pack('>BH', 7, 3),               # 4
+                struct.pack('>Bq', 5, 42),              # 5 and 6
+                utf8('[Lpkg/Helper;'),                  # 7
+                struct.pack('>BH', 7, 7),               # 8
+                utf8('(Lpkg/Shape;)V'),                 # 9
+                utf8('SourceFile'),                     # 10
+                utf8('Main.java'),                      # 11
+                utf8('ConstantValue')]                  # 12
+        data = struct.pack('>IHHH', 0xCAFEBABE, 0, 52, 13) + b''.join(pool)
+        data += struct.pack('>HHHH', 0x21, 2, 4, 0)
+        # One field with a constant value attribute, no methods
+        data += struct.pack('>HHHHH', 1, 0x19, 9, 9, 1) + struct.pack('>HIH', 12, 2, 5)
+        data += struct.pack('>H', 0)
+        data += struct.pack('>H', 1) + struct.pack('>HIH', 10, 2, 11)
+
+        info = read_class_info(self.write(data))
+
+        self.assertEqual(info.name, 'pkg/Main')
+        self.assertEqual(info.source_file, 'Main.java')
+        self.assertEqual(info.references, {'java/lang/Object', 'pkg/Helper', 'pkg/Shape'})
+
+    def test_invalid_class_file(self):
+        """Tests if truncated files and files without the magic number raise ClassFileError.
+        """
+        with self.assertRaises(ClassFileError):
+            read_class_info(self.write(b'\xca\xfe\xba\xbe\x00'))
+        with self.assertRaises(ClassFileError):
+            read_class_info(self.write(b'public class Main {}'))
+
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from blueprints.serverless_testing import compile_cache
+from blueprints.serverless_testing.exec_types import compile
+
+
+def write_file(path: str, content: str):
+    """Writes "content" to "path" and creates missing directories.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+class TestCompileCache(unittest.TestCase):
+    """Tests the content addressed compile cache.
+    """
+    def setUp(self):
+        """Point the cache to a fresh directory and create two job workspaces.
+        """
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = compile_cache.COMPILE_CACHE_DIR
+        compile_cache.COMPILE_CACHE_DIR = os.path.join(self.tmp.name, 'cache')
+
+        self.job_a = os.path.join(self.tmp.name, 'job_a')
+        self.job_b = os.path.join(self.tmp.name, 'job_b')
+        for job in (self.job_a, self.job_b):
+            write_file(os.path.join(job, 'Main.java'), 'public class Main {}')
+
+    def tearDown(self):
+        """Restore the cache directory and remove all files.
+        """
+        compile_cache.COMPILE_CACHE_DIR = self.cache_dir
+        self.tmp.cleanup()
+
+    def key(self, job: str) -> str:
+        out_path = os.path.join(job, 'out')
+        return compile_cache.cache_key([os.path.join(job, 'Main.java')], out_path, out_path)
+
+    def test_key_ignores_workspace(self):
+        """Tests if identical sources in different workspaces share a key.
+        """
+        self.assertEqual(self.key(self.job_a), self.key(self.job_b))
+
+    def test_key_changes_with_source(self):
+        """Tests if a changed source file changes the key.
+        """
+        write_file(os.path.join(self.job_b, 'Main.java'), 'public class Main { int x; }')
+        self.assertNotEqual(self.key(self.job_a), self.key(self.job_b))
+
+    def test_store_and_lookup(self):
+        """Tests if stored class files and diagnostics are restored into another workspace.
+        """
+        key = self.key(self.job_a)
+        write_file(os.path.join(self.job_a, 'out', 'Main.class'), 'bytecode')
+        compile_cache.store(key, os.path.join(self.job_a, 'out'), self.job_a,
+                            None, self.job_a + '/Main.java:1: warning')
+
+        out_b = os.path.join(self.job_b, 'out')
+        stdout, stderr = compile_cache.lookup(key, out_b, self.job_b)
+
+        self.assertIsNone(stdout)
+        self.assertEqual(stderr, self.job_b + '/Main.java:1: warning')
+        self.assertTrue(os.path.exists(os.path.join(out_b, 'Main.class')))
+
+    def test_lookup_miss(self):
+        """Tests if an unknown key is a cache miss.
+        """
+        self.assertIsNone(compile_cache.lookup('unknown', os.path.join(self.job_b, 'out'), self.job_b))
+
+    def test_evict_least_recently_used(self):
+        """Tests if eviction removes the oldest entries first.
+        """
+        for i, key in enumerate(['old', 'new']):
+            out_path = os.path.join(self.tmp.name, key)
+            write_file(os.path.join(out_path, 'Main.class'), 'x' * 100)
+            compile_cache.store(key, out_path, self.tmp.name, None, None)
+            entry = os.path.join(compile_cache.COMPILE_CACHE_DIR, 'entries', key)
+            os.utime(entry, (1000 + i, 1000 + i))
+
+        compile_cache.evict(150)
+
+        entries = os.listdir(os.path.join(compile_cache.COMPILE_CACHE_DIR, 'entries'))
+        self.assertEqual(entries, ['new'])
+
+    def test_evict_throttled(self):
+        """Tests if stores evict at most once per interval while little was stored.
+        """
+        out_path = os.path.join(self.tmp.name, 'out')
+        write_file(os.path.join(out_path, 'Main.class'), 'bytecode')
+        with mock.patch.object(compile_cache, 'evict') as evict, \
+                mock.patch.object(compile_cache, '_evict_state', {'last': None, 'stored_bytes': 0}):
+            for key in ('a', 'b', 'c'):
+                compile_cache.store(key, out_path, self.tmp.name, None, None)
+
+        self.assertEqual(evict.call_count, 1)
+
+    def test_stopped_compilation_not_stored(self):
+        """Tests if a javac run stopped by a limit or crashed is not cached, compile errors are.
+        """
+        out_path = os.path.join(self.job_a, 'out')
+        for usage, cached in (({'exit_code': -9, 'limit': 'wall'}, False),
+                              ({'exit_code': 3, 'limit': None}, False),
+                              ({'exit_code': 1, 'limit': None}, True)):
+            result = (None, 'error', usage)
+            with mock.patch.object(compile, '_javac', return_value=result):
+                compile.javac_cached([os.path.join(self.job_a, 'Main.java')], out_path, out_path)
+
+            self.assertEqual(compile_cache.lookup(self.key(self.job_a), out_path, self.job_a) is not None, cached)
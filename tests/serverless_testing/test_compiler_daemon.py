@@ -0,0 +1,108 @@
+import os
+import shutil
+import unittest
+from contextlib import contextmanager
+from unittest import mock
+from flask import Flask
+
+from blueprints.serverless_testing.daemons import compiler_pool as compiler_pool_module
+from blueprints.serverless_testing.daemons.compiler_pool import compile_in_daemon, compiler_pool
+from blueprints.serverless_testing.daemons.jvm import DaemonPool, DaemonTimeout
+from blueprints.serverless_testing.exec_types import compile
+from blueprints.serverless_testing.limits import LIMIT_WALL
+from blueprints.serverless_testing.helpers import JUNIT_PATH
+from tests.serverless_testing.utils import ROOT_TEST_DIR, CALC_FILENAME, CALC_TEST_FILENAME, MAIN_FILENAME
+
+
+class TestCompilerDaemon(unittest.TestCase):
+    """Tests if the warm compiler daemons compile like the javac command.
+    """
+    def setUp(self):
+        """Setup "app_context" and "client", so we can get
+        flask request object.
+        """
+        self.app = Flask(__name__)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+
+        self.out_path = os.path.join(ROOT_TEST_DIR, 'multiple_java_files', 'out')
+        self.class_path = self.out_path + ':' + JUNIT_PATH
+
+    def tearDown(self):
+        """Cleanup "app_context".
+        """
+        # Remove out/ dir containing already compiled files
+        shutil.rmtree(self.out_path, ignore_errors=True)
+        self.app_context.pop()
+
+    def test_daemon_compile_success(self):
+        """Tests a successful compilation inside a daemon.
+        """
+        file_paths = [
+            os.path.join(ROOT_TEST_DIR, 'multiple_java_files', MAIN_FILENAME),
+            os.path.join(ROOT_TEST_DIR, 'multiple_java_files', CALC_FILENAME)
+        ]
+
+        result = compile_in_daemon(['-d', self.out_path, '-cp', self.class_path] + file_paths)
+
+        self.assertEqual(result[:2], (None, None))
+        self.assertEqual(result[2]['exit_code'], 0)
+        self.assertTrue(os.path.exists(os.path.join(self.out_path, 'Calculator.class')))
+
+    def test_daemon_compile_failure(self):
+        """Tests if compiler errors of a daemon are returned as stderr.
+        """
+        file_paths = [os.path.join(ROOT_TEST_DIR, 'multiple_java_files', CALC_TEST_FILENAME)]
+
+        result = compile_in_daemon(['-d', self.out_path, '-cp', self.class_path] + file_paths)
+
+        self.assertIsNotNone(result)
+        self.assertIsNotNone(result[1])
+        self.assertEqual(result[2]['exit_code'], 1)
+
+    def test_daemon_health_check(self):
+        """Tests if a daemon answers the health check.
+        """
+        with compiler_pool.acquire() as daemon:
+            self.assertIsNotNone(daemon)
+            self.assertTrue(daemon.ping(timeout=5))
+
+    def test_daemon_recycled_after_max_jobs(self):
+        """Tests if a daemon gets recycled after "max_jobs" requests.
+        """
+        pool = DaemonPool(main_class='CompilerDaemon', size=1, max_jobs=1, jvm_args=[])
+        with pool.acquire() as daemon:
+            first = daemon
+            daemon.ping(timeout=5)
+        with pool.acquire() as daemon:
+            self.assertIsNot(daemon, first)
+        self.assertFalse(first.alive())
+        pool.shutdown()
+
+    def test_exhausted_pool_falls_back(self):
+        """Tests if an exhausted pool yields no daemon.
+        """
+        pool = DaemonPool(main_class='CompilerDaemon', size=0, max_jobs=1, jvm_args=[])
+        with pool.acquire() as daemon:
+            self.assertIsNone(daemon)
+
+    def test_timeout_not_compiled_again(self):
+        """Tests if a compilation that timed out in a daemon is reported as such instead of spawning javac.
+        """
+        @contextmanager
+        def acquire():
+            daemon = mock.Mock()
+            daemon.request.side_effect = DaemonTimeout('Daemon timed out')
+            yield daemon
+
+        with mock.patch.object(compiler_pool_module, 'COMPILER_DAEMON_ENABLED', True), \
+                mock.patch.object(compiler_pool, 'acquire', acquire), \
+                mock.patch.object(compile, 'run_limited') as spawn:
+            stdout, stderr, usage = compile._javac(['Main.java'], self.out_path, self.class_path)
+
+        spawn.assert_not_called()
+        self.assertIsNone(stdout)
+        self.assertIn('Time limit of {0} seconds exceeded'.format(compiler_pool_module.COMPILER_DAEMON_TIMEOUT),
+                      stderr)
+        self.assertEqual(usage['limit'], LIMIT_WALL)
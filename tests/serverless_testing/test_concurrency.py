@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+
+from flask import Flask, request
+from werkzeug.datastructures import FileStorage, MultiDict
+from blueprints.serverless_testing import views
+from blueprints.serverless_testing.exec_types.exec_types import ExecType
+from blueprints.serverless_testing.helpers import run_cmd
+from tests.serverless_testing.utils import CONTENT_TYPE_FORM_DATA, CONTENT_TYPE_PLAIN, CONTENT_TYPE_ZIP, \
+    HELLO_NAME_PATH, HELLO_NAME_FILENAME, CALC_PATH, CALC_FILENAME, CALC_TEST_PATH, CALC_TEST_FILENAME, \
+    GRADLE_PROJECT_PATH, GRADLE_PROJECT_FILENAME, GRADLE_WITH_ARGS_PATH, GRADLE_WITH_ARGS_FILENAME
+
+# Number of jobs fired at once, mixed across all four endpoints
+STRESS_JOBS = 32
+
+
+class TestConcurrency(unittest.TestCase):
+    """Fires many mixed java and gradle jobs in parallel and checks that every job
+    sees only its own workspace and returns its own result.
+    """
+    def setUp(self):
+        """Setup "app" shared by all threads, each job pushes its own request context.
+        """
+        self.app = Flask(__name__)
+
+    def run_java_job(self, i: int) -> Tuple[int, str, str]:
+        name = 'Job{0}'.format(i)
+        with open(HELLO_NAME_PATH, 'rb') as f:
+            data = MultiDict([('main_file', HELLO_NAME_FILENAME),
+                              ('file', FileStorage(stream=f, filename=HELLO_NAME_FILENAME,
+                                                   content_type=CONTENT_TYPE_PLAIN))])
+            with self.app.test_request_context('/run/java?args1=' + name, data=data, method='POST',
+                                               content_type=CONTENT_TYPE_FORM_DATA):
+                resp = views.execute_java(request, exec_type=ExecType.run)
+        return resp.status_code, resp.get_data(as_text=True), 'Hello, ' + name
+
+    def junit_job(self, i: int) -> Tuple[int, str, str]:
+        with open(CALC_PATH, 'rb') as calc, open(CALC_TEST_PATH, 'rb') as calc_test:
+            data = MultiDict([('file', FileStorage(stream=calc, filename=CALC_FILENAME,
+                                                   content_type=CONTENT_TYPE_PLAIN)),
+                              ('file', FileStorage(stream=calc_test, filename=CALC_TEST_FILENAME,
+                                                   content_type=CONTENT_TYPE_PLAIN))])
+            with self.app.test_request_context('/test/java', data=data, method='POST',
+                                               content_type=CONTENT_TYPE_FORM_DATA):
+                resp = views.execute_java(request, exec_type=ExecType.test)
+        return resp.status_code, resp.get_data(as_text=True), '5 tests successful'
+
+    def gradle_job(self, i: int) -> Tuple[int, str, str]:
+        if i % 2 == 0:
+            path, filename, url, exec_type = GRADLE_PROJECT_PATH, GRADLE_PROJECT_FILENAME, '/test/gradle', \
+                ExecType.test
+        else:
+            path, filename, url, exec_type = GRADLE_WITH_ARGS_PATH, GRADLE_WITH_ARGS_FILENAME, \
+                '/run/gradle?args1=0&args2=100&args3=2', ExecType.run
+        with open(path, 'rb') as f:
+            data = MultiDict([('file', FileStorage(stream=f, filename=filename, content_type=CONTENT_TYPE_ZIP))])
+            with self.app.test_request_context(url, data=data, method='POST',
+                                               content_type=CONTENT_TYPE_FORM_DATA):
+                resp = views.execute_gradle(request, exec_type=exec_type)
+        return resp.status_code, resp.get_data(as_text=True), ''
+
+    def test_mixed_jobs_in_parallel(self):
+        """Tests dozens of concurrent /run/java, /test/java, /run/gradle and /test/gradle jobs.
+        """
+        jobs = [self.run_java_job, self.junit_job, self.gradle_job, self.run_java_job]
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            futures = [executor.submit(jobs[i % len(jobs)], i) for i in range(STRESS_JOBS)]
+            results = [future.result() for future in futures]
+
+        for status, body, expected in results:
+            self.assertEqual(status, 200, body)
+            self.assertIn(expected, body)
+
+    def test_run_cmd_working_dirs_in_parallel(self):
+        """Tests if concurrent commands each run in their own working dir and environment.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            dirs = [os.path.realpath(tempfile.mkdtemp(dir=tmp)) for _ in range(STRESS_JOBS)]
+
+            def job(i: int):
+                return run_cmd(['sh', '-c', 'pwd; echo $JOB'], cwd=dirs[i], env={'JOB': str(i)})
+
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                results = list(executor.map(job, range(STRESS_JOBS)))
+
+            cwd = os.getcwd()
+            for i, (stdout, stderr) in enumerate(results):
+                self.assertEqual(stdout, '{0}\n{1}'.format(dirs[i], i))
+                self.assertIsNone(stderr)
+            self.assertEqual(os.getcwd(), cwd)
@@ -0,0 +1,156 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from flask import Flask, request
+from werkzeug.datastructures import FileStorage, MultiDict
+
+from blueprints.serverless_testing import views
+from blueprints.serverless_testing.daemons import executor_pool as executor_pool_module
+from blueprints.serverless_testing.daemons.executor_pool import run_in_executor, executor_pool
+from blueprints.serverless_testing.exec_types import execute
+from blueprints.serverless_testing.exec_types.compile import javac
+from blueprints.serverless_testing.exec_types.exec_types import ExecType
+from blueprints.serverless_testing.helpers import JUNIT_PATH, JAVA_PATH, run_cmd
+from tests.serverless_testing.utils import ROOT_TEST_DIR, CALC_FILENAME, MAIN_FILENAME, HELLO_NAME_FILENAME, \
+    CONTENT_TYPE_FORM_DATA, CONTENT_TYPE_PLAIN
+
+EXIT_PROGRAM = """public class Exit {
+    public static void main(String[] args) {
+        System.out.println("bye");
+        System.exit(3);
+    }
+}
+"""
+
+SPAM_PROGRAM = """public class Spam {
+    public static void main(String[] args) {
+        while (true) {
+            System.out.println("spam");
+        }
+    }
+}
+"""
+
+
+class TestExecutorPool(unittest.TestCase):
+    """Tests if the pre-started JVMs run programs like the java command.
+    """
+    def setUp(self):
+        """Setup "app_context" and "client", so we can get
+        flask request object.
+        """
+        self.app = Flask(__name__)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+
+        self.out_path = tempfile.mkdtemp()
+        self.class_path = self.out_path + ':' + JUNIT_PATH
+
+        patcher = mock.patch.object(executor_pool_module, 'JAVA_RUN_MODE', executor_pool_module.JAVA_RUN_MODE_POOL)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """Cleanup "app_context".
+        """
+        shutil.rmtree(self.out_path, ignore_errors=True)
+        self.app_context.pop()
+
+    def test_executor_matches_java_command(self):
+        """Tests if the pool output equals the output of the java command.
+        """
+        javac(file_paths=[os.path.join(ROOT_TEST_DIR, 'multiple_java_files', MAIN_FILENAME),
+                          os.path.join(ROOT_TEST_DIR, 'multiple_java_files', CALC_FILENAME)],
+              out_path=self.out_path,
+              class_path=self.class_path)
+        main_class = MAIN_FILENAME.rsplit('.', maxsplit=1)[0]
+
+        result = run_in_executor(self.class_path, main_class, [])
+
+        self.assertEqual(result, run_cmd([JAVA_PATH, '-cp', self.class_path, main_class]))
+
+    def test_executor_with_args(self):
+        """Tests if program arguments are passed to the main method.
+        """
+        javac(file_paths=[os.path.join(ROOT_TEST_DIR, 'arguments', HELLO_NAME_FILENAME)],
+              out_path=self.out_path,
+              class_path=self.class_path)
+
+        stdout, stderr = run_in_executor(self.class_path, 'HelloName', ['Alice'])
+
+        self.assertEqual(stdout, 'Hello, Alice')
+        self.assertIsNone(stderr)
+
+    def test_executor_missing_main_class(self):
+        """Tests if an unknown main class is reported on stderr.
+        """
+        stdout, stderr = run_in_executor(self.class_path, 'DoesNotExist', [])
+
+        self.assertIsNone(stdout)
+        self.assertIn('Could not find or load main class DoesNotExist', stderr)
+
+    def test_executor_recycled_after_exit(self):
+        """Tests if System.exit ends the job and the JVM is not reused.
+        """
+        source = os.path.join(self.out_path, 'Exit.java')
+        with open(source, 'w') as f:
+            f.write(EXIT_PROGRAM)
+        javac(file_paths=[source], out_path=self.out_path, class_path=self.class_path)
+
+        with executor_pool.acquire() as daemon:
+            status, stdout, _ = daemon.request('RUN', [self.class_path, 'Exit'], timeout=30)
+            self.assertEqual(status, 3)
+            self.assertEqual(stdout.strip(), b'bye')
+            self.assertTrue(daemon.recycle)
+
+    def test_executor_output_cap(self):
+        """Tests if a program printing endlessly is stopped at the output cap and its JVM discarded.
+        """
+        source = os.path.join(self.out_path, 'Spam.java')
+        with open(source, 'w') as f:
+            f.write(SPAM_PROGRAM)
+        javac(file_paths=[source], out_path=self.out_path, class_path=self.class_path)
+
+        with executor_pool.acquire() as daemon:
+            status, stdout, _ = daemon.request('RUN', [self.class_path, 'Spam'], timeout=30)
+            self.assertEqual(daemon.limit, 'output')
+            self.assertTrue(daemon.truncated)
+            self.assertGreater(daemon.output_bytes, executor_pool_module.EXECUTOR_LIMITS.output_bytes)
+            self.assertIn(b'bytes of output omitted', stdout)
+            self.assertTrue(daemon.recycle)
+
+    def test_working_dir_forks(self):
+        """Tests if programs with a working dir are forked, a pooled JVM can not change its working dir.
+        """
+        with mock.patch.object(execute, 'run_in_executor') as run_pooled, \
+                mock.patch.object(execute, 'run_limited', return_value=('forked', None, {})) as run_forked:
+            result = execute.java(ExecType.run, self.class_path, 'Main', [], cwd=self.out_path)
+
+        self.assertEqual(result, ('forked', None))
+        run_pooled.assert_not_called()
+        self.assertEqual(run_forked.call_args[1]['cwd'], self.out_path)
+
+    def test_endpoint_run_java_uses_pool(self):
+        """Tests if /run/java hands the program to the pool in pool mode.
+        """
+        data = MultiDict([
+            ('main_file', MAIN_FILENAME),
+            ('file', FileStorage(stream=io.BytesIO(b'public class Main {}'), filename=MAIN_FILENAME,
+                                 content_type=CONTENT_TYPE_PLAIN)),
+        ])
+        with mock.patch.object(views, 'javac_cached', return_value=(None, None)), \
+                mock.patch.object(execute, 'run_in_executor', return_value=('pooled', None)) as run_pooled, \
+                mock.patch.object(execute, 'run_limited') as run_forked, \
+                self.app.test_request_context('/run/java', data=data, method='POST',
+                                              content_type=CONTENT_TYPE_FORM_DATA):
+            resp = views.execute_java(request, exec_type=ExecType.run)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.get_data(as_text=True), 'pooled')
+        run_pooled.assert_called_once()
+        self.assertEqual(run_pooled.call_args[0][1:], (MAIN_FILENAME.rsplit('.', maxsplit=1)[0], []))
+        run_forked.assert_not_called()
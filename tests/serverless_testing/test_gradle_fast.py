@@ -0,0 +1,173 @@
+import os
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+from flask import Flask
+from werkzeug.datastructures import FileStorage, MultiDict
+from blueprints.serverless_testing.exec_types import gradle_fast
+from blueprints.serverless_testing.exec_types.exec_types import ExecType
+from blueprints.serverless_testing.exec_types.gradle_fast import analyze_project, compile_project, run_project
+from blueprints.serverless_testing.helpers import JUNIT_PATH
+from blueprints.serverless_testing.views import serverless_testing_bp
+from tests.serverless_testing.utils import GRADLE_PROJECT_PATH, GRADLE_PROJECT_FILENAME, CONTENT_TYPE_FORM_DATA, \
+    CONTENT_TYPE_ZIP
+
+BUILD_SCRIPT = '''
+plugins {
+    id 'java'
+    id 'application' // runs the main class
+}
+
+/* mainClassName = "Ignored" */
+mainClassName = "com.example.Main"
+version = '1.0'
+
+repositories {
+    maven { url 'https://repo.example.com/maven' }
+}
+
+dependencies {
+    testImplementation('org.junit.jupiter:junit-jupiter:5.6.0')
+    testRuntimeOnly 'org.junit.platform:junit-platform-launcher'
+}
+
+test {
+    useJUnitPlatform()
+    testLogging {
+        events "passed", "skipped", "failed"
+    }
+}
+'''
+
+
+class TestGradleFast(unittest.TestCase):
+    """Tests which gradle projects are compiled and run without gradle.
+    """
+    def setUp(self):
+        """Setup a simple project with a main class and a test.
+        """
+        self.tmp = tempfile.TemporaryDirectory()
+        self.new_project()
+
+    def tearDown(self):
+        """Remove the project.
+        """
+        self.tmp.cleanup()
+
+    def new_project(self):
+        self.project_path = tempfile.mkdtemp(dir=self.tmp.name)
+        self.write('build.gradle', BUILD_SCRIPT)
+        self.write('settings.gradle', "rootProject.name = 'calculator'\n")
+        self.write('src/main/java/com/example/Main.java', 'package com.example; public class Main {}')
+        self.write('src/test/java/com/example/MainTest.java', 'package com.example; class MainTest {}')
+
+    def write(self, name: str, content: str):
+        path = os.path.join(self.project_path, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def test_simple_project(self):
+        """Tests if main class, sources and the JUnit platform are read from a simple project.
+        """
+        project, reason = analyze_project(self.project_path, ExecType.run)
+
+        self.assertEqual(reason, '')
+        self.assertEqual(project.main_class, 'com.example.Main')
+        self.assertTrue(project.junit_platform)
+        self.assertEqual([os.path.basename(p) for p in project.main_sources + project.test_sources],
+                         ['Main.java', 'MainTest.java'])
+        self.assertIsNotNone(analyze_project(self.project_path, ExecType.test)[0])
+
+    def test_application_block(self):
+        """Tests if the main class is read from the application block.
+        """
+        self.write('build.gradle', "plugins { id 'application' }\n"
+                                   "application {\n    mainClassName = 'com.example.Main'\n}")
+
+        project, _ = analyze_project(self.project_path, ExecType.run)
+
+        self.assertEqual(project.main_class, 'com.example.Main')
+        self.assertIsNone(analyze_project(self.project_path, ExecType.test)[0])
+
+        # Gradle 6.3 has no "mainClass" yet
+        self.write('build.gradle', "plugins { id 'application' }\n"
+                                   "application {\n    mainClass.set('com.example.Main')\n}")
+        self.assertIsNone(analyze_project(self.project_path, ExecType.run)[0])
+
+    def test_fallback_to_gradle(self):
+        """Tests if projects with anything beyond the simple layout are left to gradle.
+        """
+        cases = [
+            ('build.gradle', BUILD_SCRIPT.replace("testRuntimeOnly", "implementation 'com.google.guava:guava:29.0'\n"
+                                                                     "testRuntimeOnly")),
+            ('build.gradle', BUILD_SCRIPT.replace("id 'application'", "id 'application'\n    id 'checkstyle'")),
+            ('build.gradle', BUILD_SCRIPT.replace('junit-jupiter:5.6.0', 'junit-jupiter:5.7.0')),
+            ('build.gradle', BUILD_SCRIPT.replace('junit-jupiter:5.6.0', 'junit-jupiter:5.6.3')),
+            ('build.gradle', BUILD_SCRIPT.replace('junit-jupiter:5.6.0', 'junit-jupiter:5.6.0-SNAPSHOT')),
+            ('build.gradle', BUILD_SCRIPT.replace("junit-platform-launcher'", "junit-platform-launcher:1.7.0'")),
+            ('build.gradle', BUILD_SCRIPT + "\nrun { standardInput = System.in }\n"),
+            ('build.gradle', BUILD_SCRIPT + "\nsourceCompatibility = '1.8'\n"),
+            ('build.gradle', BUILD_SCRIPT.replace('useJUnitPlatform()', "useJUnitPlatform { includeTags 'fast' }")),
+            ('settings.gradle', "rootProject.name = 'calculator'\ninclude 'app'\n"),
+            ('src/main/kotlin/Main.kt', 'fun main() {}'),
+            ('build.gradle.kts', ''),
+        ]
+        for name, content in cases:
+            with self.subTest(name=name, content=content):
+                self.new_project()
+                self.write(name, content)
+                project, reason = analyze_project(self.project_path, ExecType.test)
+                self.assertIsNone(project)
+                self.assertNotEqual(reason, '')
+
+    def test_main_without_junit(self):
+        """Tests if the main sources are compiled and run without JUnit on the class-path, like gradle does.
+        """
+        project, _ = analyze_project(self.project_path, ExecType.run)
+        with mock.patch.object(gradle_fast, 'javac_cached', return_value=(None, None)) as javac, \
+                mock.patch.object(gradle_fast, 'java', return_value=('', None)) as java:
+            compile_project(project, ExecType.run)
+            run_project(project, ExecType.run, '')
+
+        self.assertNotIn(JUNIT_PATH, javac.call_args[1]['class_path'])
+        self.assertNotIn(JUNIT_PATH, java.call_args[1]['class_path'])
+
+    def test_disabled(self):
+        """Tests if GRADLE_FAST_PATH=0 leaves every project to gradle.
+        """
+        enabled = gradle_fast.GRADLE_FAST_PATH
+        gradle_fast.GRADLE_FAST_PATH = False
+        try:
+            self.assertEqual(analyze_project(self.project_path, ExecType.run), (None, 'disabled'))
+        finally:
+            gradle_fast.GRADLE_FAST_PATH = enabled
+
+    def test_example_project(self):
+        """Tests if the example gradle project takes the fast path.
+        """
+        # The fixture paths of "utils" point into the container, the zip is read next to this file
+        with zipfile.ZipFile(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gradle_project',
+                                          GRADLE_PROJECT_FILENAME)) as f:
+            f.extractall(self.project_path)
+
+        project, reason = analyze_project(os.path.join(self.project_path, 'gradle_project'), ExecType.test)
+
+        self.assertEqual(reason, '')
+        self.assertEqual(project.main_class, 'com.example.project.Calculator')
+
+    def test_endpoint_run_gradle_fast(self):
+        """Tests the endpoint /run/gradle?return=json on the fast path
+        """
+        app = Flask(__name__)
+        app.register_blueprint(serverless_testing_bp)
+        with open(GRADLE_PROJECT_PATH, 'rb') as f:
+            data = MultiDict([('file', FileStorage(stream=f, filename=GRADLE_PROJECT_FILENAME,
+                                                   content_type=CONTENT_TYPE_ZIP))])
+            resp = app.test_client().post('/run/gradle?return=json', data=data, content_type=CONTENT_TYPE_FORM_DATA)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.headers['X-Execution-Path'], 'fast')
+        self.assertEqual(resp.get_json()['execution_path'], 'fast')
@@ -0,0 +1,102 @@
+import os
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from blueprints.serverless_testing import limits
+from blueprints.serverless_testing.daemons import gradle_pool
+
+
+class TestGradlePool(unittest.TestCase):
+    """Tests the settings and the slots of the gradle daemon pool.
+    """
+    def setUp(self):
+        """Point the pool to a fresh gradle user home with a single slot.
+        """
+        self.tmp = tempfile.TemporaryDirectory()
+        self.user_home, self.size = gradle_pool.GRADLE_USER_HOME, gradle_pool.GRADLE_DAEMON_POOL_SIZE
+        gradle_pool.GRADLE_USER_HOME = self.tmp.name
+        gradle_pool.GRADLE_DAEMON_POOL_SIZE = 1
+        gradle_pool._setup_done = False
+
+    def tearDown(self):
+        """Restore the pool settings.
+        """
+        gradle_pool.GRADLE_USER_HOME, gradle_pool.GRADLE_DAEMON_POOL_SIZE = self.user_home, self.size
+        gradle_pool._setup_done = False
+        self.tmp.cleanup()
+
+    def test_daemon_args_use_shared_user_home(self):
+        """Tests if builds are routed to the shared gradle user home.
+        """
+        args = gradle_pool.gradle_daemon_args()
+
+        self.assertIn('--daemon', args)
+        self.assertEqual(args[args.index('--gradle-user-home') + 1], self.tmp.name)
+
+    def test_user_home_caps_daemon_memory(self):
+        """Tests if the daemon heap and idle timeout are configured.
+        """
+        gradle_pool.ensure_gradle_user_home()
+
+        with open(os.path.join(self.tmp.name, 'gradle.properties')) as f:
+            properties = f.read()
+
+        self.assertIn('org.gradle.jvmargs=-Xmx' + gradle_pool.GRADLE_DAEMON_MAX_HEAP, properties)
+        self.assertIn('org.gradle.daemon.idletimeout=', properties)
+
+    def test_daemons_not_limited(self):
+        """Tests if builds on the pool only keep the timeout and the output cap, the daemons they start must live on.
+        """
+        pooled = gradle_pool.gradle_limits()
+        with mock.patch.object(gradle_pool, 'GRADLE_DAEMON_ENABLED', False):
+            single = gradle_pool.gradle_limits()
+
+        self.assertEqual(pooled, limits.job_limits('gradle')._replace(cpu_seconds=0, memory_bytes=0, processes=0))
+        self.assertEqual(single, limits.job_limits('gradle'))
+        with mock.patch.object(limits, 'JOB_CGROUP_ROOT', self.tmp.name):
+            self.assertIsNone(limits.create_cgroup(pooled))
+
+    def test_forked_jvms_limited(self):
+        """Tests if the JVMs a build on the pool forks are started within the CPU and memory limits of a java.
+        """
+        with mock.patch.object(gradle_pool, 'GRADLE_DAEMON_ENABLED', True), \
+                mock.patch.object(limits, 'JOB_CGROUP_ROOT', ''), \
+                gradle_pool.child_limits() as args:
+            properties = dict(arg[len('-Dquellcoda.'):].split('=', 1) for arg in args if arg.startswith('-D'))
+        with mock.patch.object(gradle_pool, 'GRADLE_DAEMON_ENABLED', False), gradle_pool.child_limits() as single:
+            self.assertEqual(single, [])
+
+        # Passed on like limits.gradle does, with a shell standing in for java
+        env = dict(os.environ, QUELLCODA_JAVA='/bin/sh', QUELLCODA_CGROUP=properties['cgroup'],
+                   QUELLCODA_CPU_SECONDS=properties['cpuSeconds'], QUELLCODA_CPU_GRACE=properties['cpuGrace'],
+                   QUELLCODA_MEMORY_KB=properties['memoryKb'])
+        out = subprocess.run([properties['limitedJava'], '-c', 'ulimit -S -t; ulimit -H -t; ulimit -d'],
+                             env=env, stdout=subprocess.PIPE, check=True).stdout.decode().split()
+
+        self.assertEqual(args[args.index('--init-script') + 1], gradle_pool.LIMITS_INIT_SCRIPT)
+        java = limits.job_limits('java')
+        self.assertEqual(out, [str(java.cpu_seconds), str(java.cpu_seconds + limits.CPU_GRACE),
+                               str(java.memory_bytes // 1024)])
+
+    def test_slots_bound_concurrent_builds(self):
+        """Tests if a second build waits until the only slot is free.
+        """
+        events = []
+
+        def build(name: str):
+            with gradle_pool.gradle_slot():
+                events.append(name + ' start')
+                time.sleep(0.2)
+                events.append(name + ' end')
+
+        threads = [threading.Thread(target=build, args=(name,)) for name in ('a', 'b')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(events[1], events[0].replace('start', 'end'))
@@ -0,0 +1,120 @@
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+
+from flask import Flask, request
+from werkzeug.datastructures import FileStorage
+from blueprints.serverless_testing import ingest
+from blueprints.serverless_testing.workspaces import workspace
+from tests.serverless_testing.utils import CONTENT_TYPE_FORM_DATA, CONTENT_TYPE_ZIP
+
+
+def zip_upload(entries: dict) -> FileStorage:
+    """Builds an uploaded zip file with the given entries.
+    """
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w', compression=zipfile.ZIP_DEFLATED) as z:
+        for name, content in entries.items():
+            z.writestr(name, content)
+    archive.seek(0)
+    return FileStorage(stream=archive, filename='project.zip', content_type=CONTENT_TYPE_ZIP)
+
+
+class TestIngest(unittest.TestCase):
+    """Tests writing uploads to disk and extracting zip files from the upload stream.
+    """
+    def setUp(self):
+        """Setup "app" with the workspace request and point the uploads to a fresh directory.
+        """
+        self.tmp = tempfile.TemporaryDirectory()
+        self.upload_dir = ingest.UPLOAD_DIR
+        ingest.UPLOAD_DIR = os.path.join(self.tmp.name, 'uploads')
+        self.dest = os.path.join(self.tmp.name, 'work')
+        os.makedirs(self.dest)
+
+        self.app = Flask(__name__)
+        self.app.request_class = ingest.WorkspaceRequest
+        self.app.config['MAX_CONTENT_LENGTH'] = 1024
+
+    def tearDown(self):
+        """Restore the upload directory.
+        """
+        ingest.UPLOAD_DIR = self.upload_dir
+        self.tmp.cleanup()
+
+    def test_upload_is_moved_into_workspace(self):
+        """Tests if an upload is written to disk once and moved, and the upload dir is removed.
+        """
+        dest = os.path.join(self.dest, 'Main.java')
+        with self.app.test_request_context('/run/java', method='POST', content_type=CONTENT_TYPE_FORM_DATA,
+                                           data={'file': (io.BytesIO(b'class Main {}'), 'Main.java')}):
+            f = request.files['file']
+            upload_path = request.upload_path
+            self.assertEqual(os.listdir(upload_path), [os.path.basename(f.stream.name)])
+
+            ingest.save_upload(f, dest)
+            self.assertEqual(os.listdir(upload_path), [])
+
+        with open(dest) as f:
+            self.assertEqual(f.read(), 'class Main {}')
+        self.assertFalse(os.path.exists(upload_path))
+
+    def test_default_upload_dir_is_moved(self):
+        """Tests if uploads to the default "UPLOAD_DIR" are moved into a workspace, not copied.
+        """
+        ingest.UPLOAD_DIR = self.upload_dir
+        with workspace() as work_path, \
+                self.app.test_request_context('/run/java', method='POST', content_type=CONTENT_TYPE_FORM_DATA,
+                                              data={'file': (io.BytesIO(b'class Main {}'), 'Main.java')}):
+            f = request.files['file']
+            inode = os.stat(f.stream.name).st_ino
+
+            ingest.save_upload(f, os.path.join(work_path, 'Main.java'))
+            self.assertEqual(os.stat(os.path.join(work_path, 'Main.java')).st_ino, inode)
+
+    def test_oversized_upload_is_rejected(self):
+        """Tests if payloads above the limit are answered with 413.
+        """
+        @self.app.route('/run/java', methods=['POST'])
+        def run():
+            return str(len(request.files))
+
+        resp = self.app.test_client().post('/run/java', content_type=CONTENT_TYPE_FORM_DATA,
+                                           data={'file': (io.BytesIO(b'x' * 4096), 'Main.java')})
+
+        self.assertEqual(resp.status_code, 413)
+
+    def test_extract_zip(self):
+        """Tests if all entries are extracted.
+        """
+        ingest.extract_zip(zip_upload({'project/build.gradle': 'apply plugin: "java"',
+                                       'project/src/Main.java': 'class Main {}'}), self.dest)
+
+        with open(os.path.join(self.dest, 'project', 'src', 'Main.java')) as f:
+            self.assertEqual(f.read(), 'class Main {}')
+
+    def test_zip_bomb_is_rejected(self):
+        """Tests if highly compressed entries are rejected before anything is written.
+        """
+        with self.assertRaises(ingest.UploadError):
+            ingest.extract_zip(zip_upload({'bomb.txt': b'\0' * (4 * ingest.ZIP_RATIO_MIN_BYTES)}), self.dest)
+
+        self.assertEqual(os.listdir(self.dest), [])
+
+    def test_zip_limits(self):
+        """Tests the limit on the number of entries and entries pointing outside of the project.
+        """
+        max_entries = ingest.ZIP_MAX_ENTRIES
+        ingest.ZIP_MAX_ENTRIES = 2
+        try:
+            with self.assertRaises(ingest.UploadError):
+                ingest.extract_zip(zip_upload({'a': '', 'b': '', 'c': ''}), self.dest)
+        finally:
+            ingest.ZIP_MAX_ENTRIES = max_entries
+
+        with self.assertRaises(ingest.UploadError):
+            ingest.extract_zip(zip_upload({'../evil.sh': 'rm -rf /'}), self.dest)
+        with self.assertRaises(ingest.UploadError):
+            ingest.extract_zip(FileStorage(stream=io.BytesIO(b'no zip'), filename='project.zip'), self.dest)
@@ -0,0 +1,150 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from flask import Flask, Request, Response, request
+from blueprints.serverless_testing import jobs
+from blueprints.serverless_testing.views import serverless_testing_bp
+from tests.serverless_testing.utils import CONTENT_TYPE_FORM_DATA
+
+
+def echo(req: Request) -> Response:
+    """Stands in for a run handler, answers with the replayed file and args.
+    """
+    f = req.files['file']
+    return Response('{0}:{1}:{2}'.format(f.filename, f.read().decode(), req.args.get('args1')), status=200)
+
+
+class TestJobs(unittest.TestCase):
+    """Tests the background job api and its result store.
+    """
+    def setUp(self):
+        """Setup "app" with the blueprint and point the store to a fresh directory.
+        """
+        self.tmp = tempfile.TemporaryDirectory()
+        self.jobs_dir = jobs.JOBS_DIR
+        jobs.JOBS_DIR = self.tmp.name
+
+        self.app = Flask(__name__)
+        self.app.register_blueprint(serverless_testing_bp)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        """Restore the store directory.
+        """
+        jobs.JOBS_DIR = self.jobs_dir
+        self.tmp.cleanup()
+
+    def wait(self, job_id: str) -> dict:
+        for _ in range(100):
+            job = jobs.load_job(job_id)
+            if job['status'] in (jobs.JOB_DONE, jobs.JOB_FAILED):
+                return job
+            time.sleep(0.05)
+        self.fail('Job did not finish')
+
+    def test_job_replays_request(self):
+        """Tests if a job sees the uploaded files and query args of the original request.
+        """
+        with self.app.test_request_context('/jobs?type=run/java&args1=World', method='POST',
+                                           data={'file': (io.BytesIO(b'class A {}'), 'A.java')},
+                                           content_type=CONTENT_TYPE_FORM_DATA):
+            job = jobs.submit_job(self.app, 'run/java', request, handler=echo)
+
+        job = self.wait(job['id'])
+
+        self.assertEqual(job['status'], jobs.JOB_DONE)
+        self.assertEqual(job['result'], {'status_code': 200, 'body': 'A.java:class A {}:World'})
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, job['id'])))
+
+    def test_streamed_response_closed(self):
+        """Tests if a job closes a streamed response, which frees what it holds, e.g. its scheduler slot.
+        """
+        closed = []
+
+        def stream(req: Request) -> Response:
+            resp = Response((line for line in ['a\n', 'b\n']), mimetype='text/plain')
+            resp.call_on_close(lambda: closed.append(True))
+            return resp
+
+        with self.app.test_request_context('/jobs?type=run/java&stream=text', method='POST',
+                                           data={'file': (io.BytesIO(b'class A {}'), 'A.java')},
+                                           content_type=CONTENT_TYPE_FORM_DATA):
+            job = jobs.submit_job(self.app, 'run/java', request, handler=stream)
+
+        job = self.wait(job['id'])
+
+        self.assertEqual(job['result'], {'status_code': 200, 'body': 'a\nb\n'})
+        self.assertEqual(closed, [True])
+
+    def test_unknown_type(self):
+        """Tests if jobs of an unknown type are rejected.
+        """
+        resp = self.client.post('/jobs?type=run/python')
+
+        self.assertEqual(resp.status_code, 400)
+
+    def test_unknown_job(self):
+        """Tests if polling an unknown job returns 404.
+        """
+        resp = self.client.get('/jobs/' + 'f' * 32)
+
+        self.assertEqual(resp.status_code, 404)
+        self.assertEqual(self.client.get('/jobs/..').status_code, 404)
+
+    def test_prune_expired_and_oldest(self):
+        """Tests if expired results and results above the bound are removed.
+        """
+        now = time.time()
+        for i, finished in enumerate([now - jobs.JOBS_TTL - 10, now - 2, now - 1, now]):
+            with open(os.path.join(self.tmp.name, '{0:032x}.json'.format(i)), 'w') as f:
+                json.dump({'id': '{0:032x}'.format(i), 'status': jobs.JOB_DONE,
+                           'created': finished, 'finished': finished}, f)
+
+        max_stored = jobs.JOBS_MAX_STORED
+        jobs.JOBS_MAX_STORED = 2
+        try:
+            jobs.prune_jobs()
+        finally:
+            jobs.JOBS_MAX_STORED = max_stored
+
+        self.assertEqual(sorted(os.listdir(self.tmp.name)),
+                         ['.lock', '{0:032x}.json'.format(2), '{0:032x}.json'.format(3)])
+
+    def test_queue_full(self):
+        """Tests if jobs are rejected with 429 and nothing is stored once the queue is full.
+        """
+        with mock.patch.object(jobs, 'JOBS_MAX_QUEUED', 0):
+            resp = self.client.post('/jobs?type=run/java',
+                                    data={'file': (io.BytesIO(b'class A {}'), 'A.java'), 'main_file': 'A'},
+                                    content_type=CONTENT_TYPE_FORM_DATA)
+
+        self.assertEqual(resp.status_code, 429)
+        self.assertIn('Retry-After', resp.headers)
+        self.assertEqual(jobs.pending_jobs(), 0)
+        self.assertEqual([name for name in os.listdir(self.tmp.name) if name != '.lock'], [])
+
+    def test_lost_and_stale_jobs(self):
+        """Tests if jobs of an exited worker fail and unfinished jobs expire after "JOBS_TTL".
+        """
+        exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+        exited.wait()
+        now = time.time()
+        for i, (created, pid) in enumerate([(now, exited.pid), (now - jobs.JOBS_TTL - 10, os.getpid()),
+                                            (now, os.getpid())]):
+            with open(os.path.join(self.tmp.name, '{0:032x}.json'.format(i)), 'w') as f:
+                json.dump({'id': '{0:032x}'.format(i), 'status': jobs.JOB_RUNNING, 'created': created, 'pid': pid}, f)
+
+        job = jobs.load_job('{0:032x}'.format(0))
+        jobs.prune_jobs()
+
+        self.assertEqual(job['status'], jobs.JOB_FAILED)
+        self.assertIn('exited', job['error'])
+        self.assertIsNone(jobs.load_job('{0:032x}'.format(1)))
+        self.assertEqual(jobs.load_job('{0:032x}'.format(2))['status'], jobs.JOB_RUNNING)
@@ -0,0 +1,205 @@
+import io
+import os
+import struct
+import tempfile
+import unittest
+
+from flask import Flask
+from werkzeug.datastructures import FileStorage, MultiDict
+from blueprints.serverless_testing import junit
+from blueprints.serverless_testing.exec_types.exec_types import ExecType
+from blueprints.serverless_testing.exec_types.execute import java_cmd
+from blueprints.serverless_testing.junit import JUnitSelection, find_test_classes, parse_reports, read_parallel, \
+    read_selection, selector_args, shard_classes, grading_class_path
+from blueprints.serverless_testing.views import serverless_testing_bp
+from tests.serverless_testing.utils import CALC_PATH, CALC_FILENAME, CALC_TEST_PATH, CALC_TEST_FILENAME, \
+    CONTENT_TYPE_FORM_DATA, CONTENT_TYPE_PLAIN
+
+# A legacy XML report of the console launcher, shortened
+REPORT = '''<?xml version="1.0" encoding="UTF-8"?>
+<testsuite name="JUnit Jupiter" tests="4" skipped="1" failures="1" errors="0" time="1,204.5">
+<testcase name="addTwoNumbers()" classname="CalculatorTest" time="1,000.5">
+<system-out><![CDATA[
+unique-id: [engine:junit-jupiter]/[class:CalculatorTest]/[method:addTwoNumbers()]
+display-name: Adding two numbers
+]]></system-out>
+</testcase>
+<testcase name="subTwoNumbers()" classname="CalculatorTest" time="0.004">
+<failure message="expected: &lt;1&gt; but was: &lt;-1&gt;" type="org.opentest4j.AssertionFailedError"><![CDATA[
+org.opentest4j.AssertionFailedError: expected: <1> but was: <-1>
+	at CalculatorTest.subTwoNumbers(CalculatorTest.java:19)
+]]></failure>
+</testcase>
+<testcase name="divTwoNumbers(int)[2]" classname="CalculatorTest" time="0.001"/>
+<testcase name="slowTest()" classname="SlowTest" time="0">
+<skipped><![CDATA[void SlowTest.slowTest() is @Disabled]]></skipped>
+</testcase>
+</testsuite>
+'''
+
+
+def write_class(path: str, name: str, descriptor: str):
+    """Writes a class file declaring "name" that only refers to the type of "descriptor".
+    """
+    pool = b''
+    for value in (name, 'java/lang/Object', descriptor):
+        pool += struct.pack('>BH', 1, len(value)) + value.encode()
+    pool += struct.pack('>BHBH', 7, 1, 7, 2)
+    with open(path, 'wb') as f:
+        f.write(struct.pack('>IHHH', 0xCAFEBABE, 0, 52, 6) + pool + struct.pack('>HHHHHHH', 0x21, 4, 5, 0, 0, 0, 0))
+
+
+class TestJUnit(unittest.TestCase):
+    """Tests selecting tests and reading the XML reports of the JUnit launcher.
+    """
+    def setUp(self):
+        """Setup "app" with the blueprint.
+        """
+        self.app = Flask(__name__)
+        self.app.register_blueprint(serverless_testing_bp)
+        self.client = self.app.test_client()
+
+    def test_read_selection(self):
+        """Tests if selectors are read from the query parameters and invalid ones are rejected.
+        """
+        selection, err = read_selection(MultiDict([('select_class', 'pkg.CalculatorTest'),
+                                                   ('select_method', 'CalculatorTest#addTwoNumbers'),
+                                                   ('select_method', 'CalculatorTest#divTwoNumbers(int)'),
+                                                   ('include_tag', 'fast & !slow')]))
+        self.assertIsNone(err)
+        self.assertEqual(selection.methods, ['CalculatorTest#addTwoNumbers', 'CalculatorTest#divTwoNumbers(int)'])
+
+        self.assertEqual(read_selection(MultiDict()), (None, None))
+        self.assertIsNotNone(read_selection(MultiDict([('select_class', '--help')]))[1])
+        self.assertIsNotNone(read_selection(MultiDict([('select_method', 'CalculatorTest')]))[1])
+
+    def test_selector_args(self):
+        """Tests if selected classes and methods replace the class path scan and tags filter both.
+        """
+        self.assertEqual(selector_args(None, '/suite'), ['--scan-class-path', '/suite'])
+        self.assertEqual(selector_args(JUnitSelection([], [], ['fast'])), ['--scan-class-path', '--include-tag=fast'])
+        self.assertEqual(selector_args(JUnitSelection(['A'], ['B#c'], []), '/suite'),
+                         ['--select-class=A', '--select-method=B#c'])
+
+    def test_parse_reports(self):
+        """Tests if status, duration, failure and display name are read per test and summed up per class.
+        """
+        with tempfile.TemporaryDirectory() as reports_path:
+            self.assertIsNone(parse_reports(reports_path))
+            with open(os.path.join(reports_path, 'TEST-junit-jupiter.xml'), 'w') as f:
+                f.write(REPORT)
+            results = parse_reports(reports_path)
+
+        self.assertEqual(results['summary'], {'tests': 4, 'passed': 2, 'failed': 1, 'errored': 0, 'skipped': 1,
+                                              'duration_ms': 1000505})
+        calculator, slow = results['classes']
+        self.assertEqual((calculator['name'], calculator['status']), ('CalculatorTest', 'failed'))
+        self.assertEqual((slow['name'], slow['status']), ('SlowTest', 'skipped'))
+
+        add, sub, div = calculator['tests']
+        self.assertEqual(add['display_name'], 'Adding two numbers')
+        self.assertEqual(add['duration_ms'], 1000500)
+        self.assertEqual(sub['status'], 'failed')
+        self.assertEqual(sub['message'], 'expected: <1> but was: <-1>')
+        self.assertEqual(sub['type'], 'org.opentest4j.AssertionFailedError')
+        self.assertIn('CalculatorTest.java:19', sub['stack_trace'])
+        self.assertEqual(sub['selector'], 'CalculatorTest#subTwoNumbers()')
+        self.assertEqual(div['selector'], 'CalculatorTest#divTwoNumbers(int)')
+
+    def test_invalid_selector(self):
+        """Tests if an invalid selector is answered with 400 before anything is compiled.
+        """
+        data = {'file': (io.BytesIO(b'public class Calculator {}'), CALC_FILENAME)}
+        resp = self.client.post('/test/java?return=json&select_class=-x', data=data,
+                                content_type=CONTENT_TYPE_FORM_DATA)
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('select_class', resp.get_json()['error'])
+
+    def test_endpoint_test_java_json(self):
+        """Tests the endpoint /test/java?return=json with a selected test
+        """
+        with open(CALC_PATH, 'rb') as calc, open(CALC_TEST_PATH, 'rb') as test:
+            data = MultiDict([('file', FileStorage(stream=calc, filename=CALC_FILENAME,
+                                                   content_type=CONTENT_TYPE_PLAIN)),
+                              ('file', FileStorage(stream=test, filename=CALC_TEST_FILENAME,
+                                                   content_type=CONTENT_TYPE_PLAIN))])
+            resp = self.client.post('/test/java?return=json&select_method=CalculatorTest%23addTwoNumbers',
+                                    data=data, content_type=CONTENT_TYPE_FORM_DATA)
+        results = resp.get_json()['results']
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(results['summary']['tests'], 1)
+        self.assertEqual(results['classes'][0]['tests'][0]['display_name'], 'Adding two numbers')
+
+    def test_read_parallel(self):
+        """Tests if the parallel mode defaults to "JUNIT_PARALLEL" and unknown modes are rejected.
+        """
+        self.assertEqual(read_parallel(MultiDict()), (junit.JUNIT_PARALLEL, None))
+        self.assertEqual(read_parallel(MultiDict([('parallel', 'shards')])), ('shards', None))
+        self.assertIsNotNone(read_parallel(MultiDict([('parallel', 'threads')]))[1])
+
+    def test_jupiter_parallel_cmd(self):
+        """Tests if the jupiter mode enables parallel test classes with the configured threads.
+        """
+        cmd = java_cmd(ExecType.test, '/out', None, [], parallel='jupiter')
+
+        self.assertIn('--config=junit.jupiter.execution.parallel.enabled=true', cmd)
+        self.assertIn('--config=junit.jupiter.execution.parallel.config.fixed.parallelism={0}'
+                      .format(junit.JUNIT_PARALLELISM), cmd)
+        self.assertEqual(cmd[-1], '--scan-class-path')
+        self.assertNotIn('--config=junit.jupiter.execution.parallel.enabled=true',
+                         java_cmd(ExecType.test, '/out', None, [], parallel='shards'))
+
+    def test_shard_test_classes(self):
+        """Tests if only top level classes referring to JUnit are dealt out to the shards.
+        """
+        with tempfile.TemporaryDirectory() as class_dir:
+            os.makedirs(os.path.join(class_dir, 'pkg'))
+            write_class(os.path.join(class_dir, 'pkg', 'ATest.class'), 'pkg/ATest', 'Lorg/junit/jupiter/api/Test;')
+            write_class(os.path.join(class_dir, 'BTest.class'), 'BTest', 'Lorg/junit/Test;')
+            write_class(os.path.join(class_dir, 'BTest$Nested.class'), 'BTest$Nested', 'Lorg/junit/Test;')
+            write_class(os.path.join(class_dir, 'CTest.class'), 'CTest', 'Lorg/junit/jupiter/api/Test;')
+            write_class(os.path.join(class_dir, 'Calculator.class'), 'Calculator', 'Ljava/lang/String;')
+            classes = find_test_classes([class_dir])
+
+        self.assertEqual(classes, ['BTest', 'CTest', 'pkg.ATest'])
+        self.assertEqual(shard_classes(classes, 2), [['BTest', 'pkg.ATest'], ['CTest']])
+        self.assertEqual(shard_classes(classes, 8), [['BTest'], ['CTest'], ['pkg.ATest']])
+        self.assertEqual(shard_classes([], 8), [])
+
+    def test_merge_shard_reports(self):
+        """Tests if the reports of all shards are merged and ordered by class name.
+        """
+        with tempfile.TemporaryDirectory() as reports_path:
+            for shard, classname in (('shard-0', 'SlowTest'), ('shard-1', 'CalculatorTest')):
+                os.makedirs(os.path.join(reports_path, shard))
+                with open(os.path.join(reports_path, shard, 'TEST-junit-jupiter.xml'), 'w') as f:
+                    f.write('<testsuite><testcase name="a()" classname="{0}" time="0.1"/></testsuite>'
+                            .format(classname))
+            results = parse_reports(reports_path)
+
+        self.assertEqual([c['name'] for c in results['classes']], ['CalculatorTest', 'SlowTest'])
+        self.assertEqual(results['summary']['tests'], 2)
+
+    def test_grading_class_path(self):
+        """Tests if precompiled tests and JUnit come before the submission, so it can not replace them.
+        """
+        class_path = grading_class_path('/suite', '/work/out').split(':')
+
+        self.assertLess(class_path.index('/suite'), class_path.index('/work/out'))
+        self.assertLess(class_path.index(junit.JUNIT_PATH), class_path.index('/work/out'))
+
+    def test_endpoint_test_java_shards(self):
+        """Tests the endpoint /test/java?parallel=shards&return=json
+        """
+        with open(CALC_PATH, 'rb') as calc, open(CALC_TEST_PATH, 'rb') as test:
+            data = MultiDict([('file', FileStorage(stream=calc, filename=CALC_FILENAME,
+                                                   content_type=CONTENT_TYPE_PLAIN)),
+                              ('file', FileStorage(stream=test, filename=CALC_TEST_FILENAME,
+                                                   content_type=CONTENT_TYPE_PLAIN))])
+            resp = self.client.post('/test/java?parallel=shards&return=json', data=data,
+                                    content_type=CONTENT_TYPE_FORM_DATA)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.get_json()['results']['summary']['passed'], 5)
@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+from flask import Flask
+from blueprints.serverless_testing import limits, supervisor
+
+
+class TestLimits(unittest.TestCase):
+    """Tests the time, CPU and memory limits of job commands and the reported usage.
+    """
+    def setUp(self):
+        """Setup "app" to record the usage in and supervise the commands on the request thread.
+        """
+        self.app = Flask(__name__)
+        patcher = mock.patch.object(supervisor, 'EXEC_MODE', supervisor.EXEC_MODE_THREADS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_usage_is_reported(self):
+        """Tests if output, exit code and usage of a command within its limits are returned.
+        """
+        with self.app.app_context():
+            stdout, stderr, usage = limits.run_limited([sys.executable, '-c', 'print("Hello")'],
+                                                       limits=limits.Limits(10, 10, 0, 0))
+            summary = limits.usage_summary()
+
+        self.assertEqual(stdout, 'Hello')
+        self.assertIsNone(stderr)
+        self.assertEqual(usage['exit_code'], 0)
+        self.assertIsNone(usage['limit'])
+        self.assertGreater(usage['max_rss_kb'], 0)
+        self.assertEqual(summary['wall_ms'], usage['wall_ms'])
+
+    def test_wall_limit_kills_process_group(self):
+        """Tests if the command and its background children are killed at the timeout.
+        """
+        pid_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.limits-child.pid')
+        cmd = ['sh', '-c', 'sleep 30 & echo $! > "{0}"; echo started; sleep 30'.format(pid_file)]
+        start = time.monotonic()
+        try:
+            stdout, stderr, usage = limits.run_limited(cmd, limits=limits.Limits(1, 0, 0, 0))
+            with open(pid_file) as f:
+                child = int(f.read())
+        finally:
+            if os.path.exists(pid_file):
+                os.remove(pid_file)
+
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(stdout, 'started')
+        self.assertIn('Time limit of 1 seconds exceeded', stderr)
+        self.assertEqual(usage['limit'], limits.LIMIT_WALL)
+
+        # The killed child is reaped by init, it may take a moment
+        for _ in range(100):
+            try:
+                os.kill(child, 0)
+            except ProcessLookupError:
+                break
+            time.sleep(0.05)
+        else:
+            self.fail('Background child still running')
+
+    def test_wall_limit_after_streams_closed(self):
+        """Tests if a command that closes its streams and keeps running is killed at the timeout.
+        """
+        cmd = ['sh', '-c', 'echo started; exec >&- 2>&-; sleep 30']
+        start = time.monotonic()
+        stdout, stderr, usage = limits.run_limited(cmd, limits=limits.Limits(1, 0, 0, 0))
+
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(stdout, 'started')
+        self.assertEqual(usage['limit'], limits.LIMIT_WALL)
+
+        events = list(limits.stream_limited(cmd, limits=limits.Limits(1, 0, 0, 0)))
+        self.assertEqual(events[-1][1]['limit'], limits.LIMIT_WALL)
+
+    def test_cpu_limit(self):
+        """Tests if a busy loop is stopped by the CPU limit and reported as such.
+        """
+        stdout, stderr, usage = limits.run_limited([sys.executable, '-c', 'while True: pass'],
+                                                   limits=limits.Limits(30, 1, 0, 0))
+
+        self.assertEqual(usage['limit'], limits.LIMIT_CPU)
+        self.assertGreaterEqual(usage['cpu_ms'], 900)
+        self.assertIn('CPU time limit of 1 seconds exceeded', stderr)
+
+    def test_stream_limited(self):
+        """Tests if streamed commands end with their usage.
+        """
+        events = list(limits.stream_limited([sys.executable, '-c', 'print("a"); print("b")'],
+                                            limits=limits.Limits(10, 10, 0, 0)))
+
+        self.assertEqual(events[:2], [('stdout', 'a\n'), ('stdout', 'b\n')])
+        self.assertEqual(events[-1][0], 'exit')
+        self.assertEqual(events[-1][1]['exit_code'], 0)
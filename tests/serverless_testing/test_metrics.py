@@ -0,0 +1,71 @@
+import sys
+import unittest
+
+from flask import Flask
+from prometheus_client import REGISTRY
+from blueprints.serverless_testing import limits, metrics
+from blueprints.serverless_testing.views import serverless_testing_bp
+
+
+def sample(name: str, **labels) -> float:
+    """Reads a sample of the default registry, 0 if it was never recorded.
+    """
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TestMetrics(unittest.TestCase):
+    """Tests the request, stage and subprocess metrics and the /metrics endpoint.
+    """
+    def setUp(self):
+        """Setup "app" with the blueprint.
+        """
+        self.app = Flask(__name__)
+        self.app.register_blueprint(serverless_testing_bp)
+        self.client = self.app.test_client()
+
+    def test_requests_are_counted(self):
+        """Tests if requests are counted by endpoint and status and none stays in flight.
+        """
+        before = sample('quellcoda_requests_total', endpoint='/run/java', method='POST', status='400')
+        durations = sample('quellcoda_request_duration_seconds_count', endpoint='/run/java')
+        uploads = sample('quellcoda_stage_duration_seconds_count', endpoint='/run/java', stage='upload')
+
+        resp = self.client.post('/run/java')
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(sample('quellcoda_requests_total', endpoint='/run/java', method='POST', status='400'),
+                         before + 1)
+        self.assertEqual(sample('quellcoda_request_duration_seconds_count', endpoint='/run/java'), durations + 1)
+        self.assertEqual(sample('quellcoda_requests_in_flight', endpoint='/run/java'), 0)
+        self.assertEqual(sample('quellcoda_stage_duration_seconds_count', endpoint='/run/java', stage='upload'),
+                         uploads + 1)
+
+    def test_subprocess_exits_and_timeouts(self):
+        """Tests if exit codes and exceeded limits of commands are counted.
+        """
+        tool = __name__
+        usage = {'tool': tool, 'exit_code': -9, 'wall_ms': 1000, 'cpu_ms': 10, 'max_rss_kb': 1024,
+                 'limit': limits.LIMIT_WALL}
+        metrics.observe_usage(usage)
+
+        self.assertEqual(sample('quellcoda_subprocess_exits_total', tool=tool, exit_code='-9'), 1)
+        self.assertEqual(sample('quellcoda_subprocess_limit_exceeded_total', tool=tool, limit='wall'), 1)
+
+        before = sample('quellcoda_subprocess_exits_total', tool='python', exit_code='3')
+        limits.run_limited([sys.executable, '-c', 'exit(3)'], limits=limits.Limits(10, 10, 0, 0))
+        self.assertEqual(sample('quellcoda_subprocess_exits_total', tool='python', exit_code='3'), before + 1)
+
+    def test_metrics_endpoint(self):
+        """Tests if /metrics answers in the Prometheus text format.
+        """
+        with self.app.test_request_context('/test/gradle', method='POST'):
+            with metrics.measure_stage(metrics.STAGE_EXTRACT):
+                pass
+
+        resp = self.client.get('/metrics')
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.content_type.startswith('text/plain'))
+        body = resp.get_data(as_text=True)
+        self.assertIn('quellcoda_stage_duration_seconds_count{endpoint="/test/gradle",stage="extract"}', body)
+        self.assertIn('quellcoda_queue_depth', body)
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import subprocess
+import unittest
+from unittest import mock
+
+from blueprints.serverless_testing import mirror
+from blueprints.serverless_testing.exec_types.exec_types import ExecType
+from blueprints.serverless_testing.exec_types.gradle import gradle_cmd
+
+
+class TestMirror(unittest.TestCase):
+    """Tests the allowlist and the layout of the offline dependency mirror.
+    """
+    def setUp(self):
+        """Point the mirror and its allowlist to a fresh directory.
+        """
+        self.tmp = tempfile.TemporaryDirectory()
+        self.mirror_dir = mirror.GRADLE_MIRROR_DIR
+        self.artifacts = mirror.GRADLE_MIRROR_ARTIFACTS
+        mirror.GRADLE_MIRROR_DIR = os.path.join(self.tmp.name, 'mirror')
+        mirror.GRADLE_MIRROR_ARTIFACTS = os.path.join(self.tmp.name, 'artifacts.txt')
+        os.makedirs(mirror.GRADLE_MIRROR_DIR)
+
+    def tearDown(self):
+        """Restore the mirror directory and the allowlist.
+        """
+        mirror.GRADLE_MIRROR_DIR = self.mirror_dir
+        mirror.GRADLE_MIRROR_ARTIFACTS = self.artifacts
+        self.tmp.cleanup()
+
+    def test_allowlist(self):
+        """Tests if artifacts are appended once and comments are ignored.
+        """
+        with open(mirror.GRADLE_MIRROR_ARTIFACTS, 'w') as f:
+            f.write('# JUnit\norg.junit.jupiter:junit-jupiter:5.6.0  # the default\n\n')
+
+        added = mirror.add_artifacts(['org.junit.jupiter:junit-jupiter:5.6.0', 'org.hamcrest:hamcrest:2.2',
+                                      'org.hamcrest:hamcrest:2.2'])
+
+        self.assertEqual(added, ['org.hamcrest:hamcrest:2.2'])
+        self.assertEqual(mirror.read_artifacts(),
+                         ['org.junit.jupiter:junit-jupiter:5.6.0', 'org.hamcrest:hamcrest:2.2'])
+        with self.assertRaises(mirror.MirrorError):
+            mirror.add_artifacts(['org.hamcrest:hamcrest'])
+
+    def test_versions_resolved_separately(self):
+        """Tests if every version of a module is resolved in a configuration of its own.
+        """
+        project_path = os.path.join(self.tmp.name, 'project')
+        with mock.patch.object(mirror.subprocess, 'run', return_value=subprocess.CompletedProcess([], 0, b'')):
+            mirror.resolve_artifacts(['org.junit.jupiter:junit-jupiter:5.6.0', 'org.junit.jupiter:junit-jupiter:5.6.2'],
+                                     project_path, os.path.join(self.tmp.name, 'home'))
+
+        with open(os.path.join(project_path, 'build.gradle')) as f:
+            build_script = f.read()
+
+        self.assertIn("['org.junit.jupiter:junit-jupiter:5.6.0', 'org.junit.jupiter:junit-jupiter:5.6.2'].each",
+                      build_script)
+        self.assertIn('configurations.detachedConfiguration(dependencies.create(notation))', build_script)
+        self.assertNotIn('implementation', build_script)
+
+    def test_copy_cache_to_repo(self):
+        """Tests if the gradle cache layout is turned into the maven layout.
+        """
+        cache_path = os.path.join(self.tmp.name, 'files-2.1')
+        for sha, name in (('1a', 'junit-jupiter-5.6.0.pom'), ('2b', 'junit-jupiter-5.6.0.jar')):
+            os.makedirs(os.path.join(cache_path, 'org.junit.jupiter', 'junit-jupiter', '5.6.0', sha))
+            open(os.path.join(cache_path, 'org.junit.jupiter', 'junit-jupiter', '5.6.0', sha, name), 'w').close()
+        repo_path = os.path.join(self.tmp.name, 'repo')
+
+        self.assertEqual(mirror.copy_cache_to_repo(cache_path, repo_path), 2)
+        self.assertEqual(sorted(os.listdir(os.path.join(repo_path, 'org', 'junit', 'jupiter', 'junit-jupiter',
+                                                        '5.6.0'))),
+                         ['junit-jupiter-5.6.0.jar', 'junit-jupiter-5.6.0.pom'])
+
+    def test_publish_keeps_previous(self):
+        """Tests if a rebuild switches the mirror and keeps only the previous one for running builds.
+        """
+        repos = [os.path.join(mirror.GRADLE_MIRROR_DIR, 'repo-{0}'.format(i)) for i in range(3)]
+        for repo in repos:
+            os.makedirs(repo)
+            mirror.publish_repo(repo)
+
+        self.assertEqual(os.path.realpath(mirror.mirror_path()), os.path.realpath(repos[2]))
+        self.assertEqual(sorted(os.listdir(mirror.GRADLE_MIRROR_DIR)), ['repo', 'repo-1', 'repo-2'])
+
+    def test_gradle_cmd_uses_mirror(self):
+        """Tests if gradle builds go offline with the init script once a mirror is installed.
+        """
+        self.assertNotIn('--offline', gradle_cmd(ExecType.test, '/project', '')[0])
+
+        os.makedirs(os.path.join(mirror.GRADLE_MIRROR_DIR, 'repo-1'))
+        mirror.publish_repo(os.path.join(mirror.GRADLE_MIRROR_DIR, 'repo-1'))
+        cmd, _ = gradle_cmd(ExecType.test, '/project', '')
+
+        self.assertIn('--offline', cmd)
+        self.assertEqual(cmd[cmd.index('--init-script') + 1], mirror.INIT_SCRIPT)
+        self.assertIn('-Dquellcoda.mirror=file://' + os.path.realpath(os.path.join(mirror.GRADLE_MIRROR_DIR, 'repo-1')),
+                      cmd)
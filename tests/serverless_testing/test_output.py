@@ -0,0 +1,103 @@
+import sys
+import time
+import unittest
+from unittest import mock
+
+from flask import Flask
+from blueprints.serverless_testing import helpers, limits
+from blueprints.serverless_testing.helpers import OutputBuffer, run_cmd
+
+
+class TestOutputCapture(unittest.TestCase):
+    """Tests the bounded capture of command output.
+    """
+    def setUp(self):
+        """Setup "app" to record the usage in.
+        """
+        self.app = Flask(__name__)
+
+    def test_buffer_keeps_short_output(self):
+        """Tests if output shorter than head and tail is kept as it is.
+        """
+        buffer = OutputBuffer(head_bytes=4, tail_bytes=4)
+        buffer.write(b'abc')
+        buffer.write(b'defgh')
+
+        self.assertFalse(buffer.truncated)
+        self.assertEqual(buffer.total_bytes, 8)
+        self.assertEqual(buffer.text(), 'abcdefgh')
+
+    def test_buffer_keeps_head_and_tail(self):
+        """Tests if only head and tail of long output are kept and the gap is marked.
+        """
+        buffer = OutputBuffer(head_bytes=4, tail_bytes=3)
+        for _ in range(1000):
+            buffer.write(b'0123456789')
+
+        self.assertTrue(buffer.truncated)
+        self.assertEqual(buffer.total_bytes, 10000)
+        self.assertEqual(len(buffer.head) + len(buffer.tail), 7)
+        self.assertEqual(buffer.text(), '0123\n... [9993 bytes of output omitted] ...\n789')
+
+    def test_buffer_replaces_invalid_bytes(self):
+        """Tests if output that is no valid UTF-8 is decoded anyway.
+        """
+        buffer = OutputBuffer()
+        buffer.write(b'caf\xe9 \xff')
+
+        self.assertEqual(buffer.text(), 'caf� �')
+
+    def test_run_cmd_invalid_bytes(self):
+        """Tests if :meth:run_cmd returns output that is no valid UTF-8.
+        """
+        stdout, stderr = run_cmd(['printf', 'a\\377b'])
+
+        self.assertEqual(stdout, 'a�b')
+        self.assertIsNone(stderr)
+
+    def test_run_cmd_output_cap(self):
+        """Tests if :meth:run_cmd kills a command writing more than the cap.
+        """
+        start = time.monotonic()
+        with mock.patch.object(helpers, 'OUTPUT_MAX_MB', 1):
+            stdout, stderr = run_cmd([sys.executable, '-c', 'while True: print("x" * 100)'])
+
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertIn('bytes of output omitted', stdout)
+        self.assertIn('Output limit of 1 MB exceeded', stderr)
+
+    def test_run_limited_output_cap(self):
+        """Tests if the output cap is reported like the other limits and the output is truncated.
+        """
+        with self.app.app_context():
+            stdout, stderr, usage = limits.run_limited([sys.executable, '-c', 'while True: print("x" * 100)'],
+                                                       limits=limits.Limits(10, 10, 0, 0, 1024 * 1024))
+            summary = limits.usage_summary()
+
+        self.assertEqual(usage['limit'], limits.LIMIT_OUTPUT)
+        self.assertTrue(usage['truncated'])
+        self.assertGreater(usage['output_bytes'], 1024 * 1024)
+        self.assertLessEqual(len(stdout), 2 * (helpers.OUTPUT_HEAD_KB + helpers.OUTPUT_TAIL_KB) * 1024)
+        self.assertIn('Output limit of 1 MB exceeded', stderr)
+        self.assertEqual(summary['output_bytes'], usage['output_bytes'])
+        self.assertTrue(summary['truncated'])
+
+    def test_run_limited_keeps_output_on_timeout(self):
+        """Tests if the output written before the timeout is returned.
+        """
+        stdout, stderr, usage = limits.run_limited(['sh', '-c', 'echo started; sleep 30'],
+                                                   limits=limits.Limits(1, 0, 0, 0))
+
+        self.assertEqual(stdout, 'started')
+        self.assertEqual(usage['limit'], limits.LIMIT_WALL)
+        self.assertFalse(usage['truncated'])
+
+    def test_stream_limited_output_cap(self):
+        """Tests if streamed commands are stopped by the output cap.
+        """
+        events = list(limits.stream_limited([sys.executable, '-c', 'while True: print("x" * 100)'],
+                                            limits=limits.Limits(10, 10, 0, 0, 1024 * 1024)))
+
+        self.assertEqual(events[-1][0], 'exit')
+        self.assertEqual(events[-1][1]['limit'], limits.LIMIT_OUTPUT)
+        self.assertIn('Output limit of 1 MB exceeded', events[-2][1])
@@ -0,0 +1,107 @@
+import io
+import threading
+import time
+import unittest
+from unittest import mock
+
+from flask import Flask
+from blueprints.serverless_testing import scheduler
+from blueprints.serverless_testing.scheduler import LANE_BATCH, LANE_GRADLE, LANE_INTERACTIVE, QueueFullError, \
+    Scheduler
+from blueprints.serverless_testing.views import serverless_testing_bp
+from tests.serverless_testing.utils import CONTENT_TYPE_FORM_DATA
+
+
+class TestScheduler(unittest.TestCase):
+    """Tests the admission of jobs by lane and client and the bounded queue.
+    """
+    def wait_in_order(self, sched: Scheduler, jobs):
+        """Queues "jobs", pairs of lane and client, one after the other behind a held slot
+        and returns the order they were admitted in.
+        """
+        held = sched.acquire(LANE_INTERACTIVE, 'holder')
+        admitted = []
+        threads = []
+        for lane, client in jobs:
+            def job(lane=lane, client=client):
+                with sched.acquire(lane, client):
+                    admitted.append((lane, client))
+            threads.append(threading.Thread(target=job))
+            threads[-1].start()
+            # Queue in a known order
+            while sched.queued < len(threads):
+                time.sleep(0.005)
+
+        held.release()
+        for thread in threads:
+            thread.join(10)
+        return admitted
+
+    def test_lanes_by_priority(self):
+        """Tests if interactive jobs start before gradle and batch jobs queued earlier.
+        """
+        admitted = self.wait_in_order(Scheduler(1, 10), [(LANE_BATCH, 'a'), (LANE_GRADLE, 'a'),
+                                                         (LANE_INTERACTIVE, 'a')])
+
+        self.assertEqual(admitted, [(LANE_INTERACTIVE, 'a'), (LANE_GRADLE, 'a'), (LANE_BATCH, 'a')])
+
+    def test_clients_round_robin(self):
+        """Tests if a client with many queued jobs does not hold back another client.
+        """
+        admitted = self.wait_in_order(Scheduler(1, 10), [(LANE_INTERACTIVE, 'a'), (LANE_INTERACTIVE, 'a'),
+                                                         (LANE_INTERACTIVE, 'a'), (LANE_INTERACTIVE, 'b')])
+
+        self.assertEqual([client for _, client in admitted], ['a', 'b', 'a', 'a'])
+
+    def test_queue_full(self):
+        """Tests if jobs are rejected once the queue is full, unless unbounded.
+        """
+        sched = Scheduler(1, 0)
+        held = sched.acquire(LANE_INTERACTIVE, 'a')
+
+        with self.assertRaises(QueueFullError) as cm:
+            sched.acquire(LANE_INTERACTIVE, 'b')
+        self.assertGreaterEqual(cm.exception.retry_after, 1)
+        self.assertEqual(sched.queued, 0)
+
+        thread = threading.Thread(target=lambda: sched.acquire(LANE_BATCH, 'jobs', bounded=False).release())
+        thread.start()
+        while sched.queued < 1:
+            time.sleep(0.005)
+        held.release()
+        thread.join(10)
+        self.assertEqual(sched.running, 0)
+
+    def test_endpoint_too_many_requests(self):
+        """Tests if a full queue is answered with 429 and "Retry-After".
+        """
+        app = Flask(__name__)
+        app.register_blueprint(serverless_testing_bp)
+        sched = Scheduler(1, 0)
+        held = sched.acquire(LANE_INTERACTIVE, 'a')
+
+        with mock.patch.object(scheduler, '_scheduler', sched), mock.patch.object(scheduler, 'SCHEDULER_ENABLED', True):
+            resp = app.test_client().post('/run/java?return=json',
+                                          data={'file': (io.BytesIO(b'class A {}'), 'A.java'), 'main_file': 'A'},
+                                          content_type=CONTENT_TYPE_FORM_DATA)
+        held.release()
+
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(resp.headers['Retry-After'], '2')
+        self.assertIn('Too many jobs queued', resp.get_json()['error'])
+
+    def test_queue_bounded_by_threads(self):
+        """Tests if the queue leaves one request thread free to answer 429, unless its size is configured.
+        """
+        sched = Scheduler(4, scheduler.DEFAULT_QUEUE_SIZE)
+        with mock.patch.object(scheduler, '_scheduler', sched):
+            scheduler.configure_threads(8)
+            self.assertEqual(sched.queue_size, 3)
+
+            scheduler.configure_threads(4)
+            self.assertEqual(sched.queue_size, 0)
+
+            with mock.patch.object(scheduler, 'SCHEDULER_QUEUE_SIZE', 10):
+                sched.queue_size = 10
+                scheduler.configure_threads(8)
+            self.assertEqual(sched.queue_size, 10)
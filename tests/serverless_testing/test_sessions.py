@@ -0,0 +1,139 @@
+import io
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from flask import Flask
+from blueprints.serverless_testing import sessions, views
+from blueprints.serverless_testing.scheduler import LANE_INTERACTIVE, LANE_TEST
+from blueprints.serverless_testing.views import serverless_testing_bp
+from tests.serverless_testing.utils import CALC_PATH, CALC_FILENAME, MAIN_PATH, MAIN_FILENAME, \
+    CONTENT_TYPE_FORM_DATA
+
+
+class TestSessions(unittest.TestCase):
+    """Tests editor sessions compiling only changed files and the files depending on them.
+    """
+    def setUp(self):
+        """Setup "app" and point the sessions to a fresh directory.
+        """
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sessions_dir = sessions.SESSIONS_DIR
+        sessions.SESSIONS_DIR = self.tmp.name
+
+        self.app = Flask(__name__)
+        self.app.register_blueprint(serverless_testing_bp)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        """Restore the sessions directory.
+        """
+        sessions.SESSIONS_DIR = self.sessions_dir
+        self.tmp.cleanup()
+
+    def test_dependents(self):
+        """Tests if files referring to changed classes are found transitively, and files
+        only mentioning a changed class by name are found through their sources.
+        """
+        src_path = os.path.join(self.tmp.name, 'src')
+        os.makedirs(src_path)
+        with open(os.path.join(src_path, 'Report.java'), 'w') as f:
+            f.write('class Report { int max = Limits.MAX; }')
+
+        sources = {
+            'Shape.java': {'types': ['Shape'], 'refs': []},
+            'Circle.java': {'types': ['Circle', 'Circle$Center'], 'refs': ['Shape', 'Circle$Center']},
+            'Main.java': {'types': ['Main'], 'refs': ['Circle$Center']},
+            'Limits.java': {'types': ['Limits'], 'refs': []},
+            'Report.java': {'types': ['Report'], 'refs': []},
+        }
+
+        self.assertEqual(sessions.dependents(sources, {'Shape.java'}, {'Shape'}, src_path),
+                         {'Circle.java', 'Main.java'})
+        self.assertEqual(sessions.dependents(sources, {'Limits.java'}, {'Limits'}, src_path), {'Report.java'})
+        self.assertEqual(sessions.dependents(sources, {'Main.java'}, {'Main'}, src_path), set())
+
+    def test_create_describe_delete(self):
+        """Tests the endpoints to create, describe and delete a session.
+        """
+        resp = self.client.post('/sessions')
+        session = resp.get_json()
+
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(session['run_url'], '/sessions/{0}/run/java'.format(session['id']))
+
+        resp = self.client.get('/sessions/' + session['id'])
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.get_json()['files'], [])
+
+        self.assertEqual(self.client.delete('/sessions/' + session['id']).status_code, 204)
+        self.assertEqual(self.client.get('/sessions/' + session['id']).status_code, 404)
+        self.assertEqual(self.client.delete('/sessions/' + session['id']).status_code, 404)
+
+    def test_prune_idle_and_surplus_sessions(self):
+        """Tests if idle sessions and the least recently used sessions beyond the size limit are removed.
+        """
+        now = time.time()
+        ids = [sessions.create_session()['id'] for _ in range(3)]
+        for session_id, last_used in zip(ids, (now - sessions.SESSIONS_TTL - 1, now - 10, now)):
+            os.utime(sessions._state_path(session_id), (last_used, last_used))
+
+        max_bytes = sessions.SESSIONS_MAX_BYTES
+        sessions.SESSIONS_MAX_BYTES = sessions._tree_size(sessions._session_path(ids[2]))
+        try:
+            sessions.prune_sessions()
+        finally:
+            sessions.SESSIONS_MAX_BYTES = max_bytes
+
+        self.assertEqual(os.listdir(self.tmp.name), [ids[2]])
+
+    def test_unknown_session(self):
+        """Tests if submitting to an unknown session returns 404.
+        """
+        data = {'file': (io.BytesIO(b'public class Calculator {}'), CALC_FILENAME)}
+        resp = self.client.post('/sessions/{0}/test/java'.format('a' * 32), data=data,
+                                content_type=CONTENT_TYPE_FORM_DATA)
+
+        self.assertEqual(resp.status_code, 404)
+
+    def test_lanes(self):
+        """Tests if session runs take the interactive lane and session tests the test lane, like "/run/java" and
+        "/test/java".
+        """
+        with mock.patch.object(views, 'admit_request', wraps=views.admit_request) as admit:
+            for route in ('run', 'test'):
+                data = {'file': (io.BytesIO(b'public class Calculator {}'), CALC_FILENAME), 'main_file': 'Calculator'}
+                self.client.post('/sessions/{0}/{1}/java'.format('a' * 32, route), data=data,
+                                 content_type=CONTENT_TYPE_FORM_DATA)
+
+        self.assertEqual([c[0][1] for c in admit.call_args_list], [LANE_INTERACTIVE, LANE_TEST])
+
+    def test_compile_changed_files(self):
+        """Tests if only changed files and their dependents are compiled by the endpoint
+        /sessions/<id>/run/java
+        """
+        session_id = self.client.post('/sessions').get_json()['id']
+
+        def submit(calculator: bytes):
+            with open(MAIN_PATH, 'rb') as main:
+                data = {'file': [(io.BytesIO(main.read()), MAIN_FILENAME), (io.BytesIO(calculator), CALC_FILENAME)],
+                        'main_file': MAIN_FILENAME}
+            return self.client.post('/sessions/{0}/run/java'.format(session_id), data=data,
+                                    content_type=CONTENT_TYPE_FORM_DATA)
+
+        with open(CALC_PATH, 'rb') as f:
+            calculator = f.read()
+
+        resp = submit(calculator)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.headers['X-Compiled-Files'], '{0},{1}'.format(CALC_FILENAME, MAIN_FILENAME))
+
+        resp = submit(calculator)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.headers['X-Compiled-Files'], '')
+
+        resp = submit(calculator + b'\n')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.headers['X-Compiled-Files'], '{0},{1}'.format(CALC_FILENAME, MAIN_FILENAME))
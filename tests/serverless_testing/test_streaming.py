@@ -0,0 +1,67 @@
+import json
+import unittest
+
+from flask import Flask, request
+from werkzeug.datastructures import FileStorage, MultiDict
+from blueprints.serverless_testing import views
+from blueprints.serverless_testing.exec_types.exec_types import ExecType
+from blueprints.serverless_testing.limits import Limits, stream_limited
+from blueprints.serverless_testing.streaming import format_event, trailer, STREAM_SSE, STREAM_TEXT
+from tests.serverless_testing.utils import CONTENT_TYPE_FORM_DATA, CONTENT_TYPE_PLAIN, HELLO_NAME_PATH, \
+    HELLO_NAME_FILENAME
+
+
+class TestStreaming(unittest.TestCase):
+    """Tests forwarding the output of commands while they run.
+    """
+    def setUp(self):
+        """Setup "app" and push the app context.
+        """
+        self.app = Flask(__name__)
+        self.app.app_context().push()
+
+    def test_stream_limited_yields_lines_and_exit_code(self):
+        """Tests if lines of stdout and stderr are yielded in order, followed by the exit code.
+        """
+        events = list(stream_limited(['sh', '-c', 'echo a; echo b >&2; sleep 0.1; printf c; exit 3'],
+                                     limits=Limits(10, 10, 0, 0)))
+
+        self.assertEqual([e for e in events if e[0] == 'stdout'], [('stdout', 'a\n'), ('stdout', 'c')])
+        self.assertEqual([e for e in events if e[0] == 'stderr'], [('stderr', 'b\n')])
+        self.assertEqual(events[-1][0], 'exit')
+        self.assertEqual(events[-1][1]['exit_code'], 3)
+
+    def test_stream_limited_yields_before_exit(self):
+        """Tests if the first line arrives while the command still runs.
+        """
+        events = stream_limited(['sh', '-c', 'echo first; sleep 10'], limits=Limits(30, 10, 0, 0))
+
+        self.assertEqual(next(events), ('stdout', 'first\n'))
+        events.close()
+
+    def test_format_events(self):
+        """Tests the encoding of lines and trailer for both stream modes.
+        """
+        kind, data = trailer(0, 'run', {'run_ms': 5})
+
+        self.assertEqual(format_event('stdout', 'Hello\n', STREAM_TEXT), 'Hello\n')
+        self.assertEqual(format_event('stdout', 'Hello\n', STREAM_SSE), 'event: stdout\ndata: Hello\n\n')
+        self.assertEqual(format_event(kind, data, STREAM_SSE),
+                         'event: exit\ndata: ' + json.dumps(data) + '\n\n')
+        self.assertTrue(format_event(kind, data, STREAM_TEXT).startswith('\n[exit] '))
+
+    def test_stream_run_java(self):
+        """Tests the endpoint /run/java?stream=sse
+        """
+        with open(HELLO_NAME_PATH, 'rb') as f:
+            data = MultiDict([('main_file', HELLO_NAME_FILENAME),
+                              ('file', FileStorage(stream=f, filename=HELLO_NAME_FILENAME,
+                                                   content_type=CONTENT_TYPE_PLAIN))])
+            with self.app.test_request_context('/run/java?stream=sse&args1=World', data=data, method='POST',
+                                               content_type=CONTENT_TYPE_FORM_DATA):
+                resp = views.execute_java(request, exec_type=ExecType.run)
+                body = resp.get_data(as_text=True)
+
+        self.assertEqual(resp.mimetype, 'text/event-stream')
+        self.assertIn('event: stdout\ndata: Hello, World', body)
+        self.assertIn('event: exit\ndata: {"exit_code": 0', body)
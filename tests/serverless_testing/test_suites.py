@@ -0,0 +1,119 @@
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from flask import Flask
+from werkzeug.datastructures import FileStorage, MultiDict
+from blueprints.serverless_testing import suites, views
+from blueprints.serverless_testing.views import serverless_testing_bp
+from tests.serverless_testing.utils import CALC_PATH, CALC_FILENAME, CALC_TEST_PATH, CALC_TEST_FILENAME, \
+    CONTENT_TYPE_FORM_DATA, CONTENT_TYPE_PLAIN
+
+SUITE_ID = 'a' * 32
+
+
+class TestSuites(unittest.TestCase):
+    """Tests registering, resolving and evicting precompiled test suites.
+    """
+    def setUp(self):
+        """Setup "app" and point the suites to a fresh directory.
+        """
+        self.tmp = tempfile.TemporaryDirectory()
+        self.suites_dir = suites.SUITES_DIR
+        suites.SUITES_DIR = self.tmp.name
+
+        self.app = Flask(__name__)
+        self.app.register_blueprint(serverless_testing_bp)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        """Restore the suites directory.
+        """
+        suites.SUITES_DIR = self.suites_dir
+        self.tmp.cleanup()
+
+    def add_version(self, version: int, last_used: float):
+        path = os.path.join(self.tmp.name, SUITE_ID, 'v{0}'.format(version))
+        os.makedirs(os.path.join(path, 'classes'))
+        with open(os.path.join(path, 'suite.json'), 'w') as f:
+            json.dump({'id': SUITE_ID, 'version': version}, f)
+        os.utime(os.path.join(path, 'suite.json'), (last_used, last_used))
+
+    def test_resolve_versions(self):
+        """Tests if a reference without version resolves to the latest version.
+        """
+        for version in (1, 2):
+            self.add_version(version, time.time())
+
+        self.assertTrue(suites.resolve_suite(SUITE_ID).endswith(os.path.join('v2', 'classes')))
+        self.assertTrue(suites.resolve_suite(SUITE_ID + '@1').endswith(os.path.join('v1', 'classes')))
+        self.assertIsNone(suites.resolve_suite(SUITE_ID + '@3'))
+        self.assertIsNone(suites.resolve_suite('../' + SUITE_ID))
+
+    def test_prune_unused_and_surplus_versions(self):
+        """Tests if expired versions and old versions beyond the limit are removed.
+        """
+        now = time.time()
+        self.add_version(1, now - suites.SUITES_TTL - 1)
+        self.add_version(2, now - suites.SUITE_IN_USE_GRACE - 1)
+        self.add_version(3, now - 1)
+        self.add_version(4, now)
+
+        max_versions = suites.SUITES_MAX_VERSIONS
+        suites.SUITES_MAX_VERSIONS = 1
+        try:
+            suites.prune_suites()
+        finally:
+            suites.SUITES_MAX_VERSIONS = max_versions
+
+        self.assertEqual(suites.list_versions(SUITE_ID), [3, 4])
+
+    def test_register_and_test_with_suite(self):
+        """Tests the endpoints /suites and /test/java?suite=<id>
+        """
+        with open(CALC_TEST_PATH, 'rb') as test, open(CALC_PATH, 'rb') as reference:
+            data = MultiDict([('file', FileStorage(stream=test, filename=CALC_TEST_FILENAME,
+                                                   content_type=CONTENT_TYPE_PLAIN)),
+                              ('reference', FileStorage(stream=reference, filename=CALC_FILENAME,
+                                                        content_type=CONTENT_TYPE_PLAIN))])
+            resp = self.client.post('/suites', data=data, content_type=CONTENT_TYPE_FORM_DATA)
+        suite = resp.get_json()
+
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(suite['version'], 1)
+
+        with open(CALC_PATH, 'rb') as f:
+            data = MultiDict([('file', FileStorage(stream=f, filename=CALC_FILENAME,
+                                                   content_type=CONTENT_TYPE_PLAIN))])
+            resp = self.client.post('/test/java?suite=' + suite['id'], data=data,
+                                    content_type=CONTENT_TYPE_FORM_DATA)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('5 tests successful', resp.get_data(as_text=True))
+
+    def test_suite_before_submission(self):
+        """Tests if the suite comes before the submission on the class-path, so uploaded classes can not replace it.
+        """
+        self.add_version(1, time.time())
+        suite_path = os.path.join(self.tmp.name, SUITE_ID, 'v1', 'classes')
+        data = {'file': (io.BytesIO(b'public class CalculatorTest {}'), CALC_TEST_FILENAME)}
+        with mock.patch.object(views, 'javac_cached', return_value=(None, None)), \
+                mock.patch.object(views, 'java', return_value=('passed', None)) as java:
+            resp = self.client.post('/test/java?suite=' + SUITE_ID, data=data, content_type=CONTENT_TYPE_FORM_DATA)
+
+        class_path = java.call_args[1]['class_path'].split(':')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(class_path[0], suite_path)
+        self.assertTrue(class_path[-1].endswith('out'))
+
+    def test_unknown_suite(self):
+        """Tests if referencing an unknown suite returns 404.
+        """
+        data = {'file': (io.BytesIO(b'public class Calculator {}'), CALC_FILENAME)}
+        resp = self.client.post('/test/java?suite=' + SUITE_ID, data=data, content_type=CONTENT_TYPE_FORM_DATA)
+
+        self.assertEqual(resp.status_code, 404)
@@ -0,0 +1,161 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from flask import Flask
+from blueprints.serverless_testing import limits, supervisor
+
+
+class TestSupervisor(unittest.TestCase):
+    """Tests supervising job commands on the event loop with "EXEC_MODE=asyncio".
+    """
+    def setUp(self):
+        """Setup "app" to record the usage in and switch to the asyncio mode.
+        """
+        self.app = Flask(__name__)
+        patcher = mock.patch.object(supervisor, 'EXEC_MODE', supervisor.EXEC_MODE_ASYNCIO)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_usage_is_reported(self):
+        """Tests if output, exit code and usage are the same as on the request thread.
+        """
+        with self.app.app_context():
+            stdout, stderr, usage = limits.run_limited([sys.executable, '-c', 'print("Hello"); exit(3)'],
+                                                       limits=limits.Limits(10, 10, 0, 0))
+            summary = limits.usage_summary()
+
+        self.assertEqual(stdout, 'Hello')
+        self.assertIsNone(stderr)
+        self.assertEqual(usage['exit_code'], 3)
+        self.assertIsNone(usage['limit'])
+        self.assertGreater(usage['max_rss_kb'], 0)
+        self.assertEqual(summary['wall_ms'], usage['wall_ms'])
+
+    def test_wall_limit(self):
+        """Tests if the command is killed at the timeout and the output until then is kept.
+        """
+        start = time.monotonic()
+        stdout, stderr, usage = limits.run_limited(['sh', '-c', 'echo started; sleep 30'],
+                                                   limits=limits.Limits(1, 0, 0, 0))
+
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(stdout, 'started')
+        self.assertIn('Time limit of 1 seconds exceeded', stderr)
+        self.assertEqual(usage['limit'], limits.LIMIT_WALL)
+
+    def test_wall_limit_with_closed_streams(self):
+        """Tests if a command that closed its streams is still stopped at the timeout.
+        """
+        stdout, stderr, usage = limits.run_limited(['sh', '-c', 'exec >&- 2>&-; sleep 30'],
+                                                   limits=limits.Limits(1, 0, 0, 0))
+
+        self.assertIsNone(stdout)
+        self.assertEqual(usage['limit'], limits.LIMIT_WALL)
+
+    def test_output_cap(self):
+        """Tests if a command writing endlessly is stopped by the output cap.
+        """
+        stdout, stderr, usage = limits.run_limited([sys.executable, '-c', 'while True: print("x" * 100)'],
+                                                   limits=limits.Limits(10, 10, 0, 0, 1024 * 1024))
+
+        self.assertEqual(usage['limit'], limits.LIMIT_OUTPUT)
+        self.assertTrue(usage['truncated'])
+        self.assertIn('Output limit of 1 MB exceeded', stderr)
+
+    def test_concurrency_is_limited(self):
+        """Tests if no more than "EXEC_CONCURRENCY" commands run at once and results keep their order.
+        """
+        cmds = [['sh', '-c', 'sleep 0.3; echo {0}'.format(i)] for i in range(4)]
+        start = time.monotonic()
+        with mock.patch.object(supervisor, 'EXEC_CONCURRENCY', 2), mock.patch.object(supervisor, '_limiter', None):
+            with self.app.app_context():
+                results = limits.run_limited_all(cmds, limits=limits.Limits(10, 10, 0, 0))
+                summary = limits.usage_summary()
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.6)
+        self.assertEqual([stdout for stdout, _, _ in results], ['0', '1', '2', '3'])
+        self.assertEqual(summary['wall_ms'], sum(usage['wall_ms'] for _, _, usage in results))
+
+    def test_stream(self):
+        """Tests if streamed lines arrive in order and end with the usage, which is recorded for the request.
+        """
+        with self.app.app_context():
+            events = list(limits.stream_limited(['sh', '-c', 'echo a; echo b >&2; sleep 0.1; printf c; exit 3'],
+                                                limits=limits.Limits(10, 10, 0, 0)))
+            summary = limits.usage_summary()
+
+        self.assertEqual([e for e in events if e[0] == 'stdout'], [('stdout', 'a\n'), ('stdout', 'c')])
+        self.assertEqual([e for e in events if e[0] == 'stderr'], [('stderr', 'b\n')])
+        self.assertEqual(events[-1][0], 'exit')
+        self.assertEqual(events[-1][1]['exit_code'], 3)
+        self.assertEqual(summary['wall_ms'], events[-1][1]['wall_ms'])
+
+    def test_stream_limits(self):
+        """Tests if streamed commands are stopped by the timeout and the output cap.
+        """
+        events = list(limits.stream_limited(['sh', '-c', 'echo started; sleep 30'], limits=limits.Limits(1, 0, 0, 0)))
+
+        self.assertEqual(events[0], ('stdout', 'started\n'))
+        self.assertIn('Time limit of 1 seconds exceeded', events[-2][1])
+        self.assertEqual(events[-1][1]['limit'], limits.LIMIT_WALL)
+
+        events = list(limits.stream_limited([sys.executable, '-c', 'while True: print("x" * 100)'],
+                                            limits=limits.Limits(10, 10, 0, 0, 1024 * 1024)))
+
+        self.assertEqual(events[-1][1]['limit'], limits.LIMIT_OUTPUT)
+
+    def test_stream_closed_early(self):
+        """Tests if a command is killed and its slot freed when the consumer stops, e.g. the client disconnected.
+        """
+        with mock.patch.object(supervisor, 'EXEC_CONCURRENCY', 1), mock.patch.object(supervisor, '_limiter', None):
+            events = limits.stream_limited(['sh', '-c', 'echo $$; sleep 30'], limits=limits.Limits(60, 0, 0, 0))
+            pid = int(next(events)[1])
+            events.close()
+
+            with self.assertRaises(ProcessLookupError):
+                os.kill(pid, 0)
+            stdout, _, _ = limits.run_limited(['echo', 'next'], limits=limits.Limits(10, 10, 0, 0))
+
+        self.assertEqual(stdout, 'next')
+
+    def test_cgroup_removed_off_the_loop(self):
+        """Tests if removing the cgroup, which waits for killed processes, does not block the event loop.
+        """
+        threads = []
+        with tempfile.TemporaryDirectory() as root, mock.patch.object(limits, 'JOB_CGROUP_ROOT', root), \
+                mock.patch.object(limits, 'remove_cgroup', lambda path: threads.append(threading.current_thread())):
+            limits.run_limited(['true'], limits=limits.Limits(10, 0, 64 * 1024 * 1024, 0))
+            events = limits.stream_limited(['sh', '-c', 'echo started; sleep 30'],
+                                           limits=limits.Limits(60, 0, 64 * 1024 * 1024, 0))
+            next(events)
+            events.close()
+
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn('supervisor', [thread.name for thread in threads])
+
+    def test_exec_slot(self):
+        """Tests if jobs outside of the loop, e.g. on a daemon pool, take the slots of the commands.
+        """
+        started = threading.Event()
+        release = threading.Event()
+
+        def pooled_job():
+            with supervisor.exec_slot():
+                started.set()
+                release.wait()
+
+        with mock.patch.object(supervisor, 'EXEC_CONCURRENCY', 1), mock.patch.object(supervisor, '_limiter', None):
+            thread = threading.Thread(target=pooled_job)
+            thread.start()
+            started.wait()
+            threading.Timer(0.3, release.set).start()
+            start = time.monotonic()
+            limits.run_limited(['true'], limits=limits.Limits(10, 10, 0, 0))
+            thread.join()
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.25)
@@ -0,0 +1,63 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+from flask import Flask, jsonify
+from blueprints.serverless_testing import limits, timings
+from blueprints.serverless_testing.metrics import measure_stage, STAGE_COMPILE
+from blueprints.serverless_testing.views import serverless_testing_bp, json_report
+
+
+class TestTimings(unittest.TestCase):
+    """Tests the "Server-Timing" header and the timings of json responses.
+    """
+    def setUp(self):
+        """Setup "app" with the blueprint and a route running one command.
+        """
+        self.app = Flask(__name__)
+        self.app.register_blueprint(serverless_testing_bp)
+
+        @self.app.route('/timed', methods=['GET'])
+        def timed():
+            with measure_stage(STAGE_COMPILE):
+                limits.run_limited([sys.executable, '-c', 'print("ok")'], limits=limits.Limits(10, 10, 0, 0))
+            return jsonify(**json_report())
+
+        self.client = self.app.test_client()
+
+    def test_server_timing_header(self):
+        """Tests if stages, commands and the total are reported in order.
+        """
+        resp = self.client.get('/timed')
+
+        tool = os.path.basename(sys.executable)
+        names = [entry.split(';')[0] for entry in resp.headers['Server-Timing'].split(', ')]
+        self.assertEqual(names, ['compile', tool, 'total'])
+        timings = resp.get_json()['timings']
+        self.assertEqual(list(timings), ['compile_ms', tool + '_ms', 'total_ms'])
+        self.assertGreaterEqual(timings['compile_ms'], timings[tool + '_ms'])
+        self.assertNotIn('commands', resp.get_json())
+
+    def test_debug_commands(self):
+        """Tests if ?debug=1 adds command lines and exit codes once "TIMING_DEBUG" is enabled.
+        """
+        self.assertNotIn('commands', self.client.get('/timed?debug=1').get_json())
+
+        with mock.patch.object(timings, 'TIMING_DEBUG_ENABLED', True):
+            resp = self.client.get('/timed?debug=1')
+
+        self.assertIn('cmd0;dur=', resp.headers['Server-Timing'])
+        self.assertIn('desc="exit 0: {0} -c print(\\"ok\\")"'.format(sys.executable), resp.headers['Server-Timing'])
+        command = resp.get_json()['commands'][0]
+        self.assertEqual(command['cmd'], [sys.executable, '-c', 'print("ok")'])
+        self.assertEqual(command['exit_code'], 0)
+
+    def test_gradle_json_timings(self):
+        """Tests if json responses of the gradle routes carry the timings.
+        """
+        resp = self.client.post('/run/gradle?return=json')
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('upload_ms', resp.get_json()['timings'])
+        self.assertIn('upload;dur=', resp.headers['Server-Timing'])
@@ -0,0 +1,123 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from flask import Flask
+from prometheus_client import REGISTRY
+from blueprints.serverless_testing import warmup
+from blueprints.serverless_testing.views import serverless_testing_bp
+
+
+class TestWarmup(unittest.TestCase):
+    """Tests the warm-up of a worker and the /ready endpoint.
+    """
+    def setUp(self):
+        """Setup "app" and a cold worker.
+        """
+        self.app = Flask(__name__)
+        self.app.register_blueprint(serverless_testing_bp)
+        self.client = self.app.test_client()
+
+        patcher = mock.patch.object(warmup, '_state', {'status': warmup.WARMUP_COLD, 'pid': None,
+                                                       'duration_ms': None, 'steps': {}})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def wait_until_ready(self):
+        """Polls /ready until the warm-up is done and returns the last response.
+        """
+        for _ in range(600):
+            resp = self.client.get('/ready')
+            if resp.status_code == 200:
+                return resp
+            time.sleep(0.1)
+        self.fail('Warm-up did not finish')
+
+    def test_ready_after_warmup(self):
+        """Tests if /ready starts the warm-up, answers 503 while warming and 200 once every
+        step ran, failed steps included.
+        """
+        steps = []
+
+        def step(name):
+            def run(_):
+                steps.append(name)
+                return 'failed' if name == 'gradle' else None
+            return run
+
+        total = REGISTRY.get_sample_value('quellcoda_warmup_duration_seconds_count', {'step': 'total'}) or 0
+        with mock.patch.object(warmup, '_prime_pools', step('pools')), \
+                mock.patch.object(warmup, '_compile', step('javac')), \
+                mock.patch.object(warmup, '_run', step('java')), \
+                mock.patch.object(warmup, '_test', step('junit')), \
+                mock.patch.object(warmup, '_build', step('gradle')):
+            # The warm-up is started by the request but run here
+            with mock.patch.object(warmup, 'run_warmup'):
+                resp = self.client.get('/ready')
+            self.assertEqual(resp.status_code, 503)
+            self.assertEqual(resp.get_json()['status'], warmup.WARMUP_WARMING)
+
+            warmup.run_warmup()
+            resp = self.wait_until_ready()
+
+        status = resp.get_json()
+        self.assertEqual(status['status'], warmup.WARMUP_READY)
+        self.assertEqual(steps, ['pools', 'javac', 'java', 'junit', 'gradle'])
+        self.assertEqual(status['steps']['gradle']['error'], 'failed')
+        self.assertIsNone(status['steps']['javac']['error'])
+        self.assertIsNotNone(status['duration_ms'])
+        self.assertEqual(REGISTRY.get_sample_value('quellcoda_warmup_duration_seconds_count', {'step': 'total'}),
+                         total + 1)
+
+    def test_started_once(self):
+        """Tests if the warm-up of a worker only starts once.
+        """
+        with mock.patch.object(warmup, 'run_warmup'):
+            self.assertTrue(warmup.start_warmup())
+            self.assertFalse(warmup.start_warmup())
+
+    def test_failing_tools(self):
+        """Tests if the worker gets ready even if the tools are missing or fail.
+        """
+        with mock.patch.object(warmup, '_build', side_effect=OSError('gradle not installed')):
+            warmup.start_warmup()
+            resp = self.wait_until_ready()
+
+        steps = resp.get_json()['steps']
+        self.assertEqual(sorted(steps), ['gradle', 'java', 'javac', 'junit', 'pools'])
+        self.assertEqual(steps['gradle']['error'], 'gradle not installed')
+
+    def test_ready_waits_for_all_workers(self):
+        """Tests if /ready answers 503 while another live worker is not warm, and ignores workers that exited.
+        """
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        worker = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+        self.addCleanup(worker.wait)
+        self.addCleanup(worker.kill)
+        exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+        exited.wait()
+
+        def share(pid: int, status: str):
+            with open(os.path.join(tmp.name, 'warmup_{0}.json'.format(pid)), 'w') as f:
+                json.dump({'status': status}, f)
+
+        with mock.patch.object(warmup, 'METRICS_DIR', tmp.name), mock.patch.object(warmup, 'WARMUP_ENABLED', False):
+            warmup.register_worker()
+            share(worker.pid, warmup.WARMUP_WARMING)
+            share(exited.pid, warmup.WARMUP_COLD)
+            resp = self.client.get('/ready')
+
+            self.assertEqual(resp.status_code, 503)
+            self.assertEqual(resp.get_json()['status'], warmup.WARMUP_READY)
+            self.assertEqual(resp.get_json()['workers'], {str(os.getpid()): warmup.WARMUP_READY,
+                                                          str(worker.pid): warmup.WARMUP_WARMING})
+            self.assertFalse(os.path.exists(os.path.join(tmp.name, 'warmup_{0}.json'.format(exited.pid))))
+
+            share(worker.pid, warmup.WARMUP_READY)
+            self.assertEqual(self.client.get('/ready').status_code, 200)
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+
+from blueprints.serverless_testing.workspaces import WorkspacePool, remove_stale_roots
+
+MB = 1024 * 1024
+
+
+class TestWorkspaces(unittest.TestCase):
+    """Tests handing out, wiping and recycling job workspaces.
+    """
+    def setUp(self):
+        """Setup a pool with a RAM root for two workspaces and a disk root.
+        """
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ram_root = os.path.join(self.tmp.name, 'ram')
+        self.disk_root = os.path.join(self.tmp.name, 'disk')
+        self.pool = WorkspacePool(ram_root=self.ram_root, disk_root=self.disk_root, size=2,
+                                  budget_bytes=2 * MB, reserve_bytes=MB)
+
+    def tearDown(self):
+        """Remove all workspaces.
+        """
+        self.tmp.cleanup()
+
+    def test_workspace_is_wiped_and_recycled(self):
+        """Tests if a RAM workspace is emptied after use and handed out again.
+        """
+        with self.pool.acquire() as first:
+            os.makedirs(os.path.join(first, 'build', 'classes'))
+            open(os.path.join(first, 'Main.java'), 'w').close()
+        self.pool._dirty.join()
+
+        with self.pool.acquire() as second:
+            self.assertEqual(os.listdir(second), [])
+        self.assertTrue(first.startswith(self.ram_root))
+        self.assertTrue(second.startswith(self.ram_root))
+
+    def test_budget_falls_back_to_disk(self):
+        """Tests if workspaces beyond the memory budget are put on disk.
+        """
+        with self.pool.acquire() as a, self.pool.acquire() as b, self.pool.acquire() as c:
+            self.assertTrue(a.startswith(self.ram_root))
+            self.assertTrue(b.startswith(self.ram_root))
+            self.assertTrue(c.startswith(self.disk_root))
+            disk_workspace = c
+        self.pool._dirty.join()
+
+        self.assertFalse(os.path.exists(disk_workspace))
+
+    def test_remove_stale_roots(self):
+        """Tests if only workspaces of processes that no longer run are removed.
+        """
+        os.makedirs(os.path.join(self.ram_root, str(os.getpid())))
+        os.makedirs(os.path.join(self.ram_root, '999999999'))
+
+        remove_stale_roots([self.ram_root])
+
+        self.assertEqual(os.listdir(self.ram_root), [str(os.getpid())])